@@ -0,0 +1,6 @@
+"""Núcleo da Carteira Inteligente: coleta, indicadores, IA, PDF e envios, sem Streamlit.
+
+Os módulos pesados (CrewAI, ReportLab, Plotly, yfinance, Groq) só são importados
+na primeira chamada que precisa deles, então `import carteira` é rápido e pode
+ser usado de scripts, workers ou da linha de comando (`python -m carteira`).
+"""
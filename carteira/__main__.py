@@ -0,0 +1,360 @@
+"""Linha de comando da Carteira Inteligente.
+
+    python -m carteira relatorio [--saida DIR] [--sem-ia] [--refazer-ia] [--metricas ARQ]
+    python -m carteira lote      CLIENTES [--saida DIR] [--sem-ia] [--refazer-ia] [--processos N] [--metricas ARQ]
+    python -m carteira agendar   [--agora] [--uma-vez] [--metricas ARQ]
+    python -m carteira inicio    [--orcamento SEGUNDOS]
+    python -m carteira benchmark-pdf [--relatorios N] [--ativos N] [--processos N]
+    python -m carteira gravar-fixtures [DIR] [--periodo 5y]
+    python -m carteira benchmark [--fixtures DIR | --sintetico [SEMENTE]] [--tamanhos 7,100,1000] [--repeticoes N]
+                                 [--saida ARQ] [--comparar ARQ]
+    python -m carteira exportar-fonte DIR [--formato parquet|csv] [--periodo max]
+    python -m carteira universo-sintetico N [--saida ARQ] [--semente S]
+
+`relatorio` roda o mesmo pipeline do botão "Gerar Relatório Completo" e grava
+PDF, Markdown e os dados em JSON; `lote` faz o mesmo para cada carteira de
+cliente do diretório CLIENTES (um CSV/TOML por cliente), com uma única coleta
+de mercado para todos, e grava em DIR/<cliente>/; `agendar` gera o relatório
+depois de cada fechamento da B3 e o grava como snapshot para o painel; `inicio` mede o tempo de importação do núcleo
+num processo novo e falha se passar do orçamento ou se algum módulo pesado for
+carregado antes da hora; `benchmark-pdf` mede tempo por relatório e pico de RSS
+gerando PDFs sintéticos em sequência e no pool de processos. `gravar-fixtures`
+grava uma vez as respostas do Yahoo para o universo (precisa de rede) e
+`benchmark` mede, sem rede, cada busca, os indicadores, o PDF, os gráficos e o
+relatório completo com 7, 100 e 1000 ativos, gravando o resultado em JSON para
+comparar entre commits (com --sintetico, usando dados gerados em vez das
+gravações). `exportar-fonte` copia os dados do universo vindos da fonte atual
+(CARTEIRA_FONTE) para um diretório Parquet/CSV lido por CARTEIRA_FONTE=arquivos:DIR
+e `universo-sintetico` grava um universo de N ações fictícias para
+CARTEIRA_FONTE=sintetica.
+
+Com --metricas ARQ, os totais de tempo, chamadas externas e bytes por span são
+gravados em ARQ no formato texto do Prometheus (para o textfile collector do
+node_exporter) ao fim de cada execução; o tempo por etapa sai no stderr.
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import warnings
+from datetime import datetime
+
+ORCAMENTO_IMPORTACAO_S = 1.0
+MODULOS_NUCLEO  = ["carteira.config", "carteira.medicoes", "carteira.compartilhado", "carteira.fontes", "carteira.armazenamento",
+                   "carteira.indicadores", "carteira.dados", "carteira.ia", "carteira.pdf", "carteira.envios", "carteira.graficos",
+                   "carteira.pipeline", "carteira.lote", "carteira.snapshots", "carteira.agendador"]
+MODULOS_PESADOS = ["crewai", "litellm", "groq", "yfinance", "reportlab", "plotly", "streamlit"]
+
+
+def _relatorio(args) -> int:
+    from carteira.config import GROQ_API_KEY
+    from carteira.medicoes import medir
+    from carteira.pipeline import ETAPAS_IA, MENSAGENS_ETAPAS, etapas_relatorio, executar_pipeline
+
+    if not GROQ_API_KEY and not args.sem_ia:
+        print("❌ GROQ_API_KEY não configurada (use --sem-ia para gerar só os dados).", file=sys.stderr)
+        return 2
+    etapas = etapas_relatorio(GROQ_API_KEY, usar_cache=False if args.refazer_ia else None)
+    if args.sem_ia:
+        for nome in ETAPAS_IA:
+            etapas.pop(nome)
+
+    def ao_concluir(nome, valor, erro):
+        if erro is not None:
+            print(f"⚠️ {MENSAGENS_ETAPAS[nome][0].rstrip('.')} falhou: {erro}", file=sys.stderr)
+        elif nome == "cotacoes" and not valor:
+            raise SystemExit("❌ Nenhuma cotação retornada.")
+        else:
+            print(MENSAGENS_ETAPAS[nome][1](valor), file=sys.stderr)
+
+    with medir("relatorio") as raiz:
+        res = executar_pipeline(etapas, ao_iniciar=lambda nome: print(MENSAGENS_ETAPAS[nome][0], file=sys.stderr),
+                                ao_concluir=ao_concluir)
+    _medicoes(raiz, args.metricas)
+    _gravar(res, args.saida)
+    completo = set(etapas) <= set(res)
+    if not args.sem_ia and completo:
+        from carteira.snapshots import salvar_snapshot
+
+        print(f"🗂️ Snapshot {salvar_snapshot(res)} gravado", file=sys.stderr)
+    elif not args.sem_ia:
+        # O painel abre o snapshot mais novo: um relatório parcial não pode tomar o lugar do último completo
+        print("⚠️ Relatório incompleto; snapshot não gravado", file=sys.stderr)
+    return 0 if completo else 1
+
+
+def _medicoes(raiz, arquivo):
+    """Imprime o tempo por etapa da execução e, se pedido, grava os totais no formato do Prometheus."""
+    from carteira.medicoes import exportar_prometheus, resumo_etapas
+
+    print("⏱️ Tempo por etapa:", file=sys.stderr)
+    for e in resumo_etapas(raiz.id):
+        print(f"   {e['etapa']:<22}{e['segundos']:>8.2f} s{e['chamadas']:>6} chamadas{e['bytes'] / 1024:>10.0f} KB"
+              + (" ⚠️" if e["erro"] else ""), file=sys.stderr)
+    if arquivo:
+        temporario = f"{arquivo}.tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            f.write(exportar_prometheus())
+        os.replace(temporario, arquivo)
+
+
+def _gravar(res, saida):
+    from carteira.pdf import gerar_markdown
+
+    os.makedirs(saida, exist_ok=True)
+    base = os.path.join(saida, f"relatorio_b3_{datetime.now().strftime('%Y%m%d')}")
+    if res.get("pdf_bytes"):
+        with open(f"{base}.pdf", "wb") as f:
+            f.write(res["pdf_bytes"])
+    if res.get("relatorio"):
+        with open(f"{base}.md", "w", encoding="utf-8") as f:
+            f.write(gerar_markdown(res["relatorio"]))
+    with open(f"{base}.json", "w", encoding="utf-8") as f:
+        json.dump({k: v for k, v in res.items() if k != "pdf_bytes"}, f, ensure_ascii=False, indent=2, default=str)
+    print(f"📄 Relatório salvo em {base}.*", file=sys.stderr)
+
+
+def _lote(args) -> int:
+    from carteira.config import GROQ_API_KEY
+    from carteira.lote import carregar_clientes, gerar_relatorios_clientes, uniao_ativos
+    from carteira.medicoes import medir
+    from carteira.pipeline import MENSAGENS_ETAPAS
+
+    if not GROQ_API_KEY and not args.sem_ia:
+        print("❌ GROQ_API_KEY não configurada (use --sem-ia para gerar só os dados).", file=sys.stderr)
+        return 2
+    clientes = carregar_clientes(args.clientes)
+    if not clientes:
+        print(f"❌ Nenhuma carteira (.csv/.toml) em {args.clientes}.", file=sys.stderr)
+        return 2
+    print(f"👥 {len(clientes)} clientes, {len(uniao_ativos(clientes))} ativos distintos", file=sys.stderr)
+
+    def ao_concluir(nome, valor, erro):
+        if erro is not None:
+            print(f"⚠️ {MENSAGENS_ETAPAS[nome][0].rstrip('.')} falhou: {erro}", file=sys.stderr)
+        else:
+            print(MENSAGENS_ETAPAS[nome][1](valor), file=sys.stderr)
+
+    def ao_concluir_cliente(cliente, etapa, erro):
+        if erro is not None:
+            print(f"⚠️ {cliente}: {MENSAGENS_ETAPAS[etapa][0].rstrip('.')} falhou: {erro}", file=sys.stderr)
+        else:
+            print(f"{cliente}: {MENSAGENS_ETAPAS[etapa][1](None)}", file=sys.stderr)
+
+    with medir("lote", clientes=len(clientes)) as raiz:
+        relatorios = gerar_relatorios_clientes(
+            clientes, GROQ_API_KEY, usar_cache=False if args.refazer_ia else None, com_ia=not args.sem_ia,
+            processos=args.processos, ao_iniciar=lambda nome: print(MENSAGENS_ETAPAS[nome][0], file=sys.stderr),
+            ao_concluir=ao_concluir, ao_concluir_cliente=ao_concluir_cliente)
+    _medicoes(raiz, args.metricas)
+    completos = 0
+    for cliente, res in relatorios.items():
+        _gravar(res, os.path.join(args.saida, cliente))
+        completos += bool(res["cotacoes"]) and (args.sem_ia or "pdf_bytes" in res)
+    return 0 if completos == len(relatorios) else 1
+
+
+def _agendar(args) -> int:
+    from carteira.agendador import agendar, gerar_snapshot
+    from carteira.config import GROQ_API_KEY
+    from carteira.pipeline import MENSAGENS_ETAPAS
+
+    if not GROQ_API_KEY:
+        print("❌ GROQ_API_KEY não configurada.", file=sys.stderr)
+        return 2
+    avisar = lambda msg: print(msg, file=sys.stderr, flush=True)
+    if args.agora:
+        id_snapshot, _ = gerar_snapshot(GROQ_API_KEY, ao_iniciar=lambda nome: avisar(MENSAGENS_ETAPAS[nome][0]),
+                                        ao_medir=lambda raiz: _medicoes(raiz, args.metricas))
+        avisar(f"🗂️ Snapshot {id_snapshot} gravado" if id_snapshot else "❌ Relatório incompleto; snapshot não gravado.")
+        return 0 if id_snapshot else 1
+    agendar(GROQ_API_KEY, uma_vez=args.uma_vez, avisar=avisar, ao_medir=lambda raiz: _medicoes(raiz, args.metricas))
+    return 0
+
+
+def _inicio(args) -> int:
+    codigo = ("import sys, time\n"
+              "t = time.perf_counter()\n"
+              f"import {', '.join(MODULOS_NUCLEO)}\n"
+              "print(time.perf_counter() - t)\n"
+              f"print(','.join(m for m in {MODULOS_PESADOS!r} if m in sys.modules))")
+    # Melhor de três execuções, cada uma num processo novo (sem módulos já em memória)
+    medidas = []
+    for _ in range(3):
+        saida = subprocess.run([sys.executable, "-c", codigo], capture_output=True, text=True, check=True).stdout.splitlines()
+        medidas.append((float(saida[0]), saida[1] if len(saida) > 1 else ""))
+    tempo, carregados = min(medidas)
+    print(f"Importação do núcleo: {tempo:.3f} s (orçamento {args.orcamento:.2f} s)")
+    if carregados:
+        print(f"❌ Módulos pesados carregados na importação: {carregados}")
+    return 0 if tempo <= args.orcamento and not carregados else 1
+
+
+def _rss_pico_mb(quem) -> float:
+    import resource
+
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    return resource.getrusage(quem).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def _benchmark_pdf(args) -> int:
+    import resource
+    import tempfile
+    import time
+
+    from carteira.pdf import gerar_pdf, gerar_pdfs
+
+    cotacoes = [{"ticker": f"ATV{i}", "nome": f"Empresa {i}", "moeda": "BRL", "atual": 10.0 + i,
+                 "variacao": (i % 9) - 4.0, "var_anterior": (i % 5) - 2.0, "volatilidade": 1.5, "rsi": 50.0}
+                for i in range(args.ativos)]
+    texto = "\n".join(f"## Seção {i}\n" + "A carteira teve uma semana de ajustes setoriais. " * 12 for i in range(6))
+    relatorio   = {"gerado_em": datetime.now().strftime("%d/%m/%Y às %H:%M"), "analise": texto, "recomendacoes": texto}
+    correlacoes = {"IBOV": {"variacao": 1.2, "atual": 130000.0}, "Dólar": {"variacao": -0.4, "atual": 5.4},
+                   "BTC": {"variacao": 3.1, "atual": 65000.0}}
+
+    gerar_pdf(cotacoes, relatorio, correlacoes)  # importa o ReportLab e monta os estilos fora da medição
+    rss_antes = _rss_pico_mb(resource.RUSAGE_SELF)
+    inicio = time.perf_counter()
+    for _ in range(args.relatorios):
+        gerar_pdf(cotacoes, relatorio, correlacoes)
+    sequencial = (time.perf_counter() - inicio) / args.relatorios
+    print(f"Sequencial: {sequencial * 1000:.1f} ms/relatório · RSS pico {_rss_pico_mb(resource.RUSAGE_SELF):.0f} MB "
+          f"(+{_rss_pico_mb(resource.RUSAGE_SELF) - rss_antes:.1f} MB em {args.relatorios} relatórios)")
+
+    with tempfile.TemporaryDirectory() as pasta:
+        inicio = time.perf_counter()
+        gerar_pdfs([(cotacoes, relatorio, correlacoes, os.path.join(pasta, f"{i}.pdf")) for i in range(args.relatorios)],
+                   processos=args.processos)
+        total = time.perf_counter() - inicio
+    print(f"Pool ({args.processos or os.cpu_count()} processos): {total * 1000 / args.relatorios:.1f} ms/relatório "
+          f"({total:.2f} s no total, com a partida dos processos) · RSS pico por processo {_rss_pico_mb(resource.RUSAGE_CHILDREN):.0f} MB")
+    return 0
+
+
+def _gravar_fixtures(args) -> int:
+    from carteira.benchmark import gravar_fixtures
+
+    gravar_fixtures(args.destino, periodo=args.periodo, avisar=lambda msg: print(msg, file=sys.stderr, flush=True))
+    return 0
+
+
+def _benchmark(args) -> int:
+    from carteira.benchmark import comparar, executar_benchmark
+
+    if args.sintetico is None and not os.path.exists(os.path.join(args.fixtures, "fixtures.json")):
+        print(f"❌ Sem fixtures em {args.fixtures} (grave com: python -m carteira gravar-fixtures, ou use --sintetico).", file=sys.stderr)
+        return 2
+    tamanhos  = [int(n) for n in args.tamanhos.split(",")]
+    resultado = executar_benchmark(args.fixtures, tamanhos, args.repeticoes, avisar=lambda msg: print(msg, file=sys.stderr, flush=True),
+                                   semente=args.sintetico)
+    saida = args.saida or os.path.join("benchmarks", "resultados", f"{datetime.now():%Y%m%d_%H%M}_{resultado['commit'] or 'sem_commit'}.json")
+    os.makedirs(os.path.dirname(saida) or ".", exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    for n, medido in resultado["tamanhos"].items():
+        print(f"\n{n} ativos" + (f" — falhou: {medido['erro'][0]}" if "erro" in medido else ""))
+        for nome, m in medido.get("funcoes", {}).items():
+            print(f"   {nome:<30}{m['mediana_s'] * 1000:>11.1f} ms  (mín. {m['minimo_s'] * 1000:.1f})")
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            anterior = json.load(f)
+        print(f"\nComparado com {anterior.get('commit')} ({anterior.get('data')}):")
+        for n, nome, antes, agora, razao, regressao in comparar(resultado, anterior):
+            print(f"   {n:>5} {nome:<30}{antes * 1000:>10.1f} → {agora * 1000:>10.1f} ms  {razao:5.2f}x" + (" ⚠️" if regressao else ""))
+    print(f"\n📄 Resultado salvo em {saida}", file=sys.stderr)
+    return 0 if all("erro" not in m for m in resultado["tamanhos"].values()) else 1
+
+
+def _exportar_fonte(args) -> int:
+    from carteira.config import ATIVOS, FONTE_MERCADO, INDICES_MACRO
+    from carteira.fontes import exportar_fonte, fonte_mercado
+
+    print(f"📦 Exportando {len(ATIVOS)} ativos e os índices macro da fonte {FONTE_MERCADO}...", file=sys.stderr)
+    exportar_fonte(fonte_mercado(), list(ATIVOS) + list(INDICES_MACRO.values()), args.destino, args.formato, args.periodo,
+                   avisar=lambda msg: print(msg, file=sys.stderr, flush=True))
+    return 0
+
+
+def _universo_sintetico(args) -> int:
+    from carteira.fontes import universo_sintetico
+    from carteira.universo import gravar_universo
+
+    gravar_universo(universo_sintetico(args.ativos, args.semente), args.saida)
+    print(f"📄 Universo de {args.ativos} ações sintéticas salvo em {args.saida} "
+          f"(use CARTEIRA_UNIVERSO={args.saida} CARTEIRA_FONTE=sintetica:{args.semente})", file=sys.stderr)
+    return 0
+
+
+def main(argv=None) -> int:
+    logging.getLogger("LiteLLM").setLevel(logging.CRITICAL)
+    warnings.filterwarnings("ignore")
+    parser = argparse.ArgumentParser(prog="python -m carteira", description="Carteira Inteligente sem interface.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("relatorio", help="gera o relatório completo (PDF, Markdown e JSON)")
+    p.add_argument("--saida", default="relatorios", help="diretório de saída (padrão: relatorios)")
+    p.add_argument("--sem-ia", action="store_true", help="só coleta e indicadores, sem chamadas ao Groq")
+    p.add_argument("--refazer-ia", action="store_true", help="ignora o cache de respostas da IA")
+    p.add_argument("--metricas", metavar="ARQ", help="grava as métricas no formato do Prometheus em ARQ")
+    p.set_defaults(func=_relatorio)
+
+    p = sub.add_parser("lote", help="gera o relatório de cada carteira de cliente com uma única coleta de mercado")
+    p.add_argument("clientes", help="diretório com um CSV/TOML de ativos por cliente")
+    p.add_argument("--saida", default="relatorios", help="diretório de saída (padrão: relatorios)")
+    p.add_argument("--sem-ia", action="store_true", help="só coleta e indicadores, sem chamadas ao Groq")
+    p.add_argument("--refazer-ia", action="store_true", help="ignora o cache de respostas da IA")
+    p.add_argument("--processos", type=int, default=None, help="processos para gerar os PDFs (padrão: nº de CPUs)")
+    p.add_argument("--metricas", metavar="ARQ", help="grava as métricas no formato do Prometheus em ARQ")
+    p.set_defaults(func=_lote)
+
+    p = sub.add_parser("agendar", help="gera o relatório após o fechamento da B3 e grava snapshots")
+    p.add_argument("--agora", action="store_true", help="gera um snapshot imediatamente e sai")
+    p.add_argument("--uma-vez", action="store_true", help="espera só a próxima rodada agendada e sai")
+    p.add_argument("--metricas", metavar="ARQ", help="grava as métricas no formato do Prometheus em ARQ (a cada rodada)")
+    p.set_defaults(func=_agendar)
+
+    p = sub.add_parser("inicio", help="mede o tempo de importação do núcleo contra o orçamento")
+    p.add_argument("--orcamento", type=float, default=ORCAMENTO_IMPORTACAO_S, help="orçamento em segundos")
+    p.set_defaults(func=_inicio)
+
+    p = sub.add_parser("benchmark-pdf", help="mede tempo e memória da geração de PDFs")
+    p.add_argument("--relatorios", type=int, default=24, help="quantidade de relatórios (padrão: 24)")
+    p.add_argument("--ativos", type=int, default=7, help="ativos por relatório (padrão: 7)")
+    p.add_argument("--processos", type=int, default=None, help="processos do pool (padrão: nº de CPUs)")
+    p.set_defaults(func=_benchmark_pdf)
+
+    p = sub.add_parser("gravar-fixtures", help="grava as respostas do Yahoo para o benchmark offline (precisa de rede)")
+    p.add_argument("destino", nargs="?", default=os.path.join("benchmarks", "fixtures"), help="diretório (padrão: benchmarks/fixtures)")
+    p.add_argument("--periodo", default="5y", help="histórico de preços gravado (padrão: 5y)")
+    p.set_defaults(func=_gravar_fixtures)
+
+    p = sub.add_parser("benchmark", help="mede buscas, indicadores, PDF, gráficos e o relatório completo sem rede")
+    p.add_argument("--fixtures", default=os.path.join("benchmarks", "fixtures"), help="diretório das fixtures (padrão: benchmarks/fixtures)")
+    p.add_argument("--tamanhos", default="7,100,1000", help="quantidades de ativos, separadas por vírgula (padrão: 7,100,1000)")
+    p.add_argument("--repeticoes", type=int, default=5, help="execuções medidas por função (padrão: 5)")
+    p.add_argument("--saida", default=None, help="arquivo JSON do resultado (padrão: benchmarks/resultados/<data>_<commit>.json)")
+    p.add_argument("--comparar", metavar="ARQ", default=None, help="resultado anterior para comparar as medianas")
+    p.add_argument("--sintetico", type=int, nargs="?", const=0, default=None, metavar="SEMENTE",
+                   help="usa universo e dados sintéticos em vez das fixtures")
+    p.set_defaults(func=_benchmark)
+
+    p = sub.add_parser("exportar-fonte", help="grava os dados do universo num diretório Parquet/CSV (CARTEIRA_FONTE=arquivos:DIR)")
+    p.add_argument("destino", help="diretório de destino")
+    p.add_argument("--formato", choices=["parquet", "csv"], default="parquet", help="formato dos arquivos (padrão: parquet)")
+    p.add_argument("--periodo", default="max", help="histórico diário exportado (padrão: max)")
+    p.set_defaults(func=_exportar_fonte)
+
+    p = sub.add_parser("universo-sintetico", help="grava um universo de ações fictícias para CARTEIRA_FONTE=sintetica")
+    p.add_argument("ativos", type=int, help="quantidade de ações")
+    p.add_argument("--saida", default="universo_sintetico.csv", help="arquivo CSV (padrão: universo_sintetico.csv)")
+    p.add_argument("--semente", type=int, default=0, help="semente do gerador (padrão: 0)")
+    p.set_defaults(func=_universo_sintetico)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+"""Geração agendada do relatório depois do fechamento da B3, gravada como snapshot."""
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from carteira.config import DIA_CORTE_SEMANAL, FUSO_B3, HORARIO_AGENDA
+from carteira.medicoes import medir
+from carteira.pipeline import etapas_relatorio, executar_pipeline
+from carteira.snapshots import salvar_snapshot
+
+
+def proxima_execucao(agora=None):
+    """(horário, motivo) da próxima rodada: todo pregão no HORARIO_AGENDA; no dia de corte o motivo é 'semanal'.
+
+    Feriados da B3 não são descontados; nesses dias o relatório sai igual ao do pregão anterior.
+    """
+    agora = agora or datetime.now(ZoneInfo(FUSO_B3))
+    hora, minuto = map(int, HORARIO_AGENDA.split(":"))
+    alvo = agora.replace(hour=hora, minute=minuto, second=0, microsecond=0)
+    if alvo <= agora:
+        alvo += timedelta(days=1)
+    while alvo.weekday() >= 5:
+        alvo += timedelta(days=1)
+    return alvo, "semanal" if alvo.weekday() == DIA_CORTE_SEMANAL else "diario"
+
+
+def gerar_snapshot(api_key, motivo="manual", ao_iniciar=None, ao_concluir=None, ao_medir=None):
+    """Roda o relatório completo e grava o snapshot; devolve (id, resultado). Se alguma etapa faltar, nada é gravado.
+
+    `ao_medir(span)` recebe o span raiz da execução, já concluído.
+    """
+    etapas = etapas_relatorio(api_key)
+    with medir("relatorio", motivo=motivo) as raiz:
+        res = executar_pipeline(etapas, ao_iniciar=ao_iniciar, ao_concluir=ao_concluir)
+    if ao_medir:
+        ao_medir(raiz)
+    if not set(etapas) <= set(res):
+        return None, res
+    return salvar_snapshot(res, motivo), res
+
+
+def agendar(api_key, uma_vez=False, avisar=print, ao_medir=None):
+    """Laço do agendador: dorme até a próxima rodada, gera o snapshot e repete."""
+    while True:
+        alvo, motivo = proxima_execucao()
+        avisar(f"⏰ Próximo relatório ({motivo}) em {alvo:%d/%m/%Y %H:%M}")
+        while (espera := (alvo - datetime.now(alvo.tzinfo)).total_seconds()) > 0:
+            time.sleep(min(espera, 600))
+        try:
+            id_snapshot, _ = gerar_snapshot(api_key, motivo, ao_medir=ao_medir)
+            avisar(f"✅ Snapshot {id_snapshot} gravado" if id_snapshot else "⚠️ Relatório incompleto; snapshot não gravado")
+        except Exception as erro:
+            avisar(f"⚠️ Relatório agendado falhou: {erro}")
+        if uma_vez:
+            return
@@ -0,0 +1,193 @@
+"""Bancos SQLite locais: histórico de preços, proventos e resultados trimestrais, caches de fundamentos, sentimento e LLM, e snapshots do relatório."""
+import os
+import sqlite3
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+from carteira.config import (DADOS_DIR, PRECOS_DB, DIVIDENDOS_DB, RESULTADOS_DB, FUNDAMENTOS_DB, SENTIMENTOS_DB, LLM_CACHE_DB,
+                             SNAPSHOTS_DB, LOTE_SQL)
+from carteira.universo import em_lotes
+
+CAMPOS_OHLCV = ["Open", "High", "Low", "Close", "Volume"]
+
+
+def _conectar(caminho, esquema):
+    os.makedirs(DADOS_DIR, exist_ok=True)
+    con = sqlite3.connect(caminho, timeout=30)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.executescript(esquema)
+    return con
+
+
+def conectar_precos():
+    return _conectar(PRECOS_DB, """CREATE TABLE IF NOT EXISTS precos (
+        ticker TEXT NOT NULL, data TEXT NOT NULL,
+        open REAL, high REAL, low REAL, close REAL, volume REAL,
+        PRIMARY KEY (ticker, data))""")
+
+
+def conectar_dividendos():
+    # `cobertura` guarda até que data o histórico de cada ticker já foi consultado, com ou sem eventos
+    return _conectar(DIVIDENDOS_DB, """CREATE TABLE IF NOT EXISTS dividendos (
+        ticker TEXT NOT NULL, data TEXT NOT NULL, valor REAL NOT NULL,
+        PRIMARY KEY (ticker, data));
+        CREATE TABLE IF NOT EXISTS cobertura (
+        ticker TEXT PRIMARY KEY, ate TEXT NOT NULL, consultado_em REAL NOT NULL)""")
+
+
+def conectar_resultados():
+    # `agenda` guarda a próxima divulgação conhecida e quando o ticker foi consultado pela última vez
+    return _conectar(RESULTADOS_DB, """CREATE TABLE IF NOT EXISTS trimestres (
+        ticker TEXT NOT NULL, trimestre TEXT NOT NULL, receita REAL, lucro REAL,
+        PRIMARY KEY (ticker, trimestre));
+        CREATE TABLE IF NOT EXISTS agenda (
+        ticker TEXT PRIMARY KEY, proxima_data TEXT, atualizado_em REAL NOT NULL)""")
+
+
+def conectar_fundamentos():
+    return _conectar(FUNDAMENTOS_DB, """CREATE TABLE IF NOT EXISTS fundamentos (
+        ticker TEXT PRIMARY KEY, dados TEXT NOT NULL, atualizado_em REAL NOT NULL)""")
+
+
+def conectar_sentimentos():
+    return _conectar(SENTIMENTOS_DB, """CREATE TABLE IF NOT EXISTS sentimentos (
+        chave TEXT PRIMARY KEY, resultado TEXT NOT NULL, criado_em REAL NOT NULL)""")
+
+
+def conectar_llm_cache():
+    return _conectar(LLM_CACHE_DB, """CREATE TABLE IF NOT EXISTS respostas (
+        chave TEXT PRIMARY KEY, resposta TEXT NOT NULL, tamanho INTEGER NOT NULL,
+        criado_em REAL NOT NULL, acessado_em REAL NOT NULL)""")
+
+
+def conectar_snapshots():
+    return _conectar(SNAPSHOTS_DB, """CREATE TABLE IF NOT EXISTS snapshots (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, gerado_em TEXT NOT NULL, semana TEXT NOT NULL,
+        motivo TEXT NOT NULL, dados TEXT NOT NULL, pdf BLOB)""")
+
+
+def ultimas_datas(tickers) -> dict:
+    """Última data salva de cada ticker que já tem histórico no banco."""
+    tickers = list(dict.fromkeys(tickers))
+    if not tickers:
+        return {}
+    ultimas = {}
+    with closing(conectar_precos()) as con:
+        for lote in em_lotes(tickers, LOTE_SQL):
+            ultimas.update(con.execute(
+                f"SELECT ticker, MAX(data) FROM precos WHERE ticker IN ({','.join('?' * len(lote))}) GROUP BY ticker",
+                lote).fetchall())
+    return ultimas
+
+
+def primeiras_datas(tickers) -> dict:
+    """Data mais antiga salva de cada ticker que já tem histórico no banco."""
+    tickers = list(dict.fromkeys(tickers))
+    primeiras = {}
+    with closing(conectar_precos()) as con:
+        for lote in em_lotes(tickers, LOTE_SQL):
+            primeiras.update(con.execute(
+                f"SELECT ticker, MIN(data) FROM precos WHERE ticker IN ({','.join('?' * len(lote))}) GROUP BY ticker",
+                lote).fetchall())
+    return primeiras
+
+
+def gravar_precos(df: pd.DataFrame, tickers) -> int:
+    """Grava (ou substitui) os pregões do frame largo (ticker, campo) para os tickers pedidos."""
+    linhas = []
+    datas  = df.index.strftime("%Y-%m-%d").to_numpy()
+    for t in tickers:
+        if t not in df.columns.get_level_values(0):
+            continue
+        valores = df[t][CAMPOS_OHLCV].to_numpy(dtype=float)
+        validas = ~np.isnan(valores[:, CAMPOS_OHLCV.index("Close")])
+        valores = valores[validas].astype(object)
+        valores[pd.isna(valores)] = None
+        linhas += zip([t] * len(valores), datas[validas], *valores.T.tolist())
+    with closing(conectar_precos()) as con, con:
+        con.executemany("INSERT OR REPLACE INTO precos VALUES (?,?,?,?,?,?,?)", linhas)
+    return len(linhas)
+
+
+def ler_precos(tickers, desde=None) -> pd.DataFrame:
+    """Lê o histórico salvo em disco no mesmo formato largo (ticker, campo) de baixar_precos."""
+    tickers = list(dict.fromkeys(tickers))
+    if not tickers:
+        return pd.DataFrame()
+    filtro = " AND data >= ?" if desde is not None else ""
+    extra  = [str(desde)[:10]] if desde is not None else []
+    with closing(conectar_precos()) as con:
+        df = pd.concat([pd.read_sql_query(
+            f"SELECT ticker, data, open, high, low, close, volume FROM precos WHERE ticker IN ({','.join('?' * len(lote))}){filtro}",
+            con, params=lote + extra, parse_dates=["data"]) for lote in em_lotes(tickers, LOTE_SQL)], ignore_index=True)
+    if df.empty:
+        return pd.DataFrame()
+    df = df.rename(columns=dict(zip(["open", "high", "low", "close", "volume"], CAMPOS_OHLCV)))
+    largo = df.pivot(index="data", columns="ticker", values=CAMPOS_OHLCV).swaplevel(axis=1)
+    salvos = set(df["ticker"])
+    return largo.reindex(columns=pd.MultiIndex.from_product([[t for t in tickers if t in salvos], CAMPOS_OHLCV]))
+
+
+def cobertura_dividendos(tickers) -> dict:
+    """{ticker: (última data consultada, epoch da consulta)} dos tickers que já passaram pelo livro de proventos."""
+    tickers = list(dict.fromkeys(tickers))
+    cobertura = {}
+    with closing(conectar_dividendos()) as con:
+        for lote in em_lotes(tickers, LOTE_SQL):
+            cobertura.update((t, (ate, em)) for t, ate, em in con.execute(
+                f"SELECT ticker, ate, consultado_em FROM cobertura WHERE ticker IN ({','.join('?' * len(lote))})", lote))
+    return cobertura
+
+
+def gravar_dividendos(eventos, cobertura) -> int:
+    """Grava (ou substitui) os eventos [(ticker, data, valor)] e a cobertura [(ticker, ate, consultado_em)]."""
+    with closing(conectar_dividendos()) as con, con:
+        con.executemany("INSERT OR REPLACE INTO dividendos VALUES (?,?,?)", eventos)
+        con.executemany("INSERT OR REPLACE INTO cobertura VALUES (?,?,?)", cobertura)
+    return len(eventos)
+
+
+def ler_dividendos(tickers, desde=None) -> pd.DataFrame:
+    """Livro de proventos (ticker, data, valor por cota) dos tickers, em ordem de data."""
+    tickers = list(dict.fromkeys(tickers))
+    filtro = " AND data >= ?" if desde is not None else ""
+    extra  = [str(desde)[:10]] if desde is not None else []
+    with closing(conectar_dividendos()) as con:
+        partes = [pd.read_sql_query(
+            f"SELECT ticker, data, valor FROM dividendos WHERE ticker IN ({','.join('?' * len(lote))}){filtro}",
+            con, params=lote + extra, parse_dates=["data"]) for lote in em_lotes(tickers, LOTE_SQL)]
+    if not partes:
+        return pd.DataFrame(columns=["ticker", "data", "valor"])
+    return pd.concat(partes, ignore_index=True).sort_values(["data", "ticker"], ignore_index=True)
+
+
+def agenda_resultados(tickers) -> dict:
+    """{ticker: (próxima divulgação ou None, epoch da última consulta)} dos tickers já consultados."""
+    tickers = list(dict.fromkeys(tickers))
+    agenda = {}
+    with closing(conectar_resultados()) as con:
+        for lote in em_lotes(tickers, LOTE_SQL):
+            agenda.update((t, (p, em)) for t, p, em in con.execute(
+                f"SELECT ticker, proxima_data, atualizado_em FROM agenda WHERE ticker IN ({','.join('?' * len(lote))})", lote))
+    return agenda
+
+
+def gravar_resultados(ticker, trimestres, proxima_data, atualizado_em):
+    """Grava (ou substitui) os trimestres [(trimestre, receita, lucro)] do ticker e a agenda dele."""
+    with closing(conectar_resultados()) as con, con:
+        con.executemany("INSERT OR REPLACE INTO trimestres VALUES (?,?,?,?)", [(ticker, *t) for t in trimestres])
+        con.execute("INSERT OR REPLACE INTO agenda VALUES (?,?,?)", (ticker, proxima_data, atualizado_em))
+
+
+def ler_trimestres(tickers) -> pd.DataFrame:
+    """Trimestres salvos (ticker, trimestre, receita, lucro), do mais recente para o mais antigo."""
+    tickers = list(dict.fromkeys(tickers))
+    with closing(conectar_resultados()) as con:
+        partes = [pd.read_sql_query(
+            f"SELECT ticker, trimestre, receita, lucro FROM trimestres WHERE ticker IN ({','.join('?' * len(lote))})",
+            con, params=lote) for lote in em_lotes(tickers, LOTE_SQL)]
+    if not partes:
+        return pd.DataFrame(columns=["ticker", "trimestre", "receita", "lucro"])
+    return pd.concat(partes, ignore_index=True).sort_values(["ticker", "trimestre"], ascending=[True, False], ignore_index=True)
@@ -0,0 +1,420 @@
+"""Benchmark offline: respostas gravadas do Yahoo e respostas prontas do Groq, em 7, 100 e 1000 ativos.
+
+`gravar_fixtures` consulta o Yahoo uma vez (precisa de rede) e guarda num
+diretório os preços diários com proventos, o intradiário de 5 dias e, por
+ticker, info, dividends, news, calendar e quarterly_financials. `reproduzir`
+troca yf.download e yf.Ticker por versões que servem essas gravações e sobe um
+servidor HTTP local no lugar do Groq, então o SDK do Groq e o CrewAI rodam o
+caminho real com respostas fixas.
+
+Para chegar a N ativos, os gravados são repetidos com nomes novos (PETR3.SA,
+PETR3_1.SA, ...) e OHLC multiplicado por um passeio aleatório de semente fixa.
+As datas são deslocadas em semanas inteiras até a semana atual, para que as
+janelas relativas a hoje enxerguem sempre o mesmo volume de dados.
+
+Sem fixtures, a FonteSintetica (carteira.fontes) gera universo e dados de
+qualquer tamanho, o que permite medir indicadores, gráficos e PDF em escala de
+produção; só o Groq continua servido localmente.
+
+Cada tamanho roda num processo novo, com universo e banco local próprios
+(`executar_benchmark`); o resultado é um JSON com o commit, a mediana e o mínimo
+de cada função e o tempo por etapa do relatório completo.
+"""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from carteira.config import INDICES_MACRO, RAIZ_PROJETO
+from carteira.fontes import recortar_periodo, universo_sintetico
+from carteira.universo import carregar_universo, gravar_universo
+
+FIXTURES_PADRAO = os.path.join(RAIZ_PROJETO, "benchmarks", "fixtures")
+TAMANHOS_PADRAO = (7, 100, 1000)
+CAMPOS_TICKER   = ("info", "dividends", "news", "calendar", "quarterly_financials")
+VAZIOS_TICKER   = {"info": dict, "dividends": lambda: pd.Series(dtype=float), "news": list, "calendar": dict,
+                   "quarterly_financials": pd.DataFrame}
+CAMPOS_OHLC     = ["Open", "High", "Low", "Close"]
+
+# Respostas prontas do Groq: o sentimento segue o JSON pedido em _pontuar_sentimento;
+# o texto serve à avaliação de resultados e, com o prefixo do ReAct, aos agentes do CrewAI
+RESPOSTAS_GROQ = {
+    "sentimento": {"score": 6.5, "sentimento_geral": "Otimista", "impacto_resumo": "Notícias mistas com viés positivo. "
+                   "O mercado reagiu bem ao último trimestre.",
+                   "noticias": [{"indice": i, "sentimento": "Otimista" if i % 2 else "Neutro", "prazo": "Curto"} for i in range(1, 6)]},
+    "texto": "## Panorama\n" + "A carteira teve uma semana de ajustes setoriais, com bancos em alta e commodities em baixa. " * 8
+             + "\n\n## Perspectivas\n" + "O cenário segue dependente de juros e câmbio. " * 6,
+}
+
+# ══════════════════════════════════════════════════════════════
+# GRAVAÇÃO
+# ══════════════════════════════════════════════════════════════
+
+def _ler_atributo(ticker, campo):
+    try:
+        return getattr(ticker, campo)
+    except Exception:
+        return None
+
+
+def gravar_fixtures(destino=FIXTURES_PADRAO, ativos=None, periodo="5y", avisar=print):
+    """Grava em `destino` as respostas do Yahoo para os ativos (padrão: o universo) e os índices macro."""
+    import yfinance as yf
+
+    from carteira.config import ATIVOS
+
+    ativos  = ativos or ATIVOS
+    tickers = list(ativos) + [t for t in INDICES_MACRO.values() if t not in ativos]
+    os.makedirs(destino, exist_ok=True)
+    avisar(f"📥 Preços diários ({periodo}) de {len(tickers)} tickers...")
+    precos = yf.download(tickers, period=periodo, group_by="ticker", auto_adjust=True, actions=True, progress=False, threads=True)
+    avisar("📥 Intradiário de 5 dias...")
+    intradiario = yf.download(list(ativos), period="5d", interval="5m", group_by="ticker", auto_adjust=True,
+                              progress=False, threads=True)
+    por_ticker = {}
+    for i, t in enumerate(ativos, 1):
+        avisar(f"📥 {t} ({i}/{len(ativos)})")
+        tk = yf.Ticker(t)
+        por_ticker[t] = {campo: _ler_atributo(tk, campo) for campo in CAMPOS_TICKER}
+    pd.to_pickle(precos, os.path.join(destino, "precos.pkl.gz"))
+    pd.to_pickle(intradiario, os.path.join(destino, "intradiario.pkl.gz"))
+    pd.to_pickle(por_ticker, os.path.join(destino, "tickers.pkl.gz"))
+    gravar_universo(ativos, os.path.join(destino, "universo.csv"))
+    with open(os.path.join(destino, "fixtures.json"), "w", encoding="utf-8") as f:
+        json.dump({"gravado_em": datetime.now().isoformat(timespec="seconds"), "periodo": periodo, "ativos": len(ativos),
+                   "yfinance": yf.__version__, "groq": RESPOSTAS_GROQ}, f, ensure_ascii=False, indent=2)
+    avisar(f"✅ Fixtures de {len(ativos)} ativos gravadas em {destino}")
+
+
+# ══════════════════════════════════════════════════════════════
+# REPRODUÇÃO
+# ══════════════════════════════════════════════════════════════
+
+def _nome_copia(ticker, copia):
+    if copia == 0:
+        return ticker
+    return f"{ticker[:-3]}_{copia}.SA" if ticker.endswith(".SA") else f"{ticker}_{copia}"
+
+
+def ampliar_universo(ativos: dict, n: int):
+    """Universo de `n` ativos repetindo os gravados; devolve ({ticker: ativo}, {ticker: (ticker gravado, cópia)})."""
+    gravados = list(ativos)
+    universo, origem = {}, {}
+    for i in range(n):
+        base, copia = gravados[i % len(gravados)], i // len(gravados)
+        nome = _nome_copia(base, copia)
+        universo[nome] = dict(ativos[base], ticker=nome, nome=ativos[base]["nome"] + (f" {copia}" if copia else ""))
+        origem[nome]   = (base, copia)
+    return universo, origem
+
+
+def _ampliar_precos(df, origem):
+    """Frame largo com uma cópia perturbada das colunas do ticker gravado para cada ticker ampliado."""
+    if df is None or df.empty:
+        return pd.DataFrame()
+    gravados = set(df.columns.get_level_values(0))
+    partes   = [df[[c for c in df.columns if c[0] not in origem or origem[c[0]][1] == 0]]]
+    for nome, (base, copia) in origem.items():
+        if copia == 0 or base not in gravados:
+            continue
+        parte  = df[base].copy()
+        fator  = np.exp(np.cumsum(np.random.default_rng(copia).normal(0, 0.01, len(parte))))
+        campos = [c for c in CAMPOS_OHLC if c in parte.columns]
+        parte[campos] = parte[campos].mul(fator, axis=0)
+        parte.columns = pd.MultiIndex.from_product([[nome], parte.columns])
+        partes.append(parte)
+    return pd.concat(partes, axis=1)
+
+
+def _deslocamento(indice) -> timedelta:
+    """Semanas inteiras entre o último pregão gravado e hoje (mantém os dias da semana)."""
+    ultimo = pd.Timestamp(indice.max()).date()
+    return timedelta(weeks=max(0, (date.today() - ultimo).days // 7))
+
+
+def _deslocar(valor, delta):
+    if isinstance(valor, (pd.Series, pd.DataFrame)):
+        valor = valor.copy()
+        if isinstance(valor.index, pd.DatetimeIndex):
+            valor.index = valor.index + delta
+        if isinstance(valor, pd.DataFrame) and isinstance(valor.columns, pd.DatetimeIndex):
+            valor.columns = valor.columns + delta
+        return valor
+    if isinstance(valor, dict):
+        return {k: _deslocar(v, delta) for k, v in valor.items()}
+    if isinstance(valor, list):
+        return [_deslocar(v, delta) for v in valor]
+    if isinstance(valor, (date, pd.Timestamp)):
+        return valor + delta
+    return valor
+
+
+class _ServidorGroq:
+    """Servidor HTTP local compatível com chat.completions que devolve as RESPOSTAS_GROQ."""
+
+    def __init__(self, respostas):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        sentimento = json.dumps(respostas["sentimento"], ensure_ascii=False)
+        texto      = respostas["texto"]
+
+        class Tratador(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                pedido    = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                mensagens = pedido.get("messages", [])
+                if mensagens and "Responda SOMENTE em JSON" in str(mensagens[-1].get("content") or ""):
+                    conteudo = sentimento
+                elif any(m.get("role") == "system" for m in mensagens):
+                    conteudo = f"Thought: I now can give a great answer\nFinal Answer: {texto}"
+                else:
+                    conteudo = texto
+                corpo = json.dumps({"id": "benchmark", "object": "chat.completion", "created": int(time.time()),
+                                    "model": pedido.get("model", ""), "choices": [{"index": 0, "finish_reason": "stop",
+                                    "message": {"role": "assistant", "content": conteudo}}],
+                                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+        self.servidor = ThreadingHTTPServer(("127.0.0.1", 0), Tratador)
+        self.servidor.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.servidor.server_port}"
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+
+    def fechar(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+
+def _carregar_fixtures(pasta):
+    with open(os.path.join(pasta, "fixtures.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    return (meta, pd.read_pickle(os.path.join(pasta, "precos.pkl.gz")), pd.read_pickle(os.path.join(pasta, "intradiario.pkl.gz")),
+            pd.read_pickle(os.path.join(pasta, "tickers.pkl.gz")), carregar_universo(os.path.join(pasta, "universo.csv")))
+
+
+@contextmanager
+def reproduzir(fixtures=FIXTURES_PADRAO, n=None):
+    """Serve yf.download, yf.Ticker e o Groq a partir das fixtures, com o universo ampliado para `n` ativos.
+
+    Devolve o universo ampliado. O GROQ_BASE_URL aponta para o servidor local
+    enquanto o contexto estiver aberto.
+    """
+    import yfinance as yf
+
+    meta, precos, intradiario, por_ticker, gravados = _carregar_fixtures(fixtures)
+    universo, origem = ampliar_universo(gravados, n or len(gravados))
+    delta       = _deslocamento(precos.index)
+    precos      = _deslocar(_ampliar_precos(precos, origem), delta)
+    intradiario = _deslocar(_ampliar_precos(intradiario, origem), _deslocamento(intradiario.index) if not intradiario.empty else delta)
+    por_ticker  = {t: _deslocar(campos, delta) for t, campos in por_ticker.items()}
+
+    def download(tickers, period=None, start=None, interval="1d", actions=False, **kwargs):
+        tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+        fonte   = precos if interval == "1d" else intradiario
+        colunas = [c for c in fonte.columns if c[0] in tickers and (actions or c[1] not in ("Dividends", "Stock Splits"))]
+        return recortar_periodo(fonte[colunas], period, start, interval).dropna(how="all")
+
+    class Ticker:
+        def __init__(self, ticker, session=None, **kwargs):
+            gravado = por_ticker.get(origem.get(ticker, (ticker, 0))[0]) or {}
+            for campo, vazio in VAZIOS_TICKER.items():
+                setattr(self, campo, gravado.get(campo) if gravado.get(campo) is not None else vazio())
+
+    originais = (yf.download, yf.Ticker)
+    yf.download, yf.Ticker = download, Ticker
+    try:
+        with groq_local(meta.get("groq", RESPOSTAS_GROQ)):
+            yield universo
+    finally:
+        yf.download, yf.Ticker = originais
+
+
+@contextmanager
+def groq_local(respostas=RESPOSTAS_GROQ):
+    """Aponta o GROQ_BASE_URL para um _ServidorGroq enquanto o contexto estiver aberto."""
+    anterior = os.environ.get("GROQ_BASE_URL")
+    groq     = _ServidorGroq(respostas)
+    os.environ["GROQ_BASE_URL"] = groq.url
+    try:
+        yield groq
+    finally:
+        if anterior is None:
+            os.environ.pop("GROQ_BASE_URL", None)
+        else:
+            os.environ["GROQ_BASE_URL"] = anterior
+        groq.fechar()
+
+# ══════════════════════════════════════════════════════════════
+# MEDIÇÃO
+# ══════════════════════════════════════════════════════════════
+
+def _cronometrar(funcao, repeticoes, preparar=None) -> dict:
+    """Mediana e mínimo de `repeticoes` execuções, depois de uma execução de aquecimento fora da conta."""
+    funcao()
+    tempos = []
+    for _ in range(repeticoes):
+        if preparar:
+            preparar()
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return {"mediana_s": round(statistics.median(tempos), 6), "minimo_s": round(min(tempos), 6), "execucoes": repeticoes}
+
+
+def medir_tamanho(fixtures, n, repeticoes=5) -> dict:
+    """Tempos de um universo de `n` ativos. Roda no processo filho de executar_benchmark (CARTEIRA_UNIVERSO
+    e CARTEIRA_DADOS_DIR já apontando para o universo ampliado e um banco vazio). Sem `fixtures`, os dados
+    vêm da fonte de CARTEIRA_FONTE e só o Groq é servido localmente."""
+    from carteira import dados, graficos
+    from carteira.compartilhado import limpar_compartilhado
+    from carteira.config import ATIVOS, GROQ_API_KEY
+    from carteira.indicadores import calcular_indicadores, rsi_wilder
+    from carteira.medicoes import medir, resumo_etapas
+    from carteira.pdf import gerar_pdf
+    from carteira.pipeline import etapas_relatorio, executar_pipeline
+    from carteira.armazenamento import ler_precos
+
+    with (reproduzir(fixtures, n) if fixtures else groq_local()) as universo:
+        if fixtures and list(universo) != list(ATIVOS):
+            raise RuntimeError("CARTEIRA_UNIVERSO não corresponde ao universo ampliado das fixtures")
+        # Relatório completo: primeiro com o banco vazio, depois como um novo clique com tudo em disco e, por
+        # último, como outra sessão que encontra as buscas ainda válidas no cache compartilhado do processo
+        with medir("relatorio") as raiz:
+            inicio = time.perf_counter()
+            res    = executar_pipeline(etapas_relatorio(GROQ_API_KEY))
+            frio   = time.perf_counter() - inicio
+        faltando = sorted(set(etapas_relatorio(GROQ_API_KEY)) - set(res))
+        if faltando:
+            raise RuntimeError(f"Etapas sem resultado: {', '.join(faltando)}")
+        funcoes = {"relatorio_completo_frio": {"mediana_s": round(frio, 6), "minimo_s": round(frio, 6), "execucoes": 1},
+                   "relatorio_completo": _cronometrar(lambda: executar_pipeline(etapas_relatorio(GROQ_API_KEY)), repeticoes,
+                                                      limpar_compartilhado),
+                   "relatorio_completo_compartilhado": _cronometrar(lambda: executar_pipeline(etapas_relatorio(GROQ_API_KEY)),
+                                                                    repeticoes)}
+
+        cotacoes = res["cotacoes"]
+        acao     = next(c for c in cotacoes if c["classe"] == "acao")
+        t, nome  = acao["ticker_sa"], acao["nome"]
+        precos   = ler_precos(ATIVOS.keys(), desde=(datetime.now() - timedelta(days=400)).date())
+        fech     = precos.xs("Close", axis=1, level=1)
+        medicoes = {
+            "buscar_cotacoes":             lambda: dados.buscar_cotacoes(ATIVOS),
+            "buscar_correlacoes":          dados.buscar_correlacoes,
+            "buscar_correlacoes_carteira": lambda: dados.buscar_correlacoes_carteira(ATIVOS),
+            "buscar_correlacao_movel":     lambda: dados.buscar_correlacao_movel(t),
+            "buscar_dividendos":           lambda: dados.buscar_dividendos(ATIVOS),
+            "buscar_proventos":            lambda: dados.buscar_proventos(cotacoes, ATIVOS),
+            "buscar_resultados":           lambda: dados.buscar_resultados(ATIVOS),
+            "prefetch_fundamentals":       lambda: dados.prefetch_fundamentals(ATIVOS.keys()),
+            "buscar_fundamentals":         lambda: dados.buscar_fundamentals(t),
+            "buscar_historico_1A":         lambda: dados.buscar_historico(t, "1A"),
+            "buscar_historico_max":        lambda: dados.buscar_historico(t, "Máx"),
+            "buscar_noticias":             lambda: dados.buscar_noticias(t, nome),
+            "calcular_indicadores":        lambda: calcular_indicadores(precos),
+            "rsi_wilder":                  lambda: rsi_wilder(fech),
+            "gerar_pdf":                   lambda: gerar_pdf(cotacoes, res["relatorio"], res["correlacoes"]),
+        }
+        medicoes["buscar_intradiario"] = lambda: dados.buscar_intradiario(t)
+        # As buscas são medidas sem o cache compartilhado: cada execução faz o trabalho dela
+        for nome_medicao, funcao in medicoes.items():
+            funcoes[nome_medicao] = _cronometrar(funcao, repeticoes, limpar_compartilhado)
+
+        # Construção das figuras sem o cache por impressão digital (__wrapped__)
+        serie_max = dados.buscar_historico(t, "Máx")
+        janela    = res["correlacoes_carteira"]["janela"]
+        movel     = dados.buscar_correlacao_movel(t, janela)
+        figuras = {
+            "grafico_barras":            (cotacoes,),
+            "grafico_setores":           (cotacoes,),
+            "grafico_heatmap":           (cotacoes,),
+            "grafico_comparativo":       (cotacoes,),
+            "grafico_correlacao":        (res["correlacoes"],),
+            "grafico_matriz_correlacao": (res["correlacoes_carteira"]["matriz"],),
+            "grafico_linha":             (acao["historico"], acao["ticker"]),
+            "grafico_historico":         (serie_max, acao["ticker"], "Máx"),
+            "grafico_correlacao_movel":  (movel, acao["ticker"], janela),
+            "grafico_proventos":         (res["proventos"]["calendario"],),
+        }
+        for nome_grafico, args in figuras.items():
+            construir = getattr(graficos, nome_grafico).__wrapped__
+            funcoes[nome_grafico] = _cronometrar(lambda: construir(*args), repeticoes)
+    return {"ativos": len(ATIVOS), "funcoes": funcoes, "etapas_frio": resumo_etapas(raiz.id)}
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ_PROJETO, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def executar_benchmark(fixtures=FIXTURES_PADRAO, tamanhos=TAMANHOS_PADRAO, repeticoes=5, avisar=print, semente=None) -> dict:
+    """Mede cada tamanho num processo novo, com universo ampliado e banco local vazios, sem rede.
+
+    Com `semente`, as fixtures são ignoradas: o universo e os dados vêm da FonteSintetica.
+    """
+    if semente is None:
+        with open(os.path.join(fixtures, "fixtures.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        gravados = carregar_universo(os.path.join(fixtures, "universo.csv"))
+        origem   = {"fixtures": os.path.abspath(fixtures), "gravado_em": meta.get("gravado_em"), "ativos": len(gravados)}
+        fonte, universo = "yahoo", lambda n: ampliar_universo(gravados, n)[0]
+    else:
+        fixtures, origem = None, {"fonte": f"sintetica:{semente}"}
+        fonte, universo  = f"sintetica:{semente}", lambda n: universo_sintetico(n, semente)
+    resultado = {"commit": _commit(), "data": datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(),
+                 "plataforma": platform.platform(), "cpus": os.cpu_count(), "repeticoes": repeticoes, "dados": origem,
+                 "tamanhos": {}}
+    for n in tamanhos:
+        avisar(f"⏱️ {n} ativos...")
+        with tempfile.TemporaryDirectory(prefix="carteira_benchmark_") as pasta:
+            gravar_universo(universo(n), os.path.join(pasta, "universo.csv"))
+            saida  = os.path.join(pasta, "resultado.json")
+            codigo = ("import json\n"
+                      "from carteira.benchmark import medir_tamanho\n"
+                      f"resultado = medir_tamanho({fixtures and os.path.abspath(fixtures)!r}, {n}, {repeticoes})\n"
+                      f"json.dump(resultado, open({saida!r}, 'w', encoding='utf-8'))")
+            ambiente = dict(os.environ, CARTEIRA_FONTE=fonte, CARTEIRA_UNIVERSO=os.path.join(pasta, "universo.csv"),
+                            CARTEIRA_DADOS_DIR=os.path.join(pasta, "dados"), GROQ_API_KEY="benchmark",
+                            CARTEIRA_GROQ_RPM="1000000", CARTEIRA_MEDICOES_JSONL="", OTEL_SDK_DISABLED="true",
+                            CREWAI_TELEMETRY_OPT_OUT="1", LITELLM_LOCAL_MODEL_COST_MAP="True")
+            proc = subprocess.run([sys.executable, "-c", codigo], cwd=RAIZ_PROJETO, env=ambiente, capture_output=True, text=True)
+            if proc.returncode != 0 or not os.path.exists(saida):
+                resultado["tamanhos"][str(n)] = {"erro": proc.stderr.strip().splitlines()[-1:] or ["sem saída"]}
+                avisar(f"⚠️ {n} ativos falhou: {resultado['tamanhos'][str(n)]['erro'][0]}")
+                continue
+            with open(saida, encoding="utf-8") as f:
+                resultado["tamanhos"][str(n)] = json.load(f)
+    return resultado
+
+
+def comparar(atual: dict, anterior: dict, tolerancia=0.10) -> list:
+    """Linhas (tamanho, função, mediana anterior, mediana atual, razão) das funções medidas nos dois resultados;
+    razão acima de 1 + `tolerancia` é regressão."""
+    linhas = []
+    for n, medido in atual["tamanhos"].items():
+        antes = anterior.get("tamanhos", {}).get(n, {}).get("funcoes", {})
+        for nome, m in medido.get("funcoes", {}).items():
+            if nome in antes and antes[nome]["mediana_s"] > 0:
+                razao = m["mediana_s"] / antes[nome]["mediana_s"]
+                linhas.append((int(n), nome, antes[nome]["mediana_s"], m["mediana_s"], razao, razao > 1 + tolerancia))
+    return linhas
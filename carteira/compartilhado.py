@@ -0,0 +1,122 @@
+"""Buscas compartilhadas por todas as sessões do processo: resultado com validade e requisições coalescidas.
+
+Uma função decorada com `compartilhado` é chaveada pelo nome e pelos
+argumentos. Chamadas idênticas ao mesmo tempo viram uma só busca (single-flight):
+a primeira executa e as outras esperam o resultado dela. O resultado fica
+COMPARTILHADO_TTL segundos em memória (no máximo COMPARTILHADO_MAX, os menos
+usados saem primeiro). Cada chamada recebe uma cópia profunda do guardado, então
+uma sessão pode alterar o que recebeu sem afetar as outras. Erros não são
+guardados: vão para quem estava esperando e a próxima chamada tenta de novo.
+"""
+import copy
+import functools
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from carteira.config import COMPARTILHADO_MAX, COMPARTILHADO_TTL
+from carteira.medicoes import registrar_coletor
+
+_RESULTADOS   = OrderedDict()  # (função, impressão dos argumentos) -> (expira_em, valor)
+_EM_ANDAMENTO = {}             # mesma chave -> _Busca
+_LOCK         = threading.Lock()
+_CONTADORES   = {}             # função -> {"acertos", "faltas", "coalescidas", "erros"}
+
+
+class _Busca:
+    __slots__ = ("pronta", "valor", "erro")
+
+    def __init__(self):
+        self.pronta = threading.Event()
+        self.valor  = None
+        self.erro   = None
+
+
+def _chave(nome, args, kwargs) -> tuple:
+    texto = json.dumps([args, kwargs], sort_keys=True, ensure_ascii=False, default=str)
+    return nome, hashlib.sha256(texto.encode()).hexdigest()
+
+
+def compartilhado(ttl=None):
+    """Decorador: a função passa a ser servida pelo cache do processo (validade `ttl` s, padrão COMPARTILHADO_TTL)."""
+    def decorar(funcao):
+        nome       = funcao.__name__
+        validade   = COMPARTILHADO_TTL if ttl is None else ttl
+        contadores = _CONTADORES.setdefault(nome, {"acertos": 0, "faltas": 0, "coalescidas": 0, "erros": 0})
+
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            chave = _chave(nome, args, kwargs)
+            with _LOCK:
+                guardado = _RESULTADOS.get(chave)
+                acerto   = guardado is not None and guardado[0] > time.monotonic()
+                if acerto:
+                    _RESULTADOS.move_to_end(chave)
+                    contadores["acertos"] += 1
+                else:
+                    busca = _EM_ANDAMENTO.get(chave)
+                    dona  = busca is None
+                    if dona:
+                        busca = _EM_ANDAMENTO[chave] = _Busca()
+                    contadores["faltas" if dona else "coalescidas"] += 1
+            # A cópia sai fora do lock: é o que mais custa num acerto
+            if acerto:
+                return copy.deepcopy(guardado[1])
+            if not dona:
+                busca.pronta.wait()
+                if busca.erro is not None:
+                    raise busca.erro
+                return copy.deepcopy(busca.valor)
+            try:
+                busca.valor = funcao(*args, **kwargs)
+            except BaseException as e:
+                busca.erro = e
+                raise
+            finally:
+                with _LOCK:
+                    del _EM_ANDAMENTO[chave]
+                    if busca.erro is None:
+                        _RESULTADOS[chave] = (time.monotonic() + validade, busca.valor)
+                        _RESULTADOS.move_to_end(chave)
+                        while len(_RESULTADOS) > COMPARTILHADO_MAX:
+                            _RESULTADOS.popitem(last=False)
+                    else:
+                        contadores["erros"] += 1
+                busca.pronta.set()
+            return copy.deepcopy(busca.valor)
+        return envolvida
+    return decorar
+
+
+def info_compartilhado() -> dict:
+    """Por função: acertos, faltas (buscas executadas), coalescidas (esperaram uma busca igual), erros e resultados válidos."""
+    agora = time.monotonic()
+    with _LOCK:
+        info = {nome: {**c, "guardados": 0} for nome, c in _CONTADORES.items()}
+        for (nome, _), (expira_em, _) in _RESULTADOS.items():
+            info[nome]["guardados"] += expira_em > agora
+    return info
+
+
+def limpar_compartilhado():
+    """Descarta os resultados guardados (as buscas em andamento terminam normalmente)."""
+    with _LOCK:
+        _RESULTADOS.clear()
+
+
+def _prometheus() -> list:
+    info   = info_compartilhado()
+    linhas = ["# HELP carteira_compartilhado_total Chamadas às buscas compartilhadas por resultado (acerto, falta, coalescida, erro).",
+              "# TYPE carteira_compartilhado_total counter"]
+    for nome, c in sorted(info.items()):
+        linhas += [f'carteira_compartilhado_total{{funcao="{nome}",resultado="{rotulo}"}} {c[campo]}'
+                   for rotulo, campo in (("acerto", "acertos"), ("falta", "faltas"), ("coalescida", "coalescidas"), ("erro", "erros"))]
+    linhas += ["# HELP carteira_compartilhado_guardados Resultados válidos em memória por função.",
+               "# TYPE carteira_compartilhado_guardados gauge"]
+    linhas += [f'carteira_compartilhado_guardados{{funcao="{nome}"}} {c["guardados"]}' for nome, c in sorted(info.items())]
+    return linhas
+
+
+registrar_coletor(_prometheus)
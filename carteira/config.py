@@ -0,0 +1,77 @@
+"""Universo monitorado e parâmetros lidos de variáveis de ambiente."""
+import os
+
+from dotenv import load_dotenv
+
+from carteira.universo import carregar_universo
+
+load_dotenv()
+
+# ══════════════════════════════════════════════════════════════
+# CARTEIRA
+# ══════════════════════════════════════════════════════════════
+RAIZ_PROJETO     = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UNIVERSO_ARQUIVO = os.getenv("CARTEIRA_UNIVERSO", os.path.join(RAIZ_PROJETO, "universo.csv"))
+ATIVOS           = carregar_universo(UNIVERSO_ARQUIVO)
+
+INDICES_MACRO = {"IBOV": "^BVSP", "Dólar": "USDBRL=X", "BTC": "BTC-USD"}
+# De onde vêm os dados de mercado: "yahoo", "arquivos:DIR" (Parquet/CSV) ou "sintetica[:SEMENTE]"
+FONTE_MERCADO = os.getenv("CARTEIRA_FONTE", "yahoo")
+
+# ══════════════════════════════════════════════════════════════
+# ARMAZENAMENTO LOCAL
+# ══════════════════════════════════════════════════════════════
+DADOS_DIR       = os.getenv("CARTEIRA_DADOS_DIR", os.path.join(RAIZ_PROJETO, ".dados"))
+PRECOS_DB       = os.path.join(DADOS_DIR, "precos.sqlite")
+FUNDAMENTOS_DB  = os.path.join(DADOS_DIR, "fundamentos.sqlite")
+FUNDAMENTOS_TTL = float(os.getenv("CARTEIRA_FUNDAMENTOS_TTL_HORAS", "12")) * 3600
+DIVIDENDOS_DB   = os.path.join(DADOS_DIR, "dividendos.sqlite")
+DIVIDENDOS_TTL  = float(os.getenv("CARTEIRA_DIVIDENDOS_TTL_HORAS", "12")) * 3600
+RESULTADOS_DB   = os.path.join(DADOS_DIR, "resultados.sqlite")
+RESULTADOS_VALIDADE_DIAS = float(os.getenv("CARTEIRA_RESULTADOS_VALIDADE_DIAS", "30"))
+SENTIMENTOS_DB  = os.path.join(DADOS_DIR, "sentimentos.sqlite")
+LLM_CACHE_DB    = os.path.join(DADOS_DIR, "llm_cache.sqlite")
+SNAPSHOTS_DB    = os.path.join(DADOS_DIR, "snapshots.sqlite")
+SNAPSHOTS_DIAS  = float(os.getenv("CARTEIRA_SNAPSHOTS_DIAS", "35"))
+GRAFICOS_CACHE_MAX = int(os.getenv("CARTEIRA_GRAFICOS_CACHE", "256"))
+# Buscas compartilhadas entre as sessões do processo: validade (s) e máximo de resultados guardados
+COMPARTILHADO_TTL = float(os.getenv("CARTEIRA_COMPARTILHADO_TTL", "300"))
+COMPARTILHADO_MAX = int(os.getenv("CARTEIRA_COMPARTILHADO_MAX", "512"))
+MEDICOES_MAX    = int(os.getenv("CARTEIRA_MEDICOES_MAX", "5000"))  # spans concluídos guardados em memória
+MEDICOES_JSONL  = os.getenv("CARTEIRA_MEDICOES_JSONL", "")           # arquivo para gravar cada span em JSON lines
+LLM_CACHE_ATIVO = os.getenv("CARTEIRA_LLM_CACHE", "1") != "0"
+LLM_CACHE_DIAS  = float(os.getenv("CARTEIRA_LLM_CACHE_DIAS", "7"))
+LLM_CACHE_MB    = float(os.getenv("CARTEIRA_LLM_CACHE_MB", "50"))
+PERIODO_INICIAL = "2y"
+PERIODO_INICIAL_DIVIDENDOS = "5y"
+PONTOS_GRAFICO  = int(os.getenv("CARTEIRA_PONTOS_GRAFICO", "600"))
+# Tamanho dos lotes: tickers por download de preços e parâmetros por consulta IN no SQLite
+LOTE_DOWNLOAD   = int(os.getenv("CARTEIRA_LOTE_DOWNLOAD", "100"))
+LOTE_SQL        = 500
+
+# ══════════════════════════════════════════════════════════════
+# AGENDA (horário de Brasília)
+# ══════════════════════════════════════════════════════════════
+FUSO_B3           = "America/Sao_Paulo"
+HORARIO_AGENDA    = os.getenv("CARTEIRA_HORARIO_AGENDA", "18:30")
+DIA_CORTE_SEMANAL = int(os.getenv("CARTEIRA_DIA_CORTE", "4"))  # 0 = segunda ... 4 = sexta
+
+# ══════════════════════════════════════════════════════════════
+# ENVIOS
+# ══════════════════════════════════════════════════════════════
+TELEGRAM_API      = os.getenv("CARTEIRA_TELEGRAM_API", "https://api.telegram.org")
+SMTP_HOST         = os.getenv("CARTEIRA_SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT         = int(os.getenv("CARTEIRA_SMTP_PORT", "465"))  # 465 = SSL; outras portas usam STARTTLS se oferecido
+TENTATIVAS_ENVIO  = int(os.getenv("CARTEIRA_TENTATIVAS_ENVIO", "4"))
+ENVIO_ESPERA_BASE = float(os.getenv("CARTEIRA_ENVIO_ESPERA", "2"))  # segundos; dobra a cada tentativa
+ENVIO_OCIOSO_S    = 60  # conexões fechadas depois desse tempo sem envios
+
+# ══════════════════════════════════════════════════════════════
+# GROQ
+# ══════════════════════════════════════════════════════════════
+GROQ_API_KEY       = os.getenv("GROQ_API_KEY", "")
+MODELO_GROQ        = "llama-3.3-70b-versatile"
+TENTATIVAS_GROQ    = 5
+ESPERA_GROQ_S      = 1.0  # base do backoff exponencial nas falhas transitórias (5xx, timeout, conexão)
+GROQ_RPM           = int(os.getenv("CARTEIRA_GROQ_RPM", "30"))
+GROQ_CONCORRENCIA  = int(os.getenv("CARTEIRA_GROQ_CONCORRENCIA", "3"))
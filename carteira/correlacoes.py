@@ -0,0 +1,143 @@
+"""Correlação e beta móveis da carteira contra IBOV, dólar e BTC, e a matriz ativo × ativo.
+
+Tudo sai de seis somas por par (n, Σx, Σy, Σxy, Σx², Σy²) contadas só nos dias
+em que os dois lados têm retorno. No histórico inteiro elas viram somas
+acumuladas e produtos de matrizes; num pregão novo basta somar a contribuição
+dele e subtrair a do pregão que saiu da janela.
+"""
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+JANELA_CORRELACAO = 63
+
+
+def retornos_diarios(fech: pd.DataFrame, calendario=None) -> pd.DataFrame:
+    """Retornos diários no calendário dado (pregões da B3); dias sem preço ficam NaN.
+
+    Ativos que negociam fora do calendário (BTC) têm os dias extras absorvidos
+    no retorno do pregão seguinte.
+    """
+    if calendario is not None:
+        fech = fech.ffill().reindex(calendario).where(fech.reindex(calendario).notna())
+    return fech.pct_change(fill_method=None).iloc[1:]
+
+
+def _contribuicoes(x, y, por_pregao=False):
+    """As seis somas de todos os pares (ativo de x, série de y), empilhadas no primeiro eixo.
+
+    x: N e y: F para um pregão; x: T×N e y: T×F para um bloco, somado em T ou,
+    com `por_pregao`, devolvido pregão a pregão (6 × T × N × F).
+    """
+    mx, my = ~np.isnan(x), ~np.isnan(y)
+    x0, y0 = np.where(mx, x, 0.0), np.where(my, y, 0.0)
+    mx, my = mx.astype(float), my.astype(float)
+    if x.ndim == 1:
+        produto = np.outer
+    elif por_pregao:
+        produto = lambda a, b: a[:, :, None] * b[:, None, :]
+    else:
+        produto = lambda a, b: a.T @ b
+    return np.stack([produto(mx, my), produto(x0, my), produto(mx, y0),
+                     produto(x0, y0), produto(x0 * x0, my), produto(mx, y0 * y0)])
+
+
+def _estatisticas(somas, minimo):
+    """(correlação, beta de x contra y) a partir das somas empilhadas; NaN com menos de `minimo` pares."""
+    n, sx, sy, sxy, sxx, syy = somas
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov  = n * sxy - sx * sy
+        varx = n * sxx - sx * sx
+        vary = n * syy - sy * sy
+        corr = np.where((n >= minimo) & (varx > 0) & (vary > 0), cov / np.sqrt(varx * vary), np.nan)
+        beta = np.where((n >= minimo) & (vary > 0), cov / vary, np.nan)
+    return np.clip(corr, -1, 1), beta
+
+
+def correlacao_beta_movel(ret_ativos: pd.DataFrame, ret_fatores: pd.DataFrame, janela=JANELA_CORRELACAO, minimo=None):
+    """Séries de correlação e beta móveis de cada ativo contra cada fator.
+
+    Devolve dois frames indexados por data com colunas (ativo, fator).
+    """
+    minimo = minimo or janela // 2
+    x, y   = ret_ativos.to_numpy(dtype=float), ret_fatores.to_numpy(dtype=float)
+    # Somas acumuladas no tempo; a soma da janela é a diferença para `janela` pregões atrás
+    acum = np.cumsum(_contribuicoes(x, y, por_pregao=True), axis=1)
+    antes = np.zeros_like(acum)
+    antes[:, janela:] = acum[:, :-janela]
+    corr, beta = _estatisticas(acum - antes, minimo)
+    colunas = pd.MultiIndex.from_product([ret_ativos.columns, ret_fatores.columns])
+    formato = (len(x), -1)
+    return (pd.DataFrame(corr.reshape(formato), index=ret_ativos.index, columns=colunas),
+            pd.DataFrame(beta.reshape(formato), index=ret_ativos.index, columns=colunas))
+
+
+def matriz_correlacao(retornos: pd.DataFrame, janela=JANELA_CORRELACAO, minimo=None) -> pd.DataFrame:
+    """Correlação ativo × ativo nos últimos `janela` pregões, par a par nos dias em comum."""
+    minimo = minimo or janela // 2
+    bloco  = retornos.iloc[-janela:].to_numpy(dtype=float)
+    corr, _ = _estatisticas(_contribuicoes(bloco, bloco), minimo)
+    return pd.DataFrame(corr, index=retornos.columns, columns=retornos.columns)
+
+
+class MotorCorrelacao:
+    """Janela deslizante de correlação/beta contra os fatores e da matriz ativo × ativo.
+
+    `carregar` monta a janela a partir do histórico; `atualizar` recebe só os
+    pregões novos (ou o último pregão revisado) e ajusta as somas em O(N²) por pregão.
+    """
+
+    def __init__(self, ativos, fatores, janela=JANELA_CORRELACAO, minimo=None):
+        self.ativos, self.fatores = list(ativos), list(fatores)
+        self.janela  = janela
+        self.minimo  = minimo or janela // 2
+        self.pregoes = deque()
+        self._somas_fatores = np.zeros((6, len(self.ativos), len(self.fatores)))
+        self._somas_matriz  = np.zeros((6, len(self.ativos), len(self.ativos)))
+
+    @property
+    def ultima_data(self):
+        return self.pregoes[-1][0] if self.pregoes else None
+
+    def _linhas(self, ret_ativos, ret_fatores):
+        x = ret_ativos.reindex(columns=self.ativos).to_numpy(dtype=float)
+        y = ret_fatores.reindex(index=ret_ativos.index, columns=self.fatores).to_numpy(dtype=float)
+        return zip(ret_ativos.index, x, y)
+
+    def _somar(self, x, y, sinal):
+        self._somas_fatores += sinal * _contribuicoes(x, y)
+        self._somas_matriz  += sinal * _contribuicoes(x, x)
+
+    def carregar(self, ret_ativos: pd.DataFrame, ret_fatores: pd.DataFrame):
+        ret_ativos = ret_ativos.iloc[-self.janela:]
+        self.pregoes = deque(self._linhas(ret_ativos, ret_fatores))
+        x = np.array([p[1] for p in self.pregoes]).reshape(-1, len(self.ativos))
+        y = np.array([p[2] for p in self.pregoes]).reshape(-1, len(self.fatores))
+        self._somas_fatores = _contribuicoes(x, y)
+        self._somas_matriz  = _contribuicoes(x, x)
+        return self
+
+    def atualizar(self, ret_ativos: pd.DataFrame, ret_fatores: pd.DataFrame):
+        """Aplica os pregões novos; o último pregão da janela, se vier de novo, é substituído (candle parcial)."""
+        for data, x, y in self._linhas(ret_ativos, ret_fatores):
+            if self.pregoes and data < self.ultima_data:
+                continue
+            if self.pregoes and data == self.ultima_data:
+                _, x_velho, y_velho = self.pregoes.pop()
+                self._somar(x_velho, y_velho, -1)
+            elif len(self.pregoes) == self.janela:
+                _, x_velho, y_velho = self.pregoes.popleft()
+                self._somar(x_velho, y_velho, -1)
+            self.pregoes.append((data, x, y))
+            self._somar(x, y, +1)
+        return self
+
+    def correlacao_beta(self):
+        corr, beta = _estatisticas(self._somas_fatores, self.minimo)
+        return (pd.DataFrame(corr, index=self.ativos, columns=self.fatores),
+                pd.DataFrame(beta, index=self.ativos, columns=self.fatores))
+
+    def matriz(self) -> pd.DataFrame:
+        corr, _ = _estatisticas(self._somas_matriz, self.minimo)
+        return pd.DataFrame(corr, index=self.ativos, columns=self.ativos)
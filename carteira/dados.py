@@ -0,0 +1,463 @@
+"""Coleta de dados de mercado pela fonte configurada (carteira.fontes), com histórico, proventos, fundamentos e resultados em cache local."""
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from carteira.amostragem import reduzir_serie
+from carteira.armazenamento import (agenda_resultados, cobertura_dividendos, conectar_fundamentos, gravar_dividendos, gravar_precos,
+                                    gravar_resultados, ler_dividendos, ler_precos, ler_trimestres, primeiras_datas,
+                                    ultimas_datas)
+from carteira.compartilhado import compartilhado
+from carteira.config import (ATIVOS, INDICES_MACRO, DIVIDENDOS_TTL, FUNDAMENTOS_TTL, LOTE_DOWNLOAD, LOTE_SQL, PERIODO_INICIAL,
+                             PERIODO_INICIAL_DIVIDENDOS, PONTOS_GRAFICO, RESULTADOS_VALIDADE_DIAS)
+from carteira.correlacoes import JANELA_CORRELACAO, MotorCorrelacao, correlacao_beta_movel, retornos_diarios
+from carteira.indicadores import HORIZONTES, calcular_indicadores
+from carteira.fontes import CAMPOS_ACOES, FUNDAMENTOS_VAZIOS, fonte_mercado
+from carteira.medicoes import medido, no_contexto
+from carteira.proventos import metricas_proventos, projetar_proventos
+from carteira.universo import em_lotes, ticker_curto
+
+@medido()
+def baixar_precos(tickers, periodo="1mo", inicio=None, lote=LOTE_DOWNLOAD, intervalo="1d", acoes=False) -> pd.DataFrame:
+    """Baixa o OHLCV em lotes de até `lote` tickers por requisição, como um frame largo (ticker, campo).
+
+    Com `acoes`, cada ticker traz também os campos Dividends e Stock Splits. Um
+    lote que falha só deixa seus tickers de fora do resultado.
+    """
+    fonte  = fonte_mercado()
+    partes = []
+    for grupo in em_lotes(tickers, lote):
+        try:
+            df = fonte.precos(grupo, periodo=periodo, inicio=inicio, intervalo=intervalo, acoes=acoes)
+        except Exception:
+            continue
+        if not df.empty:
+            partes.append(df)
+    return pd.concat(partes, axis=1).sort_index() if partes else pd.DataFrame()
+
+
+def _com_eventos(df: pd.DataFrame, tickers) -> list:
+    """Tickers do frame baixado com `acoes` que têm desdobramento ou provento em algum pregão."""
+    presentes = set(df.columns.get_level_values(0))
+    return [t for t in tickers if t in presentes and df[t].reindex(columns=CAMPOS_ACOES).fillna(0).ne(0).any().any()]
+
+
+@medido()
+def atualizar_precos(tickers) -> int:
+    """Baixa só os pregões a partir da última data salva de cada ticker e grava no banco local.
+
+    Os preços vêm ajustados por desdobramentos e proventos, e um evento novo
+    reajusta todo o histórico anterior na fonte. Quando a janela baixada traz um
+    evento, o ticker é baixado de novo desde o primeiro pregão salvo, para que o
+    banco não misture bases de ajuste (o que apareceria como um salto falso).
+    """
+    tickers = list(dict.fromkeys(tickers))
+    ultimas = ultimas_datas(tickers)
+    # Tickers com a mesma última data compartilham um único download em lote;
+    # o último pregão salvo é baixado de novo para substituir um candle parcial.
+    grupos = {}
+    for t in tickers:
+        grupos.setdefault(ultimas.get(t), []).append(t)
+    gravados, reajustar = 0, []
+    for inicio, grupo in grupos.items():
+        try:
+            df = baixar_precos(grupo, periodo=PERIODO_INICIAL, inicio=inicio, acoes=inicio is not None)
+        except Exception:
+            continue
+        if df.empty:
+            continue
+        eventos    = _com_eventos(df, grupo) if inicio is not None else []
+        reajustar += eventos
+        gravados  += gravar_precos(df, [t for t in grupo if t not in eventos])
+    # O download completo substitui (INSERT OR REPLACE) cada pregão salvo pela base de ajuste atual
+    primeiras = primeiras_datas(reajustar)
+    grupos    = {}
+    for t in reajustar:
+        grupos.setdefault(primeiras[t], []).append(t)
+    for inicio, grupo in grupos.items():
+        try:
+            df = baixar_precos(grupo, periodo="max", inicio=inicio)
+        except Exception:
+            continue
+        if not df.empty:
+            gravados += gravar_precos(df, grupo)
+    return gravados
+
+
+# Dias de calendário de cada período do gráfico de preço; None é todo o histórico
+PERIODOS_GRAFICO = {"1M": 31, "6M": 183, "1A": 366, "5A": 1827, "Máx": None}
+INTRADIARIO_TTL  = 300
+
+_HISTORICO_COMPLETADO = set()
+_HISTORICO_LOCK       = threading.Lock()
+
+
+def _completar_historico(ticker_str, desde):
+    """Baixa uma vez por processo os pregões anteriores ao início do banco quando o período pede mais história."""
+    chave = (ticker_str, desde)
+    with _HISTORICO_LOCK:
+        if chave in _HISTORICO_COMPLETADO:
+            return
+        _HISTORICO_COMPLETADO.add(chave)
+    primeira = primeiras_datas([ticker_str]).get(ticker_str)
+    if primeira is not None and desde is not None and str(desde) >= primeira:
+        return
+    df = baixar_precos([ticker_str], periodo="max", inicio=str(desde) if desde else None)
+    if not df.empty:
+        gravar_precos(df, [ticker_str])
+
+
+@compartilhado()
+@medido()
+def buscar_historico(ticker_str: str, periodo="1A", pontos=PONTOS_GRAFICO) -> pd.Series:
+    """Fechamentos diários do período, do banco local, reduzidos por LTTB a no máximo `pontos`."""
+    dias  = PERIODOS_GRAFICO[periodo]
+    desde = None if dias is None else (datetime.now() - timedelta(days=dias)).date()
+    _completar_historico(ticker_str, desde)
+    precos = ler_precos([ticker_str], desde=desde)
+    if precos.empty:
+        return pd.Series(dtype=float)
+    return reduzir_serie(precos[ticker_str]["Close"], pontos)
+
+
+@compartilhado(ttl=INTRADIARIO_TTL)
+@medido()
+def buscar_intradiario(ticker_str: str, intervalo="5m", pontos=PONTOS_GRAFICO) -> pd.Series:
+    """Fechamentos intradiários dos últimos 5 pregões (não vão para o banco; ficam INTRADIARIO_TTL s em memória)."""
+    df    = baixar_precos([ticker_str], periodo="5d", intervalo=intervalo)
+    serie = df[ticker_str]["Close"].dropna() if not df.empty else pd.Series(dtype=float)
+    return reduzir_serie(serie, pontos)
+
+
+def _arred(valor, casas=2):
+    return None if pd.isna(valor) else round(float(valor), casas)
+
+
+@compartilhado()
+@medido()
+def buscar_cotacoes(ativos=None) -> list:
+    ativos     = ativos or ATIVOS
+    resultados = []
+    atualizar_precos(ativos.keys())
+    # Um ano de pregões: aquece o RSI de Wilder e cobre os retornos de todos os horizontes
+    precos = ler_precos(ativos.keys(), desde=(datetime.now() - timedelta(days=400)).date())
+    ind    = calcular_indicadores(precos)
+    for ticker_str, ativo in ativos.items():
+        # Ativo suspenso ou deslistado: os últimos pregões dele não são desta semana
+        if ticker_str not in ind.index or ind.at[ticker_str, "pregoes"] < 2 or ind.at[ticker_str, "defasado"]:
+            continue
+        i    = ind.loc[ticker_str]
+        hist = precos[ticker_str]["Close"].dropna().tail(5)
+        resultados.append({
+            "ticker":       ticker_curto(ticker_str),
+            "ticker_sa":    ticker_str,
+            "nome":         ativo["nome"],
+            "setor":        ativo["setor"],
+            "moeda":        ativo["moeda"],
+            "classe":       ativo["classe"],
+            "abertura":     _arred(i["abertura"]),
+            "atual":        _arred(i["atual"]),
+            "maxima":       _arred(i["maxima"]),
+            "minima":       _arred(i["minima"]),
+            "variacao":     _arred(i["variacao"]),
+            "var_anterior": _arred(i["var_anterior"]) or 0,
+            "volume":       int(i["volume"]) if pd.notna(i["volume"]) else 0,
+            "volatilidade": _arred(i["volatilidade"]) or 0,
+            "maior_queda":  _arred(i["maior_queda"]),
+            "rsi":          _arred(i["rsi"], 1),
+            "retornos":     {h: _arred(i[h]) for h in HORIZONTES},
+            "historico":    [{"data": str(d.date()), "preco": round(float(p), 2)} for d, p in hist.items()],
+        })
+    resultados.sort(key=lambda x: x["variacao"], reverse=True)
+    return resultados
+
+
+def _baixar_fundamentals(ticker_str: str) -> dict:
+    fund = fonte_mercado().fundamentos(ticker_str)
+    with closing(conectar_fundamentos()) as con, con:
+        con.execute("INSERT OR REPLACE INTO fundamentos VALUES (?,?,?)", (ticker_str, json.dumps(fund), time.time()))
+    return fund
+
+
+def _ler_fundamentals(tickers, ttl=FUNDAMENTOS_TTL) -> dict:
+    tickers = list(tickers)
+    if not tickers:
+        return {}
+    linhas = []
+    with closing(conectar_fundamentos()) as con:
+        for lote in em_lotes(tickers, LOTE_SQL):
+            linhas += con.execute(
+                f"SELECT ticker, dados FROM fundamentos WHERE atualizado_em >= ? AND ticker IN ({','.join('?' * len(lote))})",
+                [time.time() - ttl, *lote]).fetchall()
+    return {t: json.loads(d) for t, d in linhas}
+
+
+@compartilhado()
+@medido()
+def buscar_fundamentals(ticker_str: str, ttl=FUNDAMENTOS_TTL) -> dict:
+    """P/L, P/VP, DY e preço-alvo do cache local; só consulta a fonte de mercado quando o registro passou do TTL."""
+    cache = _ler_fundamentals([ticker_str], ttl)
+    if ticker_str in cache:
+        return cache[ticker_str]
+    try:
+        return _baixar_fundamentals(ticker_str)
+    except Exception:
+        # Sem rede, um valor vencido ainda é melhor que zeros
+        return _ler_fundamentals([ticker_str], float("inf")).get(ticker_str, dict(FUNDAMENTOS_VAZIOS))
+
+
+@compartilhado()
+@medido()
+def prefetch_fundamentals(tickers, ttl=FUNDAMENTOS_TTL, max_workers=8) -> dict:
+    """Atualiza em paralelo os tickers vencidos no cache e devolve os fundamentos de todos.
+
+    Só ações têm fundamentos; tickers fora do universo são tratados como ações.
+    """
+    tickers = [t for t in tickers if ATIVOS.get(t, {}).get("classe", "acao") == "acao"]
+    cache   = _ler_fundamentals(tickers, ttl)
+    vencidos = [t for t in tickers if t not in cache]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        cache.update(zip(vencidos, pool.map(no_contexto(buscar_fundamentals), vencidos)))
+    return cache
+
+
+@medido()
+def atualizar_dividendos(tickers) -> int:
+    """Traz para o livro local só os proventos posteriores à última data consultada de cada ticker.
+
+    Tickers consultados há menos de DIVIDENDOS_TTL ficam de fora. Os demais são
+    agrupados pela data de cobertura e baixados em lote com as ações corporativas
+    (PERIODO_INICIAL_DIVIDENDOS na primeira vez); a cobertura avança mesmo sem
+    eventos, então quem não paga proventos não é rebaixado a cada relatório.
+    """
+    tickers = list(dict.fromkeys(tickers))
+    agora   = time.time()
+    cobertura = cobertura_dividendos(tickers)
+    grupos = {}
+    for t in tickers:
+        ate, consultado_em = cobertura.get(t, (None, 0.0))
+        if agora - consultado_em >= DIVIDENDOS_TTL:
+            grupos.setdefault(ate, []).append(t)
+    gravados = 0
+    for inicio, grupo in grupos.items():
+        df = baixar_precos(grupo, periodo=PERIODO_INICIAL_DIVIDENDOS, inicio=inicio, acoes=True)
+        if df.empty:
+            continue
+        eventos, cobertos = [], []
+        for t in grupo:
+            if t not in df.columns.get_level_values(0):
+                continue
+            hist = df[t]
+            if "Dividends" in hist.columns:
+                pagos = hist["Dividends"][hist["Dividends"] > 0]
+                eventos += [(t, str(d.date()), float(v)) for d, v in pagos.items()]
+            ultimo = hist["Close"].last_valid_index()
+            cobertos.append((t, str((df.index[-1] if ultimo is None else ultimo).date()), agora))
+        gravados += gravar_dividendos(eventos, cobertos)
+    return gravados
+
+
+@compartilhado()
+@medido()
+def buscar_dividendos(ativos=None) -> list:
+    """Os 3 proventos mais recentes de cada ativo, lidos do livro local depois da atualização incremental."""
+    ativos = ativos or ATIVOS
+    atualizar_dividendos(ativos.keys())
+    ultimos = ler_dividendos(ativos.keys()).groupby("ticker").tail(3).sort_values("data", ascending=False, kind="stable")
+    return [{"ticker": ticker_curto(t), "nome": ativos[t]["nome"], "data": str(d.date()), "valor": round(float(v), 4)}
+            for t, d, v in ultimos.itertuples(index=False)]
+
+
+@compartilhado()
+@medido()
+def buscar_proventos(cotacoes, ativos=None, meses=12) -> dict:
+    """DY de 12 meses, yield on cost e calendário projetado de proventos, a partir do livro local.
+
+    Usa o preço atual de `cotacoes` e a posição (quantidade, preco_medio) do
+    universo; não faz download. Valores na moeda de cada ativo.
+    """
+    ativos   = ativos or ATIVOS
+    hoje     = pd.Timestamp(datetime.now().date())
+    eventos  = ler_dividendos(ativos.keys(), desde=(hoje - pd.DateOffset(years=1)).date())
+    precos   = pd.Series({c["ticker_sa"]: c["atual"] for c in cotacoes if c["ticker_sa"] in ativos}, dtype=float)
+    posicoes = pd.DataFrame.from_dict(ativos, orient="index")[["quantidade", "preco_medio"]].astype(float)
+    metricas = metricas_proventos(eventos, precos, posicoes, hoje)
+    metricas = metricas[metricas["pagamentos_12m"] > 0].sort_values("dy_12m", ascending=False)
+    agenda   = projetar_proventos(eventos, posicoes, hoje, meses)
+    base     = lambda t: {"ticker": ticker_curto(t), "nome": ativos[t]["nome"], "moeda": ativos[t]["moeda"]}
+    return {
+        "metricas": [{**base(t), "dividendos_12m": _arred(m.dividendos_12m, 4), "pagamentos_12m": int(m.pagamentos_12m),
+                      "dy_12m": _arred(m.dy_12m), "yoc": _arred(m.yoc), "renda_12m": _arred(m.renda_12m)}
+                     for t, m in zip(metricas.index, metricas.itertuples(index=False))],
+        "calendario": [{**base(t), "data": str(d.date()), "valor": _arred(v, 4), "renda": _arred(r)}
+                       for t, d, v, r in agenda[["ticker", "data", "valor", "renda"]].itertuples(index=False)],
+    }
+
+
+@compartilhado()
+@medido()
+def buscar_noticias(ticker_str: str, nome: str) -> list:
+    """Até 5 manchetes recentes do ticker (no formato do Yahoo, ex.: PETR3.SA, BTC-USD)."""
+    try:
+        return fonte_mercado().noticias(ticker_str)[:5]
+    except Exception:
+        return []
+
+
+@compartilhado()
+@medido()
+def buscar_correlacoes() -> dict:
+    dados = {}
+    atualizar_precos(INDICES_MACRO.values())
+    precos = ler_precos(INDICES_MACRO.values(), desde=(datetime.now() - timedelta(days=15)).date())
+    for nome, ticker in INDICES_MACRO.items():
+        try:
+            hist = precos[ticker].dropna(subset=["Close"]).tail(5)
+            if not hist.empty and len(hist) >= 2:
+                ab = float(hist["Close"].iloc[0])
+                fe = float(hist["Close"].iloc[-1])
+                dados[nome] = {"variacao": round(((fe - ab) / ab) * 100, 2), "atual": round(fe, 2)}
+        except Exception:
+            continue
+    return dados
+
+
+@medido()
+def _baixar_resultados(ticker_str):
+    """Consulta o calendário e os trimestres na fonte de mercado e grava no armazém local de resultados."""
+    res = fonte_mercado().resultados(ticker_str)
+    gravar_resultados(ticker_str, res["trimestres"], res["proxima_data"], time.time())
+
+
+def _resultados_vencidos(tickers, validade_dias=RESULTADOS_VALIDADE_DIAS) -> list:
+    """Tickers que precisam ir à fonte: nunca consultados, com a divulgação prevista já passada ou
+    consultados há mais de `validade_dias`."""
+    agenda = agenda_resultados(tickers)
+    hoje   = datetime.now().date().isoformat()
+    limite = time.time() - validade_dias * 86400
+    return [t for t in tickers
+            if t not in agenda or (agenda[t][0] is not None and agenda[t][0] <= hoje) or agenda[t][1] < limite]
+
+
+def _variacao(serie: pd.Series):
+    """Variação % entre os dois últimos trimestres com valor (a série vem do mais recente para o mais antigo)."""
+    serie = serie.dropna()
+    if len(serie) < 2 or not serie.iloc[0] or not serie.iloc[1]:
+        return None
+    return round(((serie.iloc[0] - serie.iloc[1]) / abs(serie.iloc[1])) * 100, 1)
+
+
+@compartilhado()
+@medido()
+def buscar_resultados(ativos=None, max_workers=8, validade_dias=RESULTADOS_VALIDADE_DIAS) -> list:
+    """Próxima divulgação e crescimento de receita e lucro do último trimestre, do armazém local.
+
+    Um ticker só é consultado na fonte quando sua próxima divulgação já passou,
+    quando nunca foi consultado ou quando a consulta tem mais de `validade_dias`;
+    na maioria das semanas a seção sai inteira do disco. Se a consulta falha, o
+    que estiver salvo continua valendo.
+    """
+    ativos = {t: a for t, a in (ativos or ATIVOS).items() if a["classe"] == "acao"}
+    vencidos = _resultados_vencidos(list(ativos), validade_dias)
+    if vencidos:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for fut in [pool.submit(no_contexto(_baixar_resultados), t) for t in vencidos]:
+                try:
+                    fut.result()
+                except Exception:
+                    continue
+    agenda = agenda_resultados(list(ativos))
+    trimestres = dict(tuple(ler_trimestres(list(ativos)).groupby("ticker")))
+    resultados = []
+    for ticker_str, ativo in ativos.items():
+        if ticker_str not in agenda:
+            continue
+        trim = trimestres.get(ticker_str)
+        receitas = trim["receita"].dropna() if trim is not None else pd.Series(dtype=float)
+        lucros   = trim["lucro"].dropna() if trim is not None else pd.Series(dtype=float)
+        resultados.append({
+            "ticker":           ticker_curto(ticker_str),
+            "nome":             ativo["nome"],
+            "setor":            ativo["setor"],
+            "proxima_data":     agenda[ticker_str][0] or "A confirmar",
+            "ultimo_resultado": trim["trimestre"].iloc[0] if trim is not None else "N/D",
+            "var_receita":      _variacao(receitas),
+            "var_lucro":        _variacao(lucros),
+            "receita_atual":    float(receitas.iloc[0]) if len(receitas) >= 2 else None,
+            "lucro_atual":      float(lucros.iloc[0]) if len(lucros) >= 2 else None,
+        })
+    return resultados
+
+
+# Um motor por (universo, janela): chamadas seguintes só aplicam os pregões novos
+_MOTORES_CORRELACAO = {}
+_MOTORES_LOCK       = threading.Lock()
+
+
+def _retornos_carteira(tickers, desde):
+    """Retornos diários dos tickers e dos índices macro (colunas com o nome do índice) no calendário do IBOV."""
+    precos = ler_precos(list(tickers) + list(INDICES_MACRO.values()), desde=desde)
+    if precos.empty:
+        return pd.DataFrame(columns=list(tickers)), pd.DataFrame(columns=list(INDICES_MACRO))
+    fech = precos.xs("Close", axis=1, level=1)
+    ibov = INDICES_MACRO["IBOV"]
+    calendario = fech[ibov].dropna().index if ibov in fech else fech.dropna(how="all").index
+    ret = retornos_diarios(fech, calendario)
+    fatores = ret.reindex(columns=list(INDICES_MACRO.values()))
+    fatores.columns = list(INDICES_MACRO)
+    return ret.reindex(columns=list(tickers)), fatores
+
+
+def _para_json(df, casas=2) -> list:
+    """Linhas do frame arredondadas, com None no lugar de NaN."""
+    return df.round(casas).astype(object).where(df.notna(), None).to_numpy().tolist()
+
+
+@compartilhado()
+@medido()
+def buscar_correlacoes_carteira(ativos=None, janela=JANELA_CORRELACAO) -> dict:
+    """Correlação e beta de cada ativo contra IBOV, dólar e BTC e a matriz entre os ativos, nos últimos `janela` pregões.
+
+    Lê só o banco local: rode depois de buscar_cotacoes e buscar_correlacoes, que o atualizam.
+    """
+    tickers = list(ativos or ATIVOS)
+    chave   = (tuple(tickers), janela)
+    with _MOTORES_LOCK:
+        motor = _MOTORES_CORRELACAO.get(chave)
+        if motor is None or motor.ultima_data is None:
+            ret, fat = _retornos_carteira(tickers, (datetime.now() - timedelta(days=janela * 2 + 30)).date())
+            motor = _MOTORES_CORRELACAO[chave] = MotorCorrelacao(tickers, list(INDICES_MACRO), janela).carregar(ret, fat)
+        else:
+            ret, fat = _retornos_carteira(tickers, (motor.ultima_data - timedelta(days=10)).date())
+            motor.atualizar(ret[ret.index >= motor.ultima_data], fat)
+        if motor.ultima_data is None:
+            return {}
+        corr, beta = (_para_json(df) for df in motor.correlacao_beta())
+        matriz     = _para_json(motor.matriz())
+        data       = str(motor.ultima_data.date())
+    curtos = [ticker_curto(t) for t in tickers]
+    return {
+        "janela":  janela,
+        "data":    data,
+        "fatores": {c: {f: {"correlacao": rc, "beta": rb} for f, rc, rb in zip(INDICES_MACRO, lc, lb)}
+                    for c, lc, lb in zip(curtos, corr, beta)},
+        "matriz":  {"tickers": curtos, "valores": matriz},
+    }
+
+
+@compartilhado()
+@medido()
+def buscar_correlacao_movel(ticker_str: str, janela=JANELA_CORRELACAO, dias=365) -> pd.DataFrame:
+    """Série da correlação móvel de um ativo contra IBOV, dólar e BTC (colunas com o nome do índice)."""
+    ret, fat = _retornos_carteira([ticker_str], (datetime.now() - timedelta(days=dias + janela * 2)).date())
+    if ret.empty:
+        return pd.DataFrame(columns=list(INDICES_MACRO))
+    corr, _ = correlacao_beta_movel(ret, fat, janela)
+    return corr[ticker_str].dropna(how="all").loc[lambda d: d.index >= pd.Timestamp(datetime.now() - timedelta(days=dias))]
+
+
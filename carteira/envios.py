@@ -0,0 +1,316 @@
+"""Envio do relatório pelo Telegram e por e-mail, numa fila com retentativas em segundo plano."""
+import heapq
+import itertools
+import queue
+import smtplib
+import threading
+import time
+from datetime import datetime
+from email import encoders
+from email.mime.base import MIMEBase
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from carteira.config import (ENVIO_ESPERA_BASE, ENVIO_OCIOSO_S, SMTP_HOST, SMTP_PORT, TELEGRAM_API,
+                             TENTATIVAS_ENVIO)
+from carteira.medicoes import medir, registrar_chamada, sessao_instrumentada
+
+ESTADOS_FINAIS = {"enviado", "erro"}
+
+
+class EnvioRecusado(Exception):
+    """Falha que não adianta repetir: credencial inválida, chat ou destinatário recusado."""
+
+
+class _TenteDepois(Exception):
+    def __init__(self, mensagem, espera=None):
+        super().__init__(mensagem)
+        self.espera = espera
+
+
+# ══════════════════════════════════════════════════════════════
+# MENSAGENS
+# ══════════════════════════════════════════════════════════════
+
+def _nome_pdf() -> str:
+    return f"relatorio_b3_{datetime.now().strftime('%Y%m%d')}.pdf"
+
+
+def _texto_telegram(cotacoes, relatorio) -> str:
+    emoji = lambda v: "🟢" if v > 0 else "🔴"
+    linhas = [f"📈 *Analista B3 — {relatorio['gerado_em']}*\n"]
+    for c in cotacoes:
+        linhas.append(f"{emoji(c['variacao'])} *{c['ticker']}* {c['variacao']:+.2f}%")
+    linhas.append(f"\n📊 *Análise:*\n{relatorio['analise'][:500]}...")
+    return "\n".join(linhas)
+
+
+def _mensagem_email(remetente, cotacoes, relatorio, pdf_bytes) -> MIMEMultipart:
+    """Mensagem sem o destinatário; o PDF é codificado uma vez para todo o lote."""
+    msg = MIMEMultipart()
+    msg["From"]    = remetente
+    msg["Subject"] = f"📊 Carteira Inteligente — Relatório Semanal — {relatorio['gerado_em']}"
+    emoji = lambda v: "🟢" if v > 0 else "🔴"
+    html = [f"<h2>📊 Carteira Inteligente — {relatorio['gerado_em']}</h2><hr>"]
+    for c in cotacoes:
+        cor = "#22c55e" if c["variacao"] > 0 else "#ef4444"
+        html.append(f'<p>{emoji(c["variacao"])} <b>{c["ticker"]}</b>: <span style="color:{cor}">{c["variacao"]:+.2f}%</span></p>')
+    html.append(f"<hr><h3>Análise</h3><p>{relatorio['analise'][:800]}...</p>")
+    html.append("<p style='color:#666;font-size:12px'>⚠️ Relatório informativo. Não é consultoria financeira.</p>")
+    msg.attach(MIMEText("\n".join(html), "html"))
+    part = MIMEBase("application", "octet-stream")
+    part.set_payload(pdf_bytes)
+    encoders.encode_base64(part)
+    part.add_header("Content-Disposition", f"attachment; filename={_nome_pdf()}")
+    msg.attach(part)
+    return msg
+
+
+# ══════════════════════════════════════════════════════════════
+# CANAIS (uma sessão HTTP e uma conexão SMTP por remetente, reaproveitadas)
+# ══════════════════════════════════════════════════════════════
+
+class _CanalTelegram:
+    def __init__(self):
+        self._sessao = None
+
+    def _chamar(self, token, metodo, timeout, **kwargs):
+        import requests
+
+        if self._sessao is None:
+            self._sessao = sessao_instrumentada("telegram")
+        try:
+            resp = self._sessao.post(f"{TELEGRAM_API}/bot{token}/{metodo}", timeout=timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise _TenteDepois(str(e))
+        try:
+            corpo = resp.json()
+        except ValueError:
+            corpo = {}
+        descricao = corpo.get("description") or f"HTTP {resp.status_code}"
+        if resp.status_code == 429:
+            raise _TenteDepois(descricao, (corpo.get("parameters") or {}).get("retry_after"))
+        if resp.status_code >= 500:
+            raise _TenteDepois(descricao)
+        if not corpo.get("ok"):
+            raise EnvioRecusado(descricao)
+        return corpo["result"]
+
+    def enviar(self, carga, feitos):
+        # Cada passo concluído fica em `feitos`, para a retentativa não repetir a mensagem já entregue
+        if "mensagem" not in feitos:
+            self._chamar(carga["token"], "sendMessage", 15,
+                         json={"chat_id": carga["destino"], "text": carga["texto"], "parse_mode": "Markdown"})
+            feitos.add("mensagem")
+        anexo = carga["anexo"]
+        dados = {"chat_id": carga["destino"], "caption": "📄 Relatório completo em PDF"}
+        if anexo["file_id"]:
+            self._chamar(carga["token"], "sendDocument", 15, data={**dados, "document": anexo["file_id"]})
+        else:
+            # O primeiro chat recebe o upload; os demais reusam o file_id devolvido pelo Telegram
+            res = self._chamar(carga["token"], "sendDocument", 30, data=dados,
+                               files={"document": (_nome_pdf(), anexo["pdf"], "application/pdf")})
+            anexo["file_id"] = (res.get("document") or {}).get("file_id")
+
+    def fechar(self):
+        if self._sessao is not None:
+            self._sessao.close()
+            self._sessao = None
+
+
+class _CanalEmail:
+    def __init__(self):
+        self._conexoes = {}
+
+    def _conexao(self, remetente, senha):
+        chave = (SMTP_HOST, SMTP_PORT, remetente, senha)
+        if chave not in self._conexoes:
+            try:
+                if SMTP_PORT == 465:
+                    smtp = smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT, timeout=30)
+                else:
+                    smtp = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=30)
+                    smtp.ehlo()
+                    if smtp.has_extn("starttls"):
+                        smtp.starttls()
+                        smtp.ehlo()
+            except OSError as e:
+                raise _TenteDepois(str(e))
+            try:
+                if senha:
+                    smtp.login(remetente, senha)
+            except smtplib.SMTPException as e:
+                smtp.close()
+                raise EnvioRecusado(f"login recusado: {e}")
+            self._conexoes[chave] = smtp
+        return chave, self._conexoes[chave]
+
+    def enviar(self, carga, feitos):
+        chave, smtp = self._conexao(carga["remetente"], carga["senha"])
+        msg = carga["mensagem"]
+        del msg["To"]
+        msg["To"] = carga["destino"]
+        try:
+            smtp.sendmail(carga["remetente"], [carga["destino"]], msg.as_bytes())
+            registrar_chamada("smtp")
+        except smtplib.SMTPRecipientsRefused as e:
+            codigo, texto = next(iter(e.recipients.values()))
+            texto = texto.decode(errors="replace") if isinstance(texto, bytes) else str(texto)
+            if codigo >= 500:
+                raise EnvioRecusado(f"destinatário recusado: {codigo} {texto}")
+            raise _TenteDepois(f"{codigo} {texto}")
+        except smtplib.SMTPResponseException as e:
+            texto = e.smtp_error.decode(errors="replace") if isinstance(e.smtp_error, bytes) else str(e.smtp_error)
+            if e.smtp_code >= 500:
+                raise EnvioRecusado(f"{e.smtp_code} {texto}")
+            self._descartar(chave)
+            raise _TenteDepois(f"{e.smtp_code} {texto}")
+        except (smtplib.SMTPServerDisconnected, OSError) as e:
+            # Conexão caiu (ou o servidor fechou por ociosidade): a retentativa abre outra
+            self._descartar(chave)
+            raise _TenteDepois(str(e) or "conexão SMTP encerrada")
+
+    def _descartar(self, chave):
+        smtp = self._conexoes.pop(chave, None)
+        if smtp is not None:
+            try:
+                smtp.close()
+            except Exception:
+                pass
+
+    def fechar(self):
+        for chave, smtp in list(self._conexoes.items()):
+            try:
+                smtp.quit()
+            except Exception:
+                pass
+            self._conexoes.pop(chave, None)
+
+
+# ══════════════════════════════════════════════════════════════
+# FILA
+# ══════════════════════════════════════════════════════════════
+
+class FilaEnvios:
+    """Fila de envios com uma thread por canal, retentativa com backoff e status por destinatário.
+
+    `enviar_telegram` e `enviar_email` só enfileiram e devolvem os ids dos
+    envios (um por chat ou destinatário); `status` e `aguardar` acompanham o
+    andamento. Falhas transitórias (rede, 429, 5xx, 4xx do SMTP) são repetidas
+    com espera dobrando a cada tentativa, respeitando o retry_after do
+    Telegram; recusas definitivas param na primeira. As conexões ficam abertas
+    enquanto houver envios e são fechadas depois de ENVIO_OCIOSO_S sem trabalho.
+    """
+
+    def __init__(self, tentativas=TENTATIVAS_ENVIO, espera_base=ENVIO_ESPERA_BASE, max_historico=1000):
+        self.tentativas    = tentativas
+        self.espera_base   = espera_base
+        self.max_historico = max_historico
+        self._canais   = {"telegram": _CanalTelegram(), "email": _CanalEmail()}
+        self._filas    = {nome: queue.Queue() for nome in self._canais}
+        self._threads  = {}
+        self._envios   = {}
+        self._cargas   = {}
+        self._ids      = itertools.count(1)
+        self._condicao = threading.Condition()
+
+    def _enfileirar(self, canal, cargas) -> list:
+        ids = []
+        with self._condicao:
+            for carga in cargas:
+                id_envio = next(self._ids)
+                self._envios[id_envio] = {"id": id_envio, "canal": canal, "destino": carga["destino"], "estado": "na fila",
+                                          "tentativas": 0, "erro": None, "atualizado_em": datetime.now().strftime("%H:%M:%S")}
+                self._cargas[id_envio] = (carga, set())
+                ids.append(id_envio)
+            self._podar()
+            if canal not in self._threads or not self._threads[canal].is_alive():
+                self._threads[canal] = threading.Thread(target=self._laco, args=(canal,), name=f"envios-{canal}", daemon=True)
+                self._threads[canal].start()
+        for id_envio in ids:
+            self._filas[canal].put(id_envio)
+        return ids
+
+    def _podar(self):
+        finalizados = [i for i, e in self._envios.items() if e["estado"] in ESTADOS_FINAIS]
+        for id_envio in finalizados[:max(0, len(self._envios) - self.max_historico)]:
+            del self._envios[id_envio]
+
+    def enviar_telegram(self, token, chat_ids, cotacoes, relatorio, pdf_bytes) -> list:
+        texto = _texto_telegram(cotacoes, relatorio)
+        anexo = {"pdf": pdf_bytes, "file_id": None}
+        return self._enfileirar("telegram", [{"token": token, "destino": str(c), "texto": texto, "anexo": anexo} for c in chat_ids])
+
+    def enviar_email(self, remetente, senha, destinatarios, cotacoes, relatorio, pdf_bytes) -> list:
+        mensagem = _mensagem_email(remetente, cotacoes, relatorio, pdf_bytes)
+        return self._enfileirar("email", [{"remetente": remetente, "senha": senha, "destino": d, "mensagem": mensagem}
+                                          for d in destinatarios])
+
+    def status(self, ids=None) -> list:
+        with self._condicao:
+            ids = list(self._envios) if ids is None else ids
+            return [dict(self._envios[i]) for i in ids if i in self._envios]
+
+    def aguardar(self, ids, timeout=None) -> list:
+        """Bloqueia até os envios terminarem (ou o timeout) e devolve o status deles."""
+        limite = None if timeout is None else time.monotonic() + timeout
+        with self._condicao:
+            while any(self._envios[i]["estado"] not in ESTADOS_FINAIS for i in ids if i in self._envios):
+                restante = None if limite is None else limite - time.monotonic()
+                if restante is not None and restante <= 0:
+                    break
+                self._condicao.wait(restante)
+        return self.status(ids)
+
+    def _atualizar(self, id_envio, **campos):
+        with self._condicao:
+            self._envios[id_envio].update(campos, atualizado_em=datetime.now().strftime("%H:%M:%S"))
+            if campos.get("estado") in ESTADOS_FINAIS:
+                self._cargas.pop(id_envio, None)
+                self._condicao.notify_all()
+
+    def _tentar(self, nome, id_envio, agendados):
+        carga, feitos = self._cargas[id_envio]
+        tentativa = self._envios[id_envio]["tentativas"] + 1
+        self._atualizar(id_envio, estado="enviando", tentativas=tentativa)
+        try:
+            with medir(f"envio_{nome}", tentativa=tentativa):
+                self._canais[nome].enviar(carga, feitos)
+        except Exception as erro:
+            if isinstance(erro, EnvioRecusado) or tentativa >= self.tentativas:
+                self._atualizar(id_envio, estado="erro", erro=str(erro))
+                return
+            espera = getattr(erro, "espera", None) or self.espera_base * 2 ** (tentativa - 1)
+            self._atualizar(id_envio, estado="aguardando", erro=str(erro))
+            heapq.heappush(agendados, (time.monotonic() + espera, id_envio))
+            return
+        self._atualizar(id_envio, estado="enviado", erro=None)
+
+    def _laco(self, nome):
+        canal, fila = self._canais[nome], self._filas[nome]
+        agendados = []  # heap de (quando, id) com os envios novos e as retentativas
+        while True:
+            espera = max(0.0, agendados[0][0] - time.monotonic()) if agendados else ENVIO_OCIOSO_S
+            try:
+                heapq.heappush(agendados, (time.monotonic(), fila.get(timeout=espera)))
+            except queue.Empty:
+                if not agendados:
+                    canal.fechar()
+                    continue
+            while agendados and agendados[0][0] <= time.monotonic():
+                self._tentar(nome, heapq.heappop(agendados)[1], agendados)
+
+
+FILA_ENVIOS = FilaEnvios()
+
+
+def enviar_telegram(token, chat_id, cotacoes, relatorio, pdf_bytes):
+    """Envia para um chat e espera o resultado: True ou a mensagem de erro."""
+    (status,) = FILA_ENVIOS.aguardar(FILA_ENVIOS.enviar_telegram(token, [chat_id], cotacoes, relatorio, pdf_bytes))
+    return True if status["estado"] == "enviado" else status["erro"]
+
+
+def enviar_email(remetente, senha, destinatario, cotacoes, relatorio, pdf_bytes):
+    """Envia para um destinatário e espera o resultado: True ou a mensagem de erro."""
+    (status,) = FILA_ENVIOS.aguardar(FILA_ENVIOS.enviar_email(remetente, senha, [destinatario], cotacoes, relatorio, pdf_bytes))
+    return True if status["estado"] == "enviado" else status["erro"]
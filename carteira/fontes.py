@@ -0,0 +1,420 @@
+"""Fontes de dados de mercado: Yahoo Finance, um diretório local (Parquet/CSV) e um gerador sintético.
+
+Toda fonte responde às mesmas cinco consultas, já no formato do pacote:
+
+    precos(tickers, periodo, inicio, intervalo, acoes)  frame largo (ticker, campo) com OHLCV
+                                                        e, com `acoes`, Dividends e Stock Splits
+    fundamentos(ticker)  dict com as chaves de FUNDAMENTOS_VAZIOS
+    noticias(ticker)     [{"titulo", "link", "fonte", "data"}], mais recentes primeiro
+    resultados(ticker)   {"proxima_data": "AAAA-MM-DD" ou None,
+                          "trimestres": [(trimestre, receita, lucro)], mais recente primeiro}
+
+Os dividendos chegam pelos campos de ações corporativas de `precos`. A fonte do
+processo vem de CARTEIRA_FONTE ("yahoo", "arquivos:DIR" ou "sintetica[:SEMENTE]")
+e pode ser trocada com `definir_fonte`.
+"""
+import functools
+import os
+import threading
+import zlib
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from carteira.config import FONTE_MERCADO
+from carteira.medicoes import atribuir_sem_contexto, sessao_instrumentada
+from carteira.universo import ticker_curto
+
+FUNDAMENTOS_VAZIOS = {"pl": 0, "pvp": 0, "dy": 0, "market_cap": 0, "roe": 0,
+                      "divida_pl": 0, "preco_alvo": 0, "preco_alvo_min": 0,
+                      "preco_alvo_max": 0, "recomendacao": "N/D"}
+CAMPOS_PRECOS = ["Open", "High", "Low", "Close", "Volume"]
+CAMPOS_ACOES  = ["Dividends", "Stock Splits"]
+UNIDADES_PERIODO = {"d": "days", "wk": "weeks", "mo": "months", "y": "years"}
+
+
+def recortar_periodo(df, periodo=None, inicio=None, intervalo="1d"):
+    """O trecho do frame que o Yahoo devolveria para `inicio` ou para o `periodo` ("5d", "1mo", "2y", "max")."""
+    if not len(df.index):
+        return df
+    if inicio is not None:
+        desde = pd.Timestamp(inicio)
+        if df.index.tz is not None and desde.tz is None:
+            desde = desde.tz_localize(df.index.tz)
+        return df[df.index >= desde]
+    if periodo in (None, "max"):
+        return df
+    numero  = int("".join(c for c in periodo if c.isdigit()))
+    unidade = "".join(c for c in periodo if not c.isdigit())
+    if intervalo != "1d" and unidade == "d":
+        dias = pd.Index(df.index.normalize()).unique()[-numero:]
+        return df[df.index.normalize().isin(dias)]
+    return df[df.index > df.index.max() - pd.DateOffset(**{UNIDADES_PERIODO[unidade]: numero})]
+
+
+def _largo(frames: dict, acoes) -> pd.DataFrame:
+    """Junta {ticker: frame de campos} no frame largo (ticker, campo) das fontes."""
+    campos = CAMPOS_PRECOS + (CAMPOS_ACOES if acoes else [])
+    frames = {t: df.reindex(columns=[c for c in campos if c in df.columns]) for t, df in frames.items() if not df.empty}
+    return pd.concat(frames, axis=1).sort_index() if frames else pd.DataFrame()
+
+# ══════════════════════════════════════════════════════════════
+# YAHOO FINANCE
+# ══════════════════════════════════════════════════════════════
+
+class FonteYahoo:
+    """yfinance com uma sessão HTTP única, contada nas medições."""
+
+    nome = "yahoo"
+
+    def __init__(self):
+        # yf.download guarda o estado do lote em variáveis globais do módulo: downloads simultâneos se misturam
+        self._lock_download = threading.Lock()
+
+    @functools.cached_property
+    def sessao(self):
+        return sessao_instrumentada("yahoo")
+
+    def precos(self, tickers, periodo="1mo", inicio=None, intervalo="1d", acoes=False) -> pd.DataFrame:
+        import yfinance as yf
+
+        tickers = list(tickers)
+        janela  = {"start": inicio} if inicio else {"period": periodo}
+        with self._lock_download, atribuir_sem_contexto():
+            df = yf.download(tickers, group_by="ticker", auto_adjust=True, interval=intervalo, actions=acoes,
+                             progress=False, threads=True, session=self.sessao, **janela)
+        if not df.empty and not isinstance(df.columns, pd.MultiIndex):
+            df.columns = pd.MultiIndex.from_product([tickers, df.columns])
+        return df
+
+    def fundamentos(self, ticker) -> dict:
+        import yfinance as yf
+
+        info = yf.Ticker(ticker, session=self.sessao).info
+        dy   = (info.get("dividendYield", 0) or 0) * 100
+        return {
+            "pl":             round(info.get("trailingPE", 0) or 0, 2),
+            "pvp":            round(info.get("priceToBook", 0) or 0, 2),
+            "dy":             round(dy if dy <= 30 else 0, 2),
+            "market_cap":     info.get("marketCap", 0),
+            "roe":            round((info.get("returnOnEquity", 0) or 0) * 100, 2),
+            "divida_pl":      round(info.get("debtToEquity", 0) or 0, 2),
+            "preco_alvo":     round(info.get("targetMeanPrice", 0) or 0, 2),
+            "preco_alvo_min": round(info.get("targetLowPrice", 0) or 0, 2),
+            "preco_alvo_max": round(info.get("targetHighPrice", 0) or 0, 2),
+            "recomendacao":   info.get("recommendationKey", "N/D"),
+        }
+
+    def noticias(self, ticker) -> list:
+        import yfinance as yf
+
+        noticias = []
+        for n in yf.Ticker(ticker, session=self.sessao).news:
+            content = n.get("content", {})
+            titulo  = content.get("title", "")
+            if titulo:
+                noticias.append({
+                    "titulo": titulo,
+                    "link":   content.get("canonicalUrl", {}).get("url", "#"),
+                    "fonte":  content.get("provider", {}).get("displayName", "Yahoo Finance"),
+                    "data":   content.get("pubDate", "")[:16],
+                })
+        return noticias
+
+    def resultados(self, ticker) -> dict:
+        import yfinance as yf
+
+        t    = yf.Ticker(ticker, session=self.sessao)
+        cal  = t.calendar
+        fins = t.quarterly_financials
+
+        # Data do próximo resultado
+        proxima_data = None
+        if cal is not None and not (hasattr(cal, "empty") and cal.empty):
+            try:
+                if isinstance(cal, dict):
+                    proxima_data = cal.get("Earnings Date", [None])[0]
+                elif hasattr(cal, "loc"):
+                    proxima_data = cal.loc["Earnings Date"].iloc[0] if "Earnings Date" in cal.index else None
+            except Exception:
+                pass
+
+        trimestres = []
+        if fins is not None and not fins.empty:
+            linha = lambda nome: fins.loc[nome] if nome in fins.index else pd.Series(index=fins.columns, dtype=float)
+            for col, receita, lucro in zip(fins.columns, linha("Total Revenue"), linha("Net Income")):
+                trimestres.append((str(col.date()) if hasattr(col, "date") else str(col)[:10],
+                                   None if pd.isna(receita) else float(receita), None if pd.isna(lucro) else float(lucro)))
+        # O yfinance devolve datetime.date (sem .date()) ou Timestamp, conforme a versão
+        return {"proxima_data": str(pd.Timestamp(proxima_data).date()) if proxima_data is not None else None,
+                "trimestres": trimestres}
+
+# ══════════════════════════════════════════════════════════════
+# DIRETÓRIO LOCAL
+# ══════════════════════════════════════════════════════════════
+
+@functools.lru_cache(maxsize=256)
+def _tabela_em_disco(caminho, modificado_em) -> pd.DataFrame:
+    """Tabela lida uma vez por versão do arquivo (a data de modificação entra na chave); não alterar o frame."""
+    return pd.read_parquet(caminho) if caminho.endswith(".parquet") else pd.read_csv(caminho)
+
+
+class FonteArquivos:
+    """Diretório com um arquivo por ticker e tabelas por consulta, em Parquet ou CSV (Parquet tem preferência):
+
+        precos/<TICKER>.parquet|csv       coluna data + Open, High, Low, Close, Volume
+                                          (Dividends e Stock Splits opcionais)
+        intradiario/<TICKER>.parquet|csv  mesmas colunas, data com hora (opcional)
+        fundamentos.parquet|csv           ticker + chaves de FUNDAMENTOS_VAZIOS
+        noticias.parquet|csv              ticker, titulo, link, fonte, data
+        trimestres.parquet|csv            ticker, trimestre, receita, lucro
+        agenda.parquet|csv                ticker, proxima_data
+
+    Arquivos ausentes equivalem a uma consulta sem resultado. `exportar_fonte`
+    grava nesse formato a partir de qualquer outra fonte.
+    """
+
+    nome = "arquivos"
+
+    def __init__(self, pasta):
+        self.pasta = pasta
+
+    def _ler(self, *partes) -> pd.DataFrame:
+        base = os.path.join(self.pasta, *partes)
+        for extensao in (".parquet", ".csv"):
+            if os.path.exists(base + extensao):
+                return _tabela_em_disco(base + extensao, os.path.getmtime(base + extensao))
+        return pd.DataFrame()
+
+    def _serie(self, subpasta, ticker) -> pd.DataFrame:
+        df = self._ler(subpasta, ticker)
+        if df.empty:
+            return df
+        return df.set_index(pd.to_datetime(df["data"])).drop(columns="data").sort_index()
+
+    def _linhas(self, tabela, ticker) -> pd.DataFrame:
+        df = self._ler(tabela)
+        return df[df["ticker"] == ticker] if not df.empty else df
+
+    def precos(self, tickers, periodo="1mo", inicio=None, intervalo="1d", acoes=False) -> pd.DataFrame:
+        subpasta = "precos" if intervalo == "1d" else "intradiario"
+        return _largo({t: recortar_periodo(self._serie(subpasta, t), periodo, inicio, intervalo) for t in tickers}, acoes)
+
+    def fundamentos(self, ticker) -> dict:
+        linhas = self._linhas("fundamentos", ticker)
+        if linhas.empty:
+            return dict(FUNDAMENTOS_VAZIOS)
+        linha = linhas.iloc[-1:].to_dict("records")[0]  # tipos nativos do Python, serializáveis em JSON
+        return {k: (linha[k] if k in linha and pd.notna(linha[k]) else v) for k, v in FUNDAMENTOS_VAZIOS.items()}
+
+    def noticias(self, ticker) -> list:
+        linhas = self._linhas("noticias", ticker)
+        if linhas.empty:
+            return []
+        linhas = linhas.sort_values("data", ascending=False).fillna({"link": "#", "fonte": "Arquivo local"})
+        return [{"titulo": str(n.titulo), "link": str(n.link), "fonte": str(n.fonte), "data": str(n.data)[:16]}
+                for n in linhas.itertuples(index=False)]
+
+    def resultados(self, ticker) -> dict:
+        trim   = self._linhas("trimestres", ticker)
+        agenda = self._linhas("agenda", ticker)
+        trim   = trim.sort_values("trimestre", ascending=False) if not trim.empty else trim
+        numero = lambda v: None if pd.isna(v) else float(v)
+        return {"proxima_data": str(agenda["proxima_data"].iloc[-1])[:10] if not agenda.empty and pd.notna(agenda["proxima_data"].iloc[-1]) else None,
+                "trimestres": [(str(t.trimestre)[:10], numero(t.receita), numero(t.lucro)) for t in trim.itertuples(index=False)]}
+
+# ══════════════════════════════════════════════════════════════
+# GERADOR SINTÉTICO
+# ══════════════════════════════════════════════════════════════
+
+class FonteSintetica:
+    """Pregões, proventos, fundamentos, notícias e resultados gerados a partir de uma semente, sem rede.
+
+    Cada ticker tem seu próprio gerador (semente + CRC32 do ticker), então o mesmo
+    ticker recebe sempre a mesma série, qualquer que seja o lote ou a janela
+    pedida, e downloads incrementais emendam sem saltos. Os pregões são dias úteis
+    de `origem` até hoje; o intradiário cobre os últimos 5 pregões em barras de 5 minutos.
+    """
+
+    nome = "sintetica"
+    BARRAS_DIA = 96  # 10:00 às 17:55
+
+    def __init__(self, semente=0, origem="2015-01-02"):
+        self.semente = int(semente)
+        self.origem  = pd.Timestamp(origem)
+
+    def _gerador(self, ticker, *extra):
+        return np.random.default_rng([self.semente, zlib.crc32(ticker.encode()), *extra])
+
+    def _perfil(self, ticker) -> dict:
+        g = self._gerador(ticker, 0)
+        return {"preco": float(np.exp(g.uniform(np.log(3), np.log(150)))), "tendencia": g.normal(0.00005, 0.00015),
+                "volatilidade": g.uniform(0.01, 0.03), "volume": g.uniform(1e5, 2e7), "dy": g.uniform(0, 0.12) if g.random() < 0.7 else 0.0}
+
+    @staticmethod
+    @functools.lru_cache(maxsize=4)
+    def _calendario(origem, hoje):
+        """Dias úteis de `origem` a `hoje` e a marca do último pregão de cada trimestre já encerrado."""
+        datas = pd.bdate_range(origem, hoje)
+        fim_trimestre = datas.to_period("Q") != (datas + pd.offsets.BDay(1)).to_period("Q")
+        return datas, np.asarray(fim_trimestre)
+
+    def _colunas(self, ticker, n, fim_trimestre) -> dict:
+        """As colunas de CAMPOS_PRECOS + CAMPOS_ACOES do ticker como arrays, um valor por pregão do calendário."""
+        perfil, g = self._perfil(ticker), self._gerador(ticker, 1)
+        vol   = perfil["volatilidade"]
+        fech  = perfil["preco"] * np.exp(np.cumsum(perfil["tendencia"] + vol * g.standard_normal(n)))
+        abert = np.concatenate([[perfil["preco"]], fech[:-1]]) * np.exp(vol / 3 * g.standard_normal(n))
+        return {"Open": abert, "Close": fech,
+                "High": np.maximum(abert, fech) * (1 + vol / 2 * np.abs(g.standard_normal(n))),
+                "Low": np.minimum(abert, fech) * (1 - vol / 2 * np.abs(g.standard_normal(n))),
+                "Volume": np.round(perfil["volume"] * g.lognormal(0, 0.4, n)),
+                # Proventos trimestrais no último pregão de cada trimestre, somando o DY do perfil em 12 meses
+                "Dividends": np.where(fim_trimestre, fech * perfil["dy"] / 4, 0.0).round(4),
+                "Stock Splits": np.zeros(n)}
+
+    def _diario(self, tickers, periodo="max", inicio=None, campos=CAMPOS_PRECOS) -> pd.DataFrame:
+        datas, fim_trimestre = self._calendario(self.origem, pd.Timestamp(date.today()))
+        janela = datas.get_indexer(recortar_periodo(pd.DataFrame(index=datas), periodo, inicio).index)
+        if not len(janela):
+            return pd.DataFrame()
+        ini, fim = janela[0], janela[-1] + 1
+        matriz = np.empty((fim - ini, len(tickers) * len(campos)))
+        for i, t in enumerate(tickers):
+            colunas = self._colunas(t, len(datas), fim_trimestre)
+            for j, campo in enumerate(campos):
+                matriz[:, i * len(campos) + j] = colunas[campo][ini:fim]
+        return pd.DataFrame(matriz, index=datas[ini:fim], columns=pd.MultiIndex.from_product([list(tickers), campos]))
+
+    def _intradiario(self, ticker) -> pd.DataFrame:
+        diario = self._diario([ticker], inicio=None, periodo="5d")[ticker]
+        vol    = self._perfil(ticker)["volatilidade"]
+        partes = []
+        for dia, linha in diario.iterrows():
+            g      = self._gerador(ticker, 2, int(dia.strftime("%Y%m%d")))
+            passos = np.cumsum(vol / 10 * g.standard_normal(self.BARRAS_DIA))
+            # Ponte do preço de abertura ao fechamento do dia
+            fech   = linha["Open"] * np.exp(passos - np.linspace(0, passos[-1] - np.log(linha["Close"] / linha["Open"]), self.BARRAS_DIA))
+            abert  = np.concatenate([[linha["Open"]], fech[:-1]])
+            horas  = pd.date_range(dia + pd.Timedelta(hours=10), periods=self.BARRAS_DIA, freq="5min", tz="America/Sao_Paulo")
+            partes.append(pd.DataFrame({"Open": abert, "High": np.maximum(abert, fech), "Low": np.minimum(abert, fech), "Close": fech,
+                                        "Volume": np.round(linha["Volume"] / self.BARRAS_DIA * g.lognormal(0, 0.3, self.BARRAS_DIA))},
+                                       index=horas))
+        return pd.concat(partes) if partes else pd.DataFrame()
+
+    def precos(self, tickers, periodo="1mo", inicio=None, intervalo="1d", acoes=False) -> pd.DataFrame:
+        tickers = list(tickers)
+        if intervalo == "1d":
+            return self._diario(tickers, periodo, inicio, CAMPOS_PRECOS + (CAMPOS_ACOES if acoes else []))
+        return _largo({t: recortar_periodo(self._intradiario(t), periodo, inicio, intervalo) for t in tickers}, False)
+
+    def fundamentos(self, ticker) -> dict:
+        g, perfil = self._gerador(ticker, 3), self._perfil(ticker)
+        atual = float(self._diario([ticker], periodo="5d")[ticker]["Close"].iloc[-1])
+        alvo  = atual * g.uniform(0.8, 1.4)
+        return {"pl": round(g.uniform(3, 25), 2), "pvp": round(g.uniform(0.5, 4), 2), "dy": round(perfil["dy"] * 100, 2),
+                "market_cap": int(np.exp(g.uniform(np.log(5e8), np.log(5e11)))), "roe": round(g.uniform(-5, 30), 2),
+                "divida_pl": round(g.uniform(0, 200), 2), "preco_alvo": round(alvo, 2), "preco_alvo_min": round(alvo * 0.8, 2),
+                "preco_alvo_max": round(alvo * 1.2, 2), "recomendacao": str(g.choice(["buy", "hold", "sell", "strong_buy"]))}
+
+    def noticias(self, ticker) -> list:
+        g, curto = self._gerador(ticker, 4, date.today().toordinal()), ticker_curto(ticker)
+        modelos  = [f"{curto} anuncia novo plano de investimentos", f"Analistas revisam preço-alvo de {curto}",
+                    f"{curto} divulga dados operacionais do trimestre", f"Volume de {curto} dispara na sessão",
+                    f"{curto} aprova distribuição de proventos", f"Rebaixamento pressiona {curto}",
+                    f"{curto} conclui aquisição no setor", f"Mercado reage a resultado de {curto}"]
+        hoje = pd.Timestamp(date.today()) + pd.Timedelta(hours=9)
+        return [{"titulo": modelos[i], "link": "#", "fonte": "Sintética",
+                 "data": (hoje - pd.Timedelta(hours=int(h))).strftime("%Y-%m-%dT%H:%M")}
+                for i, h in zip(g.permutation(len(modelos))[:5], sorted(g.integers(1, 240, 5)))]
+
+    def resultados(self, ticker) -> dict:
+        g = self._gerador(ticker, 5)
+        hoje = pd.Timestamp(date.today())
+        # Trimestres divulgados ~45 dias depois do fechamento; a próxima divulgação é a do trimestre em aberto
+        fechados = pd.period_range(end=(hoje - pd.Timedelta(days=45)).to_period("Q") - 1, periods=8, freq="Q")[::-1]
+        receita  = g.uniform(1e8, 5e10) * np.exp(np.cumsum(g.normal(0.01, 0.05, len(fechados))))
+        lucro    = receita * g.normal(0.1, 0.06, len(fechados))
+        proxima  = (fechados[0] + 1).end_time.normalize() + pd.Timedelta(days=45)
+        return {"proxima_data": str(proxima.date()),
+                "trimestres": [(str(p.end_time.date()), round(float(r), 2), round(float(lc), 2)) for p, r, lc in zip(fechados, receita, lucro)]}
+
+SETORES_SINTETICOS = ["Financeiro", "Energia Elétrica", "Petróleo & Gás", "Mineração", "Varejo", "Saúde",
+                      "Tecnologia", "Construção", "Agronegócio", "Logística", "Saneamento", "Telecomunicações"]
+
+
+def universo_sintetico(n, semente=0) -> dict:
+    """Universo de `n` ações fictícias (SN0000.SA, SN0001.SA, ...) com setor e posição, para a FonteSintetica."""
+    universo = {}
+    for i in range(n):
+        g, ticker = np.random.default_rng([semente, i]), f"SN{i:04d}.SA"
+        universo[ticker] = {"ticker": ticker, "nome": f"Sintética {i:04d}", "setor": str(g.choice(SETORES_SINTETICOS)),
+                            "moeda": "BRL", "classe": "acao", "quantidade": float(g.integers(1, 50) * 100),
+                            "preco_medio": round(float(g.uniform(5, 100)), 2)}
+    return universo
+
+# ══════════════════════════════════════════════════════════════
+# SELEÇÃO E EXPORTAÇÃO
+# ══════════════════════════════════════════════════════════════
+
+def criar_fonte(especificacao: str):
+    """"yahoo", "arquivos:DIR" ou "sintetica[:SEMENTE]"."""
+    tipo, _, argumento = especificacao.partition(":")
+    tipo = tipo.strip().lower()
+    if tipo == "yahoo":
+        return FonteYahoo()
+    if tipo == "arquivos":
+        if not argumento:
+            raise ValueError("A fonte 'arquivos' precisa do diretório: arquivos:DIR")
+        return FonteArquivos(argumento)
+    if tipo == "sintetica":
+        return FonteSintetica(int(argumento or 0))
+    raise ValueError(f"Fonte de mercado desconhecida: {especificacao!r} (use yahoo, arquivos:DIR ou sintetica[:SEMENTE])")
+
+
+_FONTE      = [None]
+_FONTE_LOCK = threading.Lock()
+
+
+def fonte_mercado():
+    """A fonte do processo, criada na primeira consulta a partir de CARTEIRA_FONTE."""
+    with _FONTE_LOCK:
+        if _FONTE[0] is None:
+            _FONTE[0] = criar_fonte(FONTE_MERCADO)
+        return _FONTE[0]
+
+
+def definir_fonte(fonte):
+    """Troca a fonte do processo (um objeto de fonte ou uma especificação); devolve a anterior."""
+    with _FONTE_LOCK:
+        anterior, _FONTE[0] = _FONTE[0], criar_fonte(fonte) if isinstance(fonte, str) else fonte
+    return anterior
+
+
+def exportar_fonte(origem, tickers, pasta, formato="parquet", periodo="max", avisar=print):
+    """Grava os dados dos `tickers` vindos de `origem` no diretório lido por FonteArquivos."""
+    gravar = (lambda df, caminho: df.to_parquet(f"{caminho}.parquet", index=False)) if formato == "parquet" else \
+             (lambda df, caminho: df.to_csv(f"{caminho}.csv", index=False))
+    tickers = list(dict.fromkeys(tickers))
+    for subpasta, janela in (("precos", {"periodo": periodo, "acoes": True}), ("intradiario", {"periodo": "5d", "intervalo": "5m"})):
+        os.makedirs(os.path.join(pasta, subpasta), exist_ok=True)
+        df = origem.precos(tickers, **janela)
+        for t in (df.columns.get_level_values(0).unique() if not df.empty else []):
+            serie = df[t].dropna(subset=["Close"])
+            gravar(serie.rename_axis("data").reset_index(), os.path.join(pasta, subpasta, t))
+        avisar(f"✅ {subpasta}: {df.columns.get_level_values(0).nunique() if not df.empty else 0} tickers")
+    tabelas = {"fundamentos": [], "noticias": [], "trimestres": [], "agenda": []}
+    for t in tickers:
+        try:
+            tabelas["fundamentos"].append({"ticker": t, **origem.fundamentos(t)})
+            tabelas["noticias"]   += [{"ticker": t, **n} for n in origem.noticias(t)]
+            res = origem.resultados(t)
+        except Exception as erro:
+            avisar(f"⚠️ {t}: {erro}")
+            continue
+        tabelas["trimestres"] += [{"ticker": t, "trimestre": tr, "receita": r, "lucro": lc} for tr, r, lc in res["trimestres"]]
+        tabelas["agenda"].append({"ticker": t, "proxima_data": res["proxima_data"]})
+    for nome, linhas in tabelas.items():
+        gravar(pd.DataFrame(linhas), os.path.join(pasta, nome))
+    avisar(f"✅ Fundamentos, notícias e resultados de {len(tabelas['agenda'])} tickers gravados em {pasta}")
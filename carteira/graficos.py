@@ -0,0 +1,242 @@
+"""Gráficos Plotly do painel (Plotly é importado na primeira figura).
+
+As figuras ficam num cache LRU do processo, chaveado pela impressão digital dos
+dados de entrada: reruns e sessões que mostram o mesmo snapshot reaproveitam a
+figura pronta. Quem recebe uma figura do cache não deve alterá-la.
+"""
+import functools
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from carteira.config import GRAFICOS_CACHE_MAX
+
+_FIGURAS       = OrderedDict()
+_FIGURAS_LOCK  = threading.Lock()
+_FIGURAS_STATS = {"acertos": 0, "faltas": 0}
+
+
+def _impressao(valor) -> str:
+    """Hash estável dos argumentos; frames e séries entram pelo hash do pandas, o resto pelo JSON."""
+    h = hashlib.sha256()
+    for v in valor:
+        if isinstance(v, (pd.DataFrame, pd.Series)):
+            h.update(pd.util.hash_pandas_object(v, index=True).to_numpy().tobytes())
+            h.update(repr(list(v.columns) if isinstance(v, pd.DataFrame) else v.name).encode())
+        else:
+            h.update(json.dumps(v, sort_keys=True, ensure_ascii=False, default=str).encode())
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def _memorizar(funcao):
+    @functools.wraps(funcao)
+    def envoltorio(*args):
+        chave = (funcao.__name__, _impressao(args))
+        with _FIGURAS_LOCK:
+            if chave in _FIGURAS:
+                _FIGURAS.move_to_end(chave)
+                _FIGURAS_STATS["acertos"] += 1
+                return _FIGURAS[chave]
+            _FIGURAS_STATS["faltas"] += 1
+        fig = funcao(*args)
+        with _FIGURAS_LOCK:
+            _FIGURAS[chave] = fig
+            while len(_FIGURAS) > GRAFICOS_CACHE_MAX:
+                _FIGURAS.popitem(last=False)
+        return fig
+    return envoltorio
+
+
+def info_cache_graficos() -> dict:
+    with _FIGURAS_LOCK:
+        return {**_FIGURAS_STATS, "figuras": len(_FIGURAS), "maximo": GRAFICOS_CACHE_MAX}
+
+
+@_memorizar
+def grafico_barras(cotacoes):
+    import plotly.graph_objects as go
+
+    df = pd.DataFrame(cotacoes)
+    fig = go.Figure(go.Bar(
+        x=df["ticker"], y=df["variacao"],
+        marker_color=["#0f7b3e" if v > 0 else "#c0392b" for v in df["variacao"]],
+        text=[f"{v:+.1f}%" for v in df["variacao"]],
+        textposition="inside",
+        insidetextanchor="middle",
+        textfont=dict(size=12, color="white", family="IBM Plex Sans"),
+        width=0.6,
+    ))
+    fig.update_layout(title=dict(text="Variação Semanal (%)", font=dict(family="Syne", size=16, color="#7eb8f7")),
+                      plot_bgcolor="#ffffff", paper_bgcolor="#f4f5f7", font=dict(color="#1a1d23"),
+                      xaxis=dict(gridcolor="#e5e7eb"), yaxis=dict(gridcolor="#e5e7eb", zeroline=True, zerolinecolor="#9ca3af"),
+                      margin=dict(t=50, b=10, l=10, r=10), height=360)
+    return fig
+
+
+@_memorizar
+def grafico_setores(cotacoes):
+    import plotly.graph_objects as go
+
+    setores = {}
+    for c in cotacoes:
+        setores.setdefault(c["setor"], []).append(c["variacao"])
+    dados = sorted([{"setor": s, "media": round(sum(v)/len(v), 2)} for s, v in setores.items()], key=lambda x: x["media"], reverse=True)
+    df = pd.DataFrame(dados)
+    fig = go.Figure(go.Bar(y=df["setor"], x=df["media"], orientation="h",
+                           marker_color=["#22c55e" if v > 0 else "#ef4444" for v in df["media"]],
+                           text=[f"{v:+.2f}%" for v in df["media"]], textposition="outside",
+                           textfont=dict(size=11, color="#1a1d23")))
+    fig.update_layout(title=dict(text="Desempenho por Setor (%)", font=dict(family="Syne", size=16, color="#7eb8f7")),
+                      plot_bgcolor="#ffffff", paper_bgcolor="#f4f5f7", font=dict(color="#1a1d23"),
+                      xaxis=dict(gridcolor="#e5e7eb", zeroline=True, zerolinecolor="#9ca3af"),
+                      yaxis=dict(gridcolor="rgba(0,0,0,0)"), margin=dict(t=50, b=10, l=10, r=80), height=360)
+    return fig
+
+
+@_memorizar
+def grafico_linha(historico, ticker):
+    import plotly.graph_objects as go
+
+    df  = pd.DataFrame(historico)
+    cor = "#22c55e" if df["preco"].iloc[-1] >= df["preco"].iloc[0] else "#ef4444"
+    fig = go.Figure(go.Scatter(x=df["data"], y=df["preco"], mode="lines+markers",
+                               line=dict(color=cor, width=2.5), marker=dict(size=6, color=cor)))
+    fig.update_layout(title=dict(text=f"Evolução — {ticker}", font=dict(family="Syne", size=14, color="#7eb8f7")),
+                      plot_bgcolor="#ffffff", paper_bgcolor="#f4f5f7", font=dict(color="#1a1d23"),
+                      xaxis=dict(gridcolor="#e5e7eb"), yaxis=dict(gridcolor="#e5e7eb"),
+                      margin=dict(t=40, b=10, l=10, r=10), height=260, showlegend=False)
+    return fig
+
+
+@_memorizar
+def grafico_historico(serie, ticker, periodo):
+    import plotly.graph_objects as go
+
+    cor = "#22c55e" if serie.iloc[-1] >= serie.iloc[0] else "#ef4444"
+    var = (serie.iloc[-1] / serie.iloc[0] - 1) * 100
+    fig = go.Figure(go.Scatter(x=serie.index, y=serie.values, mode="lines", line=dict(color=cor, width=2),
+                               hovertemplate="%{x|%d/%m/%Y %H:%M}<br>%{y:,.2f}<extra></extra>"))
+    fig.update_layout(title=dict(text=f"Evolução — {ticker} · {periodo} ({var:+.1f}%)", font=dict(family="Syne", size=14, color="#7eb8f7")),
+                      plot_bgcolor="#ffffff", paper_bgcolor="#f4f5f7", font=dict(color="#1a1d23"),
+                      xaxis=dict(gridcolor="#e5e7eb"), yaxis=dict(gridcolor="#e5e7eb"),
+                      margin=dict(t=40, b=10, l=10, r=10), height=300, showlegend=False)
+    return fig
+
+
+@_memorizar
+def grafico_heatmap(cotacoes):
+    import plotly.graph_objects as go
+
+    tickers = [c["ticker"] for c in cotacoes]
+    valores = [c["variacao"] for c in cotacoes]
+    fig = go.Figure(go.Treemap(
+        labels=[f"{t}<br>{v:+.2f}%" for t, v in zip(tickers, valores)],
+        parents=[""] * len(tickers),
+        values=[abs(v) + 0.5 for v in valores],
+        marker=dict(colors=valores, colorscale=[[0,"#ef4444"],[0.5,"#1e3a5f"],[1,"#22c55e"]], cmid=0, showscale=False),
+        textfont=dict(size=13, color="white", family="IBM Plex Sans"),
+    ))
+    fig.update_layout(title=dict(text="Heatmap da Carteira", font=dict(family="Syne", size=16, color="#7eb8f7")),
+                      paper_bgcolor="#f4f5f7", margin=dict(t=50, b=10, l=10, r=10), height=320)
+    return fig
+
+
+@_memorizar
+def grafico_comparativo(cotacoes):
+    import plotly.graph_objects as go
+
+    df = pd.DataFrame(cotacoes)
+    fig = go.Figure()
+    fig.add_trace(go.Bar(name="Esta Semana", x=df["ticker"], y=df["variacao"],
+                         marker_color=["#22c55e" if v > 0 else "#ef4444" for v in df["variacao"]]))
+    fig.add_trace(go.Bar(name="Semana Anterior", x=df["ticker"], y=df["var_anterior"],
+                         marker_color=["#1a56db" if v > 0 else "#7c3aed" for v in df["var_anterior"]], opacity=0.7))
+    fig.update_layout(title=dict(text="Semana Atual vs Anterior (%)", font=dict(family="Syne", size=16, color="#7eb8f7")),
+                      plot_bgcolor="#ffffff", paper_bgcolor="#f4f5f7", font=dict(color="#1a1d23"),
+                      barmode="group", xaxis=dict(gridcolor="#e5e7eb"),
+                      yaxis=dict(gridcolor="#e5e7eb", zeroline=True, zerolinecolor="#9ca3af"),
+                      margin=dict(t=50, b=10, l=10, r=10), height=360,
+                      legend=dict(bgcolor="#ffffff", bordercolor="#e2e5ea"))
+    return fig
+
+
+@_memorizar
+def grafico_correlacao(correlacoes):
+    import plotly.graph_objects as go
+
+    nomes  = list(correlacoes.keys())
+    variac = [correlacoes[n]["variacao"] for n in nomes]
+    fig = go.Figure(go.Bar(
+        x=nomes, y=variac,
+        marker_color=["#0f7b3e" if v > 0 else "#c0392b" for v in variac],
+        text=[f"{v:+.2f}%" for v in variac],
+        textposition="inside",
+        insidetextanchor="middle",
+        textfont=dict(size=14, color="white", family="IBM Plex Sans"),
+        width=0.5,
+    ))
+    fig.update_layout(
+        title=dict(text="IBOV · Dólar · BTC na Semana (%)", font=dict(family="Playfair Display", size=16, color="#1a1d23")),
+        plot_bgcolor="#ffffff", paper_bgcolor="#f4f5f7", font=dict(color="#1a1d23"),
+        xaxis=dict(gridcolor="#e5e7eb", tickfont=dict(size=13, color="#1a1d23")),
+        yaxis=dict(gridcolor="#e5e7eb", zeroline=True, zerolinecolor="#374151", zerolinewidth=2),
+        margin=dict(t=50, b=10, l=10, r=10), height=320,
+    )
+    return fig
+
+
+@_memorizar
+def grafico_matriz_correlacao(matriz):
+    import plotly.graph_objects as go
+
+    tickers = matriz["tickers"]
+    fig = go.Figure(go.Heatmap(
+        z=matriz["valores"], x=tickers, y=tickers, zmin=-1, zmax=1, zmid=0,
+        colorscale=[[0,"#ef4444"],[0.5,"#ffffff"],[1,"#1a56db"]],
+        text=[[f"{v:.2f}" if v is not None else "" for v in linha] for linha in matriz["valores"]],
+        texttemplate="%{text}" if len(tickers) <= 15 else None, hovertemplate="%{y} × %{x}: %{z:.2f}<extra></extra>",
+    ))
+    fig.update_layout(title=dict(text="Correlação entre os Ativos", font=dict(family="Syne", size=16, color="#7eb8f7")),
+                      plot_bgcolor="#ffffff", paper_bgcolor="#f4f5f7", font=dict(color="#1a1d23"),
+                      yaxis=dict(autorange="reversed"), margin=dict(t=50, b=10, l=10, r=10),
+                      height=max(360, min(900, 22 * len(tickers))))
+    return fig
+
+
+@_memorizar
+def grafico_correlacao_movel(serie, ticker, janela):
+    import plotly.graph_objects as go
+
+    cores = {"IBOV": "#1a56db", "Dólar": "#22c55e", "BTC": "#e8b84b"}
+    fig = go.Figure([go.Scatter(x=serie.index, y=serie[f], mode="lines", name=f, line=dict(color=cores.get(f), width=2))
+                     for f in serie.columns])
+    fig.update_layout(title=dict(text=f"Correlação Móvel ({janela} pregões) — {ticker}", font=dict(family="Syne", size=14, color="#7eb8f7")),
+                      plot_bgcolor="#ffffff", paper_bgcolor="#f4f5f7", font=dict(color="#1a1d23"),
+                      xaxis=dict(gridcolor="#e5e7eb"), yaxis=dict(gridcolor="#e5e7eb", range=[-1, 1], zeroline=True, zerolinecolor="#9ca3af"),
+                      margin=dict(t=40, b=10, l=10, r=10), height=300, legend=dict(orientation="h", y=-0.15))
+    return fig
+
+
+@_memorizar
+def grafico_proventos(calendario):
+    """Proventos projetados por mês, empilhados por ativo: renda da posição quando informada, senão valor por cota."""
+    import plotly.graph_objects as go
+
+    df = pd.DataFrame(calendario)
+    por_posicao = df["renda"].notna().any()
+    if por_posicao:
+        df = df[df["renda"].notna()]
+    df = df.assign(mes=pd.to_datetime(df["data"]).dt.to_period("M").dt.to_timestamp(),
+                   y=df["renda"] if por_posicao else df["valor"])
+    mensal = df.pivot_table(index="mes", columns="ticker", values="y", aggfunc="sum")
+    fig = go.Figure([go.Bar(x=mensal.index, y=mensal[t], name=t) for t in mensal.columns])
+    fig.update_layout(barmode="stack", title=dict(text="Proventos Projetados por Mês" + ("" if por_posicao else " (por cota)"),
+                                                  font=dict(family="Syne", size=16, color="#7eb8f7")),
+                      plot_bgcolor="#ffffff", paper_bgcolor="#f4f5f7", font=dict(color="#1a1d23"),
+                      xaxis=dict(gridcolor="#e5e7eb", dtick="M1", tickformat="%b/%y"), yaxis=dict(gridcolor="#e5e7eb"),
+                      margin=dict(t=50, b=10, l=10, r=10), height=360, showlegend=len(mensal.columns) <= 20)
+    return fig
@@ -0,0 +1,381 @@
+"""Chamadas ao Groq (limite de taxa e cache em disco), sentimento de notícias e relatório CrewAI."""
+import functools
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from datetime import datetime
+
+from carteira.armazenamento import conectar_llm_cache, conectar_sentimentos
+from carteira.config import (ESPERA_GROQ_S, GROQ_CONCORRENCIA, GROQ_RPM, LLM_CACHE_ATIVO, LLM_CACHE_DIAS,
+                             LLM_CACHE_MB, MODELO_GROQ, TENTATIVAS_GROQ)
+from carteira.dados import buscar_noticias
+from carteira.medicoes import medido, medir, no_contexto, registrar_chamada
+from carteira.universo import ticker_curto
+
+# ══════════════════════════════════════════════════════════════
+# LIMITE DE TAXA DO GROQ
+# ══════════════════════════════════════════════════════════════
+
+def _duracao(texto):
+    """Converte os tempos de reset do Groq ("7.66s", "2m59.56s", "250ms") em segundos."""
+    if texto is None or texto == "":
+        return None
+    try:
+        return float(texto)
+    except (TypeError, ValueError):
+        pass
+    unidades = {"ms": 0.001, "h": 3600, "m": 60, "s": 1}
+    partes   = re.findall(r"([\d.]+)(ms|h|m|s)", str(texto))
+    return sum(float(v) * unidades[u] for v, u in partes) if partes else None
+
+
+class LimitadorGroq:
+    """Token bucket compartilhado por todas as chamadas ao Groq do app.
+
+    Localmente limita as requisições por minuto; a cada resposta se recalibra com
+    os cabeçalhos x-ratelimit-* (tokens restantes e tempo até o reset) e, num 429,
+    segura todas as threads até o retry-after. Assim cada chamada espera só o
+    necessário, e várias sessões gerando ao mesmo tempo não viram uma cascata de 429.
+    """
+
+    def __init__(self, requisicoes_por_minuto=30):
+        self.capacidade     = float(requisicoes_por_minuto)
+        self.taxa           = requisicoes_por_minuto / 60.0
+        self.fichas         = self.capacidade
+        self.atualizado     = time.monotonic()
+        self.tokens         = None    # tokens por minuto restantes, segundo o Groq
+        self.tokens_reset   = 0.0
+        self.bloqueado_ate  = 0.0
+        self._lock          = threading.Lock()
+
+    def _espera(self, custo, agora) -> float:
+        self.fichas     = min(self.capacidade, self.fichas + (agora - self.atualizado) * self.taxa)
+        self.atualizado = agora
+        if agora < self.bloqueado_ate:
+            return self.bloqueado_ate - agora
+        if self.tokens is not None and agora >= self.tokens_reset:
+            self.tokens = None
+        if self.tokens is not None and self.tokens < custo:
+            return self.tokens_reset - agora
+        if self.fichas < 1:
+            return (1 - self.fichas) / self.taxa
+        return 0.0
+
+    def adquirir(self, custo=0):
+        """Bloqueia até haver cota para uma requisição de aproximadamente `custo` tokens."""
+        while True:
+            with self._lock:
+                espera = self._espera(custo, time.monotonic())
+                if espera <= 0:
+                    self.fichas -= 1
+                    if self.tokens is not None:
+                        self.tokens -= custo
+                    return
+            time.sleep(espera)
+
+    def atualizar(self, cabecalhos) -> float:
+        """Recalibra a cota com os cabeçalhos de uma resposta (ou de um 429) do Groq; devolve a espera (s) que eles impõem."""
+        if not cabecalhos:
+            return 0.0
+        ler = lambda nome: cabecalhos.get(nome, cabecalhos.get(f"llm_provider-{nome}"))
+        tokens     = ler("x-ratelimit-remaining-tokens")
+        reset_tok  = _duracao(ler("x-ratelimit-reset-tokens"))
+        requisicoes = ler("x-ratelimit-remaining-requests")
+        reset_req  = _duracao(ler("x-ratelimit-reset-requests"))
+        retry      = _duracao(ler("retry-after"))
+        with self._lock:
+            agora = time.monotonic()
+            if tokens is not None and reset_tok is not None:
+                self.tokens, self.tokens_reset = float(tokens), agora + reset_tok
+            if requisicoes is not None and float(requisicoes) <= 0 and reset_req:
+                self.bloqueado_ate = max(self.bloqueado_ate, agora + reset_req)
+            if retry:
+                self.bloqueado_ate = max(self.bloqueado_ate, agora + retry)
+            sem_tokens = self.tokens is not None and self.tokens <= 0
+            return max(0.0, self.bloqueado_ate - agora, self.tokens_reset - agora if sem_tokens else 0.0)
+
+
+LIMITADOR_GROQ = LimitadorGroq(GROQ_RPM)
+
+
+def _backoff(tentativa) -> float:
+    """Espera exponencial com jitter para as falhas sem indicação de quando tentar de novo."""
+    return ESPERA_GROQ_S * 2 ** tentativa * random.uniform(0.5, 1.5)
+
+
+def _estimar_tokens(messages, max_tokens) -> int:
+    return sum(len(str(m.get("content", ""))) for m in messages) // 4 + (max_tokens or 1024)
+
+
+# ══════════════════════════════════════════════════════════════
+# CACHE E CHAMADAS AO GROQ
+# ══════════════════════════════════════════════════════════════
+
+def _chave_llm(model, messages, params) -> str:
+    conteudo = json.dumps({"model": model, "messages": messages, "params": params}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(conteudo.encode()).hexdigest()
+
+
+def ler_cache_llm(chave):
+    """Resposta guardada para a chave, ou None se não existir ou tiver passado de LLM_CACHE_DIAS."""
+    agora = time.time()
+    with closing(conectar_llm_cache()) as con, con:
+        linha = con.execute("SELECT resposta FROM respostas WHERE chave = ? AND criado_em >= ?",
+                            (chave, agora - LLM_CACHE_DIAS * 86400)).fetchone()
+        if linha:
+            con.execute("UPDATE respostas SET acessado_em = ? WHERE chave = ?", (agora, chave))
+    return linha[0] if linha else None
+
+
+def gravar_cache_llm(chave, resposta):
+    """Guarda a resposta e despeja as vencidas e, acima de LLM_CACHE_MB, as menos usadas recentemente."""
+    agora = time.time()
+    with closing(conectar_llm_cache()) as con, con:
+        con.execute("INSERT OR REPLACE INTO respostas VALUES (?,?,?,?,?)",
+                    (chave, resposta, len(resposta.encode()), agora, agora))
+        con.execute("DELETE FROM respostas WHERE criado_em < ?", (agora - LLM_CACHE_DIAS * 86400,))
+        total, excedentes = 0, []
+        for c, tamanho in con.execute("SELECT chave, tamanho FROM respostas ORDER BY acessado_em DESC"):
+            total += tamanho
+            if total > LLM_CACHE_MB * 1024 * 1024:
+                excedentes.append((c,))
+        con.executemany("DELETE FROM respostas WHERE chave = ?", excedentes)
+
+
+@medido()
+def chamar_groq(api_key, messages, max_tokens=None, model=MODELO_GROQ, timeout=120, usar_cache=None, **params):
+    """chat.completions do SDK do Groq passando pelo LimitadorGroq; devolve o texto da resposta.
+
+    Respostas para o mesmo modelo, prompt e parâmetros vêm do cache em disco;
+    `usar_cache=False` (ou CARTEIRA_LLM_CACHE=0) força uma nova chamada. O 429 espera
+    o que os cabeçalhos pedem (ou o backoff, se não pedirem nada); 5xx, timeout e conexão
+    caída esperam com backoff exponencial.
+    """
+    params = {k: v for k, v in dict(params, max_tokens=max_tokens).items() if v is not None}
+    usar_cache = LLM_CACHE_ATIVO if usar_cache is None else usar_cache
+    chave  = _chave_llm(model, messages, params)
+    if usar_cache:
+        resposta = ler_cache_llm(chave)
+        if resposta is not None:
+            return resposta
+    from groq import APIConnectionError, Groq, InternalServerError, RateLimitError
+
+    client = Groq(api_key=api_key, max_retries=0, timeout=timeout)
+    custo  = _estimar_tokens(messages, max_tokens)
+    for tentativa in range(TENTATIVAS_GROQ):
+        with medir("groq_cota"):
+            LIMITADOR_GROQ.adquirir(custo)
+        try:
+            bruto = client.chat.completions.with_raw_response.create(messages=messages, model=model, **params)
+        except RateLimitError as e:
+            registrar_chamada("groq", len(e.response.content))
+            espera = LIMITADOR_GROQ.atualizar(e.response.headers)
+            if tentativa == TENTATIVAS_GROQ - 1:
+                raise
+            if espera <= 0:
+                # 429 sem retry-after nem reset: sem espera aqui as tentativas restantes sairiam de uma vez
+                time.sleep(_backoff(tentativa))
+            continue
+        except (APIConnectionError, InternalServerError) as e:
+            # 5xx, timeout (APITimeoutError é uma APIConnectionError) ou conexão caída: tenta de novo com backoff e jitter
+            if isinstance(e, InternalServerError):
+                registrar_chamada("groq", len(e.response.content))
+            if tentativa == TENTATIVAS_GROQ - 1:
+                raise
+            time.sleep(_backoff(tentativa))
+            continue
+        registrar_chamada("groq", len(bruto.http_response.content))
+        LIMITADOR_GROQ.atualizar(bruto.headers)
+        resposta = bruto.parse().choices[0].message.content.strip()
+        if usar_cache:
+            gravar_cache_llm(chave, resposta)
+        return resposta
+
+
+@functools.lru_cache(maxsize=None)
+def _classe_llm_limitado():
+    """Cria a subclasse do LLM do CrewAI só quando o relatório é gerado, mantendo o import leve."""
+    from crewai import LLM
+
+    class LLMLimitado(LLM):
+        """LLM do CrewAI que chama o Groq por chamar_groq.
+
+        O caminho do LiteLLM para o Groq descarta os cabeçalhos da resposta, então os
+        agentes usam o SDK do Groq para que o LimitadorGroq enxergue a cota restante.
+        """
+
+        def call(self, messages, callbacks=[]):
+            return chamar_groq(self.api_key, messages, max_tokens=self.max_tokens,
+                               model=self.model.split("/", 1)[-1], timeout=self.timeout,
+                               usar_cache=self.kwargs.get("usar_cache"),
+                               temperature=self.temperature, stop=self.stop or None)
+
+    return LLMLimitado
+
+
+# ══════════════════════════════════════════════════════════════
+# RESULTADOS TRIMESTRAIS
+# ══════════════════════════════════════════════════════════════
+
+@medido()
+def avaliar_resultados_ia(resultados: list, api_key: str, usar_cache=None) -> str:
+    """Usa IA para avaliar se os últimos resultados foram bons ou ruins por prazo."""
+    if not resultados or not api_key:
+        return ""
+    try:
+        dados  = []
+        for r in resultados:
+            linha = f"{r['ticker']} ({r['nome']}): receita {r['var_receita']:+.1f}% vs trim. anterior, lucro {r['var_lucro']:+.1f}%" if r["var_receita"] is not None and r["var_lucro"] is not None else f"{r['ticker']} ({r['nome']}): dados insuficientes"
+            dados.append(linha)
+        prompt = f"""Analise os resultados trimestrais abaixo e escreva uma avaliação concisa em português, com no máximo 250 palavras, estruturada em 3 parágrafos:
+
+1. **Curto Prazo** — O que esses números significam para as ações nas próximas semanas?
+2. **Médio Prazo** — Tendência para os próximos 2-4 trimestres?
+3. **Longo Prazo** — Os fundamentos suportam crescimento sustentável?
+
+Resultados:
+{chr(10).join(dados)}
+
+Seja direto e use linguagem acessível para investidores pessoa física."""
+        return chamar_groq(api_key, [{"role": "user", "content": prompt}], max_tokens=600, usar_cache=usar_cache, temperature=0.3)
+    except Exception:
+        return ""
+
+
+# ══════════════════════════════════════════════════════════════
+# SENTIMENTO
+# ══════════════════════════════════════════════════════════════
+
+# Limita as chamadas simultâneas ao Groq quando a carteira inteira é analisada de uma vez
+_GROQ_SEMAFORO = threading.BoundedSemaphore(GROQ_CONCORRENCIA)
+
+
+def _sentimento_neutro(noticias) -> dict:
+    noticias = [dict(n) for n in noticias]  # as notícias vêm do cache compartilhado entre sessões: anota cópias
+    for n in noticias:
+        n["sentimento"] = "Neutro"
+        n["prazo"]      = "Curto"
+    return {"noticias": noticias, "score": 5.0, "sentimento_geral": "Neutro", "impacto_resumo": ""}
+
+
+def _pontuar_sentimento(noticias, ticker, nome, api_key) -> dict:
+    noticias = [dict(n) for n in noticias]  # idem: quem chamou não vê a anotação
+    titulos = [f"{i+1}. {n['titulo']}" for i, n in enumerate(noticias)]
+    prompt  = f"""Analise notícias sobre {nome} ({ticker}). Responda SOMENTE em JSON:
+
+{chr(10).join(titulos)}
+
+{{"score": <0-10>, "sentimento_geral": "<Otimista|Pessimista|Neutro>", "impacto_resumo": "<2 frases>", "noticias": [{{"indice": 1, "sentimento": "<Otimista|Pessimista|Neutro>", "prazo": "<Curto|Longo>"}}]}}"""
+    with _GROQ_SEMAFORO:
+        resposta = chamar_groq(api_key, [{"role": "user", "content": prompt}], max_tokens=500, temperature=0.1)
+    raw = resposta.replace("```json","").replace("```","").strip()
+    res = json.loads(raw)
+    analises = {a["indice"]: a for a in res.get("noticias", [])}
+    for i, n in enumerate(noticias):
+        an = analises.get(i+1, {})
+        n["sentimento"] = an.get("sentimento", "Neutro")
+        n["prazo"]      = an.get("prazo", "Curto")
+    return {
+        "noticias":         noticias,
+        "score":            round(float(res.get("score", 5.0)), 1),
+        "sentimento_geral": res.get("sentimento_geral", "Neutro"),
+        "impacto_resumo":   res.get("impacto_resumo", ""),
+    }
+
+
+@medido()
+def analisar_sentimento(noticias, ticker, nome, api_key) -> dict:
+    """Pontua as manchetes com o Groq; manchetes já pontuadas vêm do cache em disco."""
+    if not noticias or not api_key:
+        return {"noticias": noticias, "score": 5.0, "sentimento_geral": "Neutro", "impacto_resumo": ""}
+    chave = hashlib.sha256("\n".join([ticker] + [n["titulo"] for n in noticias]).encode()).hexdigest()
+    with closing(conectar_sentimentos()) as con:
+        linha = con.execute("SELECT resultado FROM sentimentos WHERE chave = ?", (chave,)).fetchone()
+    if linha:
+        return json.loads(linha[0])
+    try:
+        resultado = _pontuar_sentimento(noticias, ticker, nome, api_key)
+    except Exception:
+        return _sentimento_neutro(noticias)
+    with closing(conectar_sentimentos()) as con, con:
+        con.execute("INSERT OR REPLACE INTO sentimentos VALUES (?,?,?)", (chave, json.dumps(resultado, ensure_ascii=False), time.time()))
+    return resultado
+
+
+@medido()
+def analisar_sentimentos_carteira(ativos: dict, api_key, max_workers=8) -> dict:
+    """Busca notícias e analisa o sentimento de todos os ativos em paralelo; devolve {ticker: resultado}."""
+    def analisar(item):
+        ticker_str, ativo = item
+        ticker   = ticker_curto(ticker_str)
+        noticias = buscar_noticias(ticker_str, ativo["nome"])
+        return ticker, analisar_sentimento(noticias, ticker, ativo["nome"], api_key)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return dict(pool.map(no_contexto(analisar), ativos.items()))
+
+
+# ══════════════════════════════════════════════════════════════
+# RELATÓRIO
+# ══════════════════════════════════════════════════════════════
+
+# Acima disso a carteira entra no prompt resumida por setor e pelos extremos da semana
+LIMITE_ATIVOS_PROMPT = 30
+CAMPOS_PROMPT        = ("ticker", "nome", "setor", "atual", "variacao", "var_anterior", "volatilidade", "rsi")
+
+
+def _resumo_carteira(cotacoes, limite=LIMITE_ATIVOS_PROMPT):
+    """Cotações para o prompt: completas em carteiras pequenas, agregadas quando o universo é grande."""
+    if len(cotacoes) <= limite:
+        return cotacoes
+    setores = {}
+    for c in cotacoes:
+        setores.setdefault(c["setor"], []).append(c["variacao"])
+    ordenadas = sorted(({k: c[k] for k in CAMPOS_PROMPT} for c in cotacoes), key=lambda c: c["variacao"], reverse=True)
+    extremos  = limite // 3
+    return {
+        "ativos":         len(cotacoes),
+        "em_alta":        sum(1 for c in cotacoes if c["variacao"] > 0),
+        "variacao_media": round(sum(c["variacao"] for c in cotacoes) / len(cotacoes), 2),
+        "setores":        {s: {"ativos": len(v), "variacao_media": round(sum(v) / len(v), 2)} for s, v in setores.items()},
+        "maiores_altas":  ordenadas[:extremos],
+        "maiores_baixas": ordenadas[::-1][:extremos],
+    }
+
+
+@medido()
+def gerar_relatorio_ia(cotacoes, correlacoes, api_key, usar_cache=None):
+    from crewai import Agent, Task, Crew
+
+    llm = _classe_llm_limitado()(model=f"groq/{MODELO_GROQ}", api_key=api_key, temperature=0.3, timeout=120, usar_cache=usar_cache)
+
+    analista = Agent(role="Analista de Mercado Sênior (CNPI)", goal="Analisar carteira da B3 e correlações.",
+                     backstory="Analista CNPI com 15 anos na B3.", llm=llm, verbose=False, allow_delegation=False, max_iter=3)
+    tarefa_analise = Task(
+        description=(f"Carteira: {json.dumps(_resumo_carteira(cotacoes), ensure_ascii=False)}\n\n"
+                     f"Correlações (IBOV/Dólar/BTC): {json.dumps(correlacoes, ensure_ascii=False)}\n\n"
+                     "Escreva análise com: 1.Panorama geral 2.Maiores altas 3.Maiores baixas "
+                     "4.Impacto do dólar e BTC na carteira 5.Perspectivas. Máximo 400 palavras."),
+        expected_output="Análise em Markdown, 5 seções, máximo 400 palavras.", agent=analista,
+    )
+    with medir("crew_analise"):
+        resultado_analise = str(Crew(agents=[analista], tasks=[tarefa_analise], verbose=False).kickoff())
+
+    consultor = Agent(role="Consultor de Investimentos (CFP/CEA)", goal="Recomendações e cenários para a carteira.",
+                      backstory="Consultor CFP/CEA especialista em carteiras brasileiras.", llm=llm, verbose=False, allow_delegation=False, max_iter=3)
+    tarefa_rec = Task(
+        description=(f"Análise: {resultado_analise}\n\n"
+                     "Crie recomendações: 1.Disclaimer 2.Resumo executivo 3.Perfil Conservador "
+                     "4.Perfil Moderado 5.Perfil Arrojado 6.Top 3 ativos "
+                     "7.Cenário otimista e pessimista. Máximo 450 palavras."),
+        expected_output="Recomendações em Markdown, 7 seções, máximo 450 palavras.", agent=consultor,
+    )
+    with medir("crew_recomendacoes"):
+        resultado_rec = str(Crew(agents=[consultor], tasks=[tarefa_rec], verbose=False).kickoff())
+    return {"analise": resultado_analise, "recomendacoes": resultado_rec,
+            "gerado_em": datetime.now().strftime("%d/%m/%Y às %H:%M")}
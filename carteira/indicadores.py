@@ -0,0 +1,135 @@
+"""Indicadores técnicos vetorizados sobre o bloco datas × tickers.
+
+Todas as funções recebem o frame largo (ticker, campo) produzido por
+baixar_precos/ler_precos, ou os blocos já alinhados por alinhar_pregoes, e
+calculam o indicador para todos os ativos de uma vez.
+"""
+import numpy as np
+import pandas as pd
+
+CAMPOS     = ["Open", "High", "Low", "Close", "Volume"]
+HORIZONTES = {"ret_1m": 21, "ret_3m": 63, "ret_6m": 126, "ret_1a": 252}
+# Dias úteis que o último pregão de um ativo pode ficar atrás do mais recente do universo
+# (um feriado só na B3 ou só em Nova York); além disso o ativo está parado ou fora de listagem
+DEFASAGEM_MAX = 1
+
+
+def alinhar_pregoes(precos: pd.DataFrame) -> dict:
+    """Encosta os pregões válidos de cada ticker no fim do bloco.
+
+    Depois do alinhamento a linha -1 é o último pregão de todos os ativos, a -2 o
+    penúltimo e assim por diante, mesmo quando os calendários diferem (BTC negocia
+    no fim de semana, a B3 não). Dias sem pregão ficam como NaN no topo. As datas
+    se perdem no alinhamento: ativos suspensos são apontados por pregoes_defasados.
+    """
+    fech    = precos.xs("Close", axis=1, level=1)
+    tickers = list(fech.columns)
+    valido  = fech.notna().to_numpy()
+    ordem   = np.argsort(valido, axis=0, kind="stable")
+    valido  = np.take_along_axis(valido, ordem, axis=0)
+    blocos  = {}
+    for campo in CAMPOS:
+        bruto = precos.xs(campo, axis=1, level=1)[tickers].to_numpy(dtype=float)
+        bloco = np.take_along_axis(bruto, ordem, axis=0)
+        blocos[campo] = pd.DataFrame(np.where(valido, bloco, np.nan), columns=tickers)
+    return blocos
+
+
+def ultimos_pregoes(fech: pd.DataFrame) -> pd.Series:
+    """Data do último fechamento válido de cada ticker (NaT se não há nenhum)."""
+    valido = fech.notna().to_numpy()
+    pos    = len(fech) - 1 - valido[::-1].argmax(axis=0)
+    return pd.Series(fech.index[pos], index=fech.columns).where(valido.any(axis=0))
+
+
+def pregoes_defasados(ultimos: pd.Series, tolerancia=DEFASAGEM_MAX) -> pd.Series:
+    """Marca os tickers cujo último pregão ficou mais de `tolerancia` dias úteis atrás do universo.
+
+    A referência é o pregão mais recente entre todos os ativos, recuado para o dia
+    útil anterior quando cai num fim de semana: o BTC de domingo não deixa a B3 de
+    sexta defasada, mas uma ação sem negócios desde quinta fica.
+    """
+    dias = pd.to_datetime(ultimos).to_numpy().astype("datetime64[D]")
+    ok   = ~np.isnat(dias)
+    if not ok.any():
+        return pd.Series(True, index=ultimos.index)
+    uteis  = np.busday_offset(dias[ok], 0, roll="backward")
+    atraso = np.full(len(dias), np.iinfo(np.int64).max)
+    atraso[ok] = np.busday_count(uteis, uteis.max())
+    return pd.Series(atraso > tolerancia, index=ultimos.index)
+
+
+def rsi_wilder(fech: pd.DataFrame, periodo=14) -> pd.DataFrame:
+    """RSI com a suavização de Wilder, semeada pela média simples das primeiras `periodo` variações."""
+    delta = fech.diff()
+    cont  = delta.notna().cumsum()
+    semente = cont.eq(periodo) & delta.notna()
+
+    def suavizar(serie):
+        media_inicial = serie.fillna(0).cumsum() / periodo
+        semeada = serie.where(cont > periodo).mask(semente, media_inicial)
+        return semeada.ewm(alpha=1 / periodo, adjust=False, ignore_na=True).mean().where(cont >= periodo)
+
+    ganho = suavizar(delta.clip(lower=0))
+    perda = suavizar(-delta.clip(upper=0))
+    rsi   = 100 - 100 / (1 + ganho / perda)
+    # Sem perdas no período o RSI é 100; sem ganhos nem perdas, 50
+    rsi = rsi.mask(perda.eq(0), 100.0).mask(perda.eq(0) & ganho.eq(0), 50.0)
+    return rsi.where(fech.notna())
+
+
+def volatilidade_movel(fech: pd.DataFrame, janela=20) -> pd.DataFrame:
+    """Desvio-padrão (%) dos retornos diários numa janela móvel de `janela` retornos."""
+    return fech.pct_change(fill_method=None).rolling(janela, min_periods=2).std() * 100
+
+
+def maior_queda(maximas: pd.DataFrame, minimas: pd.DataFrame) -> pd.Series:
+    """Maior queda (%) de um topo até uma mínima posterior dentro do bloco."""
+    pico = maximas.cummax()
+    return (minimas / pico - 1).min() * 100
+
+
+def retornos(fech: pd.DataFrame, horizontes=HORIZONTES) -> pd.DataFrame:
+    """Retorno (%) do último pregão contra `n` pregões atrás, para cada horizonte."""
+    ultimo = fech.iloc[-1]
+    return pd.DataFrame({
+        nome: (ultimo / fech.iloc[-1 - n] - 1) * 100 if len(fech) > n else np.nan
+        for nome, n in horizontes.items()
+    })
+
+
+def calcular_indicadores(precos: pd.DataFrame, janela=5, periodo_rsi=14, horizontes=HORIZONTES) -> pd.DataFrame:
+    """Calcula numa passada as métricas semanais de todos os tickers.
+
+    Devolve um frame indexado por ticker com abertura/atual/máxima/mínima da
+    janela, variação contra a janela anterior, volatilidade, maior queda, RSI de
+    Wilder, número de pregões na janela e os retornos de `horizontes`. As colunas
+    ultimo_pregao e defasado dizem de quando é a linha "atual" de cada ticker: num
+    ativo defasado as métricas descrevem pregões antigos, não a semana corrente.
+    """
+    if precos.empty:
+        return pd.DataFrame()
+    b       = alinhar_pregoes(precos)
+    fech    = b["Close"]
+    ultimos = ultimos_pregoes(precos.xs("Close", axis=1, level=1)[fech.columns])
+    semana  = {campo: bloco.iloc[-janela:] for campo, bloco in b.items()}
+    abertura = semana["Close"].bfill().iloc[0]
+    atual    = fech.iloc[-1]
+    anterior = fech.iloc[-2 * janela] if len(fech) >= 2 * janela else pd.Series(np.nan, index=fech.columns)
+
+    ind = pd.DataFrame({
+        "abertura":     abertura,
+        "atual":        atual,
+        "maxima":       semana["High"].max(),
+        "minima":       semana["Low"].min(),
+        "volume":       semana["Volume"].mean(),
+        "variacao":     (atual / abertura - 1) * 100,
+        "var_anterior": (abertura / anterior - 1) * 100,
+        "volatilidade": volatilidade_movel(semana["Close"], janela - 1).iloc[-1],
+        "maior_queda":  maior_queda(semana["High"], semana["Low"]),
+        "rsi":          rsi_wilder(fech, periodo_rsi).iloc[-1],
+        "pregoes":      semana["Close"].notna().sum(),
+        "ultimo_pregao": ultimos,
+        "defasado":     pregoes_defasados(ultimos),
+    })
+    return ind.join(retornos(fech, horizontes))
@@ -0,0 +1,105 @@
+"""Relatórios em lote: uma coleta de mercado para todos os clientes e PDFs em processos paralelos."""
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from carteira.config import GROQ_CONCORRENCIA
+from carteira.dados import buscar_proventos
+from carteira.ia import avaliar_resultados_ia, gerar_relatorio_ia
+from carteira.medicoes import no_contexto
+from carteira.pdf import executor_pdf, gerar_pdf
+from carteira.pipeline import etapas_relatorio, executar_pipeline
+from carteira.universo import carregar_universo, ticker_curto
+
+# Etapas que dependem da carteira de cada cliente; as demais são coletadas uma vez para a união
+ETAPAS_CLIENTE = ["relatorio", "pdf_bytes", "avaliacao_resultados"]
+
+
+def carregar_clientes(diretorio: str) -> dict:
+    """{cliente: ativos} com um arquivo de universo (CSV ou TOML) por cliente; o nome do arquivo é o cliente."""
+    arquivos = sorted(f for f in os.listdir(diretorio) if f.lower().endswith((".csv", ".toml")))
+    return {os.path.splitext(f)[0]: carregar_universo(os.path.join(diretorio, f)) for f in arquivos}
+
+
+def uniao_ativos(clientes: dict) -> dict:
+    uniao = {}
+    for ativos in clientes.values():
+        for ticker_str, ativo in ativos.items():
+            uniao.setdefault(ticker_str, ativo)
+    return uniao
+
+
+def coletar_mercado(clientes: dict, api_key, com_ia=True, ao_iniciar=None, ao_concluir=None) -> dict:
+    """Roda as coletas do relatório uma única vez para a união dos tickers de todos os clientes."""
+    etapas = etapas_relatorio(api_key, ativos=uniao_ativos(clientes))
+    for nome in ETAPAS_CLIENTE + ([] if com_ia else ["sentimentos"]):
+        etapas.pop(nome)
+    return executar_pipeline(etapas, ao_iniciar=ao_iniciar, ao_concluir=ao_concluir)
+
+
+def separar_cliente(mercado: dict, ativos: dict) -> dict:
+    """Recorta os dados compartilhados para a carteira de um cliente; os proventos são recalculados com a posição dele."""
+    tickers = set(ativos)
+    curtos  = {ticker_curto(t) for t in ativos}
+    dados   = {"cotacoes": [c for c in mercado.get("cotacoes", []) if c["ticker_sa"] in tickers],
+               "correlacoes": mercado.get("correlacoes", {})}
+    for nome in ("dividendos", "resultados_trim"):
+        if nome in mercado:
+            dados[nome] = [r for r in mercado[nome] if r["ticker"] in curtos]
+    if "fundamentos" in mercado:
+        dados["fundamentos"] = {t: f for t, f in mercado["fundamentos"].items() if t in tickers}
+    if "sentimentos" in mercado:
+        dados["sentimentos"] = {t: s for t, s in mercado["sentimentos"].items() if t in curtos}
+    if "proventos" in mercado:
+        # O livro de proventos já foi atualizado na coleta; aqui só entram a posição e o preço do cliente
+        dados["proventos"] = buscar_proventos(dados["cotacoes"], ativos)
+    if mercado.get("correlacoes_carteira"):
+        cc  = mercado["correlacoes_carteira"]
+        pos = [i for i, t in enumerate(cc["matriz"]["tickers"]) if t in curtos]
+        dados["correlacoes_carteira"] = {
+            **cc, "fatores": {t: f for t, f in cc["fatores"].items() if t in curtos},
+            "matriz": {"tickers": [cc["matriz"]["tickers"][i] for i in pos],
+                       "valores": [[cc["matriz"]["valores"][i][j] for j in pos] for i in pos]}}
+    return dados
+
+
+def _analisar_cliente(dados, api_key, usar_cache):
+    return {"relatorio": gerar_relatorio_ia(dados["cotacoes"], dados["correlacoes"], api_key, usar_cache=usar_cache),
+            "avaliacao_resultados": avaliar_resultados_ia(dados.get("resultados_trim", []), api_key, usar_cache=usar_cache)}
+
+
+def gerar_relatorios_clientes(clientes: dict, api_key, usar_cache=None, com_ia=True, processos=None,
+                              ao_iniciar=None, ao_concluir=None, ao_concluir_cliente=None) -> dict:
+    """Gera os relatórios de todos os clientes e devolve {cliente: dados}.
+
+    O mercado é coletado uma vez; a IA roda por cliente em threads (o limitador do
+    Groq regula o ritmo) e cada PDF vai para um processo assim que a análise do
+    cliente fica pronta. `ao_concluir_cliente(cliente, etapa, erro)` roda na
+    thread que chamou a função.
+    """
+    mercado    = coletar_mercado(clientes, api_key, com_ia, ao_iniciar, ao_concluir)
+    relatorios = {nome: separar_cliente(mercado, ativos) for nome, ativos in clientes.items()}
+    if not com_ia:
+        return relatorios
+    avisar = ao_concluir_cliente or (lambda cliente, etapa, erro: None)
+    with ThreadPoolExecutor(max_workers=GROQ_CONCORRENCIA) as ia, executor_pdf(processos) as pdfs:
+        analises = {ia.submit(no_contexto(_analisar_cliente), dados, api_key, usar_cache): nome
+                    for nome, dados in relatorios.items() if dados["cotacoes"]}
+        arquivos = {}
+        for fut in as_completed(analises):
+            nome, dados = analises[fut], relatorios[analises[fut]]
+            try:
+                dados.update(fut.result())
+            except Exception as erro:
+                avisar(nome, "relatorio", erro)
+                continue
+            avisar(nome, "relatorio", None)
+            arquivos[pdfs.submit(gerar_pdf, dados["cotacoes"], dados["relatorio"], dados["correlacoes"])] = nome
+        for fut in as_completed(arquivos):
+            nome = arquivos[fut]
+            try:
+                relatorios[nome]["pdf_bytes"] = fut.result()
+            except Exception as erro:
+                avisar(nome, "pdf_bytes", erro)
+                continue
+            avisar(nome, "pdf_bytes", None)
+    return relatorios
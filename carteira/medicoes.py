@@ -0,0 +1,198 @@
+"""Instrumentação leve: spans de tempo por etapa com chamadas externas e bytes recebidos, e exportação.
+
+Um span é aberto com `medir(nome)` (ou o decorador `medido`) e vira filho do
+span aberto no mesmo contexto. Chamadas externas são contadas no span corrente
+e em todos os seus ancestrais, então a etapa "cotacoes" soma os downloads que
+fez. Threads de pools herdam o span de quem submeteu o trabalho via
+`no_contexto`; as threads internas do yf.download, que não passam por aqui, são
+atribuídas ao span que segura o download (`atribuir_sem_contexto`).
+
+Os spans concluídos ficam em memória (os MEDICOES_MAX mais recentes), somam
+nos totais exportados em formato Prometheus e, com CARTEIRA_MEDICOES_JSONL,
+são gravados um por linha em JSON.
+"""
+import contextvars
+import functools
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from carteira.config import MEDICOES_JSONL, MEDICOES_MAX
+
+_SPAN_ATUAL = contextvars.ContextVar("carteira_span_atual", default=None)
+_IDS        = itertools.count(1)
+_LOCK       = threading.Lock()
+_CONCLUIDOS = deque(maxlen=MEDICOES_MAX)
+_TOTAIS_SPANS  = {}  # nome -> {"execucoes", "segundos", "erros", "chamadas", "bytes"}
+_TOTAIS_FONTES = {}  # fonte -> {"chamadas", "bytes"}
+_SEM_CONTEXTO  = [None]
+_COLETORES     = []  # funções de outros módulos que devolvem linhas extras para exportar_prometheus
+
+
+class Span:
+    __slots__ = ("id", "nome", "pai", "raiz", "atributos", "inicio", "duracao", "chamadas", "bytes", "erro", "_t0")
+
+    def __init__(self, nome, pai, atributos):
+        self.id        = next(_IDS)
+        self.nome      = nome
+        self.pai       = pai
+        self.raiz      = pai.raiz if pai else self.id
+        self.atributos = atributos
+        self.inicio    = time.time()
+        self.duracao   = None
+        self.chamadas  = {}
+        self.bytes     = 0
+        self.erro      = None
+        self._t0       = time.perf_counter()
+
+    def como_dict(self) -> dict:
+        return {"id": self.id, "pai": self.pai.id if self.pai else None, "raiz": self.raiz, "nome": self.nome,
+                "inicio": round(self.inicio, 3), "duracao": round(self.duracao, 6) if self.duracao is not None else None,
+                "chamadas": dict(self.chamadas), "bytes": self.bytes, "erro": self.erro, **self.atributos}
+
+
+@contextmanager
+def medir(nome, **atributos):
+    """Abre um span filho do span corrente; exceções são registradas no span e repassadas."""
+    span  = Span(nome, _SPAN_ATUAL.get(), atributos)
+    token = _SPAN_ATUAL.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.erro = f"{type(e).__name__}: {e}"[:300]
+        raise
+    finally:
+        _SPAN_ATUAL.reset(token)
+        span.duracao = time.perf_counter() - span._t0
+        _concluir(span)
+
+
+def medido(nome=None):
+    """Decorador: cada chamada da função vira um span (por padrão com o nome da função)."""
+    def decorar(funcao):
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            with medir(nome or funcao.__name__):
+                return funcao(*args, **kwargs)
+        return envolvida
+    return decorar
+
+
+def no_contexto(funcao):
+    """A função para rodar em outra thread como parte do span corrente (para pool.submit/map)."""
+    span = _SPAN_ATUAL.get()
+
+    @functools.wraps(funcao)
+    def rodar(*args, **kwargs):
+        token = _SPAN_ATUAL.set(span)
+        try:
+            return funcao(*args, **kwargs)
+        finally:
+            _SPAN_ATUAL.reset(token)
+    return rodar
+
+
+@contextmanager
+def atribuir_sem_contexto():
+    """Enquanto ativo, chamadas de threads sem span (as do yf.download) contam no span corrente.
+
+    Só é seguro sob um lock que serializa o trecho, como o lock de download da FonteYahoo.
+    """
+    anterior, _SEM_CONTEXTO[0] = _SEM_CONTEXTO[0], _SPAN_ATUAL.get()
+    try:
+        yield
+    finally:
+        _SEM_CONTEXTO[0] = anterior
+
+
+def registrar_chamada(fonte, bytes_recebidos=0):
+    """Conta uma chamada externa à `fonte` no span corrente, nos ancestrais e no total da fonte."""
+    span = _SPAN_ATUAL.get() or _SEM_CONTEXTO[0]
+    with _LOCK:
+        total = _TOTAIS_FONTES.setdefault(fonte, {"chamadas": 0, "bytes": 0})
+        total["chamadas"] += 1
+        total["bytes"]    += bytes_recebidos
+        while span is not None:
+            span.chamadas[fonte] = span.chamadas.get(fonte, 0) + 1
+            span.bytes += bytes_recebidos
+            span = span.pai
+
+
+def sessao_instrumentada(fonte):
+    """requests.Session que registra cada resposta (e o tamanho do corpo) como chamada à `fonte`."""
+    import requests
+
+    sessao = requests.Session()
+    sessao.hooks["response"].append(lambda resp, *args, **kwargs: registrar_chamada(fonte, len(resp.content or b"")))
+    return sessao
+
+
+def _concluir(span):
+    with _LOCK:
+        _CONCLUIDOS.append(span)
+        total = _TOTAIS_SPANS.setdefault(span.nome, {"execucoes": 0, "segundos": 0.0, "erros": 0, "chamadas": 0, "bytes": 0})
+        total["execucoes"] += 1
+        total["segundos"]  += span.duracao
+        total["erros"]     += span.erro is not None
+        total["chamadas"]  += sum(span.chamadas.values())
+        total["bytes"]     += span.bytes
+        if MEDICOES_JSONL:
+            try:
+                with open(MEDICOES_JSONL, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(span.como_dict(), ensure_ascii=False, default=str) + "\n")
+            except OSError:
+                pass
+
+
+def spans(raiz=None) -> list:
+    """Spans concluídos (de uma execução, se `raiz` for o id do span raiz), na ordem de início."""
+    with _LOCK:
+        selecionados = [s for s in _CONCLUIDOS if raiz is None or s.raiz == raiz]
+    return [s.como_dict() for s in sorted(selecionados, key=lambda s: (s.inicio, s.id))]
+
+
+def resumo_etapas(raiz) -> list:
+    """Tempo, chamadas externas e bytes de cada etapa ("etapa:<nome>") de uma execução, mais a linha do total."""
+    lista  = spans(raiz)
+    linha  = lambda nome, s: {"etapa": nome, "segundos": round(s["duracao"], 3), "chamadas": sum(s["chamadas"].values()),
+                              "bytes": s["bytes"], "erro": s["erro"]}
+    resumo = [linha(s["nome"].split(":", 1)[1], s) for s in lista if s["nome"].startswith("etapa:") and s["raiz"] == raiz]
+    resumo.sort(key=lambda r: -r["segundos"])
+    return resumo + [linha("total", s) for s in lista if s["id"] == raiz]
+
+
+def registrar_coletor(funcao):
+    """Inclui em exportar_prometheus as linhas (HELP, TYPE e amostras) devolvidas por `funcao()`."""
+    _COLETORES.append(funcao)
+
+
+def _rotulo(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def exportar_prometheus() -> str:
+    """Totais acumulados no processo no formato texto do Prometheus."""
+    with _LOCK:
+        por_span, por_fonte = {k: dict(v) for k, v in _TOTAIS_SPANS.items()}, {k: dict(v) for k, v in _TOTAIS_FONTES.items()}
+    linhas = ["# HELP carteira_span_segundos Tempo gasto em cada span.", "# TYPE carteira_span_segundos summary"]
+    for nome, t in sorted(por_span.items()):
+        linhas += [f'carteira_span_segundos_sum{{span="{_rotulo(nome)}"}} {t["segundos"]:.6f}',
+                   f'carteira_span_segundos_count{{span="{_rotulo(nome)}"}} {t["execucoes"]}']
+    metricas = [("carteira_span_erros_total", "Execuções do span que terminaram em exceção.", "span", por_span, "erros"),
+                ("carteira_span_chamadas_externas_total", "Chamadas externas feitas dentro do span (inclui spans filhos).", "span", por_span, "chamadas"),
+                ("carteira_chamadas_externas_total", "Chamadas externas por fonte.", "fonte", por_fonte, "chamadas"),
+                ("carteira_bytes_recebidos_total", "Bytes recebidos por fonte.", "fonte", por_fonte, "bytes")]
+    for metrica, ajuda, rotulo, totais, campo in metricas:
+        linhas += [f"# HELP {metrica} {ajuda}", f"# TYPE {metrica} counter"]
+        linhas += [f'{metrica}{{{rotulo}="{_rotulo(nome)}"}} {t[campo]}' for nome, t in sorted(totais.items())]
+    for coletor in _COLETORES:
+        linhas += coletor()
+    return "\n".join(linhas) + "\n"
+
+
+def exportar_jsonl(raiz=None) -> str:
+    """Spans concluídos como JSON lines (um objeto por linha)."""
+    return "".join(json.dumps(s, ensure_ascii=False, default=str) + "\n" for s in spans(raiz))
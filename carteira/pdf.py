@@ -0,0 +1,111 @@
+"""Relatório semanal em PDF (ReportLab, importado só na primeira geração) e em Markdown.
+
+Os estilos são montados uma vez por processo; lotes de PDFs vão para um pool de
+processos que grava cada arquivo direto no disco.
+"""
+import functools
+import io
+import multiprocessing
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from carteira.medicoes import medido
+from carteira.universo import simbolo_moeda
+
+
+@functools.lru_cache(maxsize=None)
+def _estilos() -> dict:
+    """Estilos de parágrafo e de tabela, montados uma vez por processo e reaproveitados em todo PDF."""
+    from reportlab.lib import colors
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.lib.units import cm
+    from reportlab.platypus import TableStyle
+
+    return {
+        "h1":      ParagraphStyle("h1", fontName="Helvetica-Bold", fontSize=22, textColor=colors.HexColor("#1a56db"), spaceAfter=6),
+        "h2":      ParagraphStyle("h2", fontName="Helvetica-Bold", fontSize=14, textColor=colors.HexColor("#1a56db"), spaceBefore=14, spaceAfter=6),
+        "body":    ParagraphStyle("body", fontSize=10, leading=16, spaceAfter=6),
+        "sm":      ParagraphStyle("sm",   fontSize=8,  textColor=colors.HexColor("#666")),
+        "azul":    colors.HexColor("#1a56db"),
+        "cinza":   colors.HexColor("#ccc"),
+        "colunas": [2*cm, 4.5*cm, 2.5*cm, 2*cm, 2.5*cm, 2.5*cm, 1.5*cm],
+        "tabela":  TableStyle([
+            ("BACKGROUND",(0,0),(-1,0),colors.HexColor("#1a56db")),
+            ("TEXTCOLOR",(0,0),(-1,0),colors.white),
+            ("FONTNAME",(0,0),(-1,0),"Helvetica-Bold"),
+            ("FONTSIZE",(0,0),(-1,-1),8),
+            ("ROWBACKGROUNDS",(0,1),(-1,-1),[colors.HexColor("#f8f9fa"),colors.white]),
+            ("GRID",(0,0),(-1,-1),0.3,colors.HexColor("#ddd")),
+            ("ALIGN",(2,0),(-1,-1),"CENTER"),
+            ("PADDING",(0,0),(-1,-1),4),
+        ]),
+    }
+
+
+@medido()
+def gerar_pdf(cotacoes, relatorio, correlacoes, destino=None):
+    """Monta o PDF do relatório; devolve os bytes ou, com `destino` (caminho ou arquivo), grava direto nele."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import cm
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, HRFlowable
+
+    e    = _estilos()
+    h1, h2, body, sm = e["h1"], e["h2"], e["body"], e["sm"]
+    buf  = io.BytesIO() if destino is None else destino
+    doc  = SimpleDocTemplate(buf, pagesize=A4, topMargin=2*cm, bottomMargin=2*cm, leftMargin=2*cm, rightMargin=2*cm)
+    story = []
+    story.append(Paragraph("Carteira Inteligente", h1))
+    story.append(Paragraph(f"Relatório Semanal — {relatorio['gerado_em']}", sm))
+    story.append(HRFlowable(width="100%", thickness=1, color=e["azul"]))
+    story.append(Spacer(1, 0.3*cm))
+    story.append(Paragraph("Resumo da Carteira", h2))
+    rows = [["Ticker","Empresa","Atual","Variação","Sem. Anterior","Volatilidade","RSI"]]
+    for c in cotacoes:
+        pref = simbolo_moeda(c["moeda"])
+        rows.append([c["ticker"], c["nome"], f"{pref} {c['atual']:,.2f}",
+                     f"{c['variacao']:+.2f}%", f"{c['var_anterior']:+.2f}%",
+                     f"{c['volatilidade']:.2f}%", f"{c['rsi']:.0f}" if c["rsi"] is not None else "N/D"])
+    story.append(Table(rows, colWidths=e["colunas"], style=e["tabela"], repeatRows=1))
+    story.append(Spacer(1, 0.3*cm))
+    if correlacoes:
+        story.append(Paragraph("Correlações do Mercado", h2))
+        for nome, dados in correlacoes.items():
+            s = "▲" if dados["variacao"] > 0 else "▼"
+            story.append(Paragraph(f"{nome}: {s} {dados['variacao']:+.2f}% (atual: {dados['atual']:,.2f})", body))
+    story.append(Paragraph("Análise de Mercado — IA", h2))
+    for linha in re.sub(r'[#*`]','', relatorio["analise"]).split("\n"):
+        if linha.strip(): story.append(Paragraph(linha.strip(), body))
+    story.append(Paragraph("Recomendações — IA", h2))
+    for linha in re.sub(r'[#*`]','', relatorio["recomendacoes"]).split("\n"):
+        if linha.strip(): story.append(Paragraph(linha.strip(), body))
+    story.append(Spacer(1, 0.4*cm))
+    story.append(HRFlowable(width="100%", thickness=0.5, color=e["cinza"]))
+    story.append(Paragraph("⚠️ Relatório informativo. Não é consultoria financeira oficial.", sm))
+    story.append(Paragraph("Dados: Yahoo Finance · IA: Groq LLaMA 3.3 70B", sm))
+    doc.build(story)
+    return buf.getvalue() if destino is None else None
+
+
+def executor_pdf(processos=None) -> ProcessPoolExecutor:
+    """Pool de processos para PDFs; spawn porque um fork herdaria travas seguradas pelas threads de coleta e da IA."""
+    return ProcessPoolExecutor(max_workers=processos, mp_context=multiprocessing.get_context("spawn"))
+
+
+def gerar_pdfs(trabalhos, processos=None) -> list:
+    """Renderiza em paralelo [(cotacoes, relatorio, correlacoes, destino)], gravando cada PDF no seu destino.
+
+    Os processos só devolvem o caminho, então a memória do chamador não cresce com o lote.
+    """
+    trabalhos = list(trabalhos)
+    if not trabalhos:
+        return []
+    with executor_pdf(processos) as pool:
+        list(pool.map(gerar_pdf, *zip(*trabalhos)))
+    return [t[3] for t in trabalhos]
+
+
+def gerar_markdown(relatorio) -> str:
+    return (f"# Relatório Semanal B3\n**Gerado em:** {relatorio['gerado_em']}\n\n---\n\n"
+            f"## Análise\n{relatorio['analise']}\n\n---\n\n"
+            f"## Recomendações\n{relatorio['recomendacoes']}\n\n---\n"
+            "*Relatório gerado por IA. Não é consultoria financeira.*")
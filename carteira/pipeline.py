@@ -0,0 +1,173 @@
+"""Executor de etapas com dependências, sua versão em segundo plano e as etapas do relatório semanal."""
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from carteira.config import ATIVOS
+from carteira.dados import (buscar_cotacoes, buscar_correlacoes, buscar_correlacoes_carteira, buscar_dividendos,
+                            buscar_proventos, buscar_resultados, prefetch_fundamentals)
+from carteira.ia import analisar_sentimentos_carteira, avaliar_resultados_ia, gerar_relatorio_ia
+from carteira.medicoes import medir, no_contexto
+from carteira.pdf import gerar_pdf
+
+# Mensagem de início e de conclusão de cada etapa, usadas no st.status e na linha de comando
+MENSAGENS_ETAPAS = {
+    "cotacoes":             ("📈 Buscando cotações, RSI e volatilidade...",      lambda v: f"✅ {len(v)} ativos coletados!"),
+    "correlacoes":          ("🔗 Buscando correlações...",                       lambda v: "✅ Correlações coletadas!"),
+    "correlacoes_carteira": ("🧮 Calculando correlação e beta dos ativos...",    lambda v: f"✅ Correlação e beta de {len(v.get('fatores', {}))} ativos!"),
+    "dividendos":           ("💰 Buscando dividendos...",                        lambda v: f"✅ {len(v)} registros de dividendos!"),
+    "proventos":            ("📆 Calculando DY, yield on cost e agenda de proventos...", lambda v: f"✅ Proventos de {len(v['metricas'])} ativos!"),
+    "resultados_trim":      ("📅 Buscando calendário de resultados...",          lambda v: f"✅ {len(v)} empresas com dados de resultados!"),
+    "fundamentos":          ("📊 Atualizando indicadores fundamentalistas...",   lambda v: f"✅ Fundamentos de {len(v)} ativos em cache!"),
+    "sentimentos":          ("📰 Analisando o sentimento das notícias...",       lambda v: f"✅ Sentimento de {len(v)} ativos analisado!"),
+    "relatorio":            ("🤖 Gerando análise com IA (aguarde ~2 minutos)...", lambda v: "✅ Análise da IA concluída!"),
+    "pdf_bytes":            ("📄 Gerando PDF...",                                 lambda v: "✅ PDF gerado!"),
+    "avaliacao_resultados": ("📊 Avaliando resultados com IA...",                lambda v: "✅ Resultados avaliados!"),
+}
+
+# Etapas que dependem do Groq (e o PDF, que espera o relatório da IA): no painel terminam em segundo plano
+ETAPAS_IA = ("sentimentos", "relatorio", "pdf_bytes", "avaliacao_resultados")
+
+
+def _etapa_medida(nome, funcao):
+    def rodar(resultados):
+        with medir(f"etapa:{nome}"):
+            return funcao(resultados)
+    return no_contexto(rodar)
+
+
+def executar_pipeline(etapas: dict, ao_iniciar=None, ao_concluir=None, max_workers=6, cancelar=None) -> dict:
+    """Executa as etapas em paralelo, cada uma assim que suas dependências terminam.
+
+    `etapas` mapeia nome -> (funcao, dependencias); a função recebe o dict com os
+    resultados já prontos. Os callbacks rodam na thread que chamou o pipeline, então
+    podem escrever no st.status. Etapas que falham não entram no resultado e as que
+    dependem delas não são executadas. Depois que o threading.Event `cancelar` é
+    sinalizado nenhuma etapa nova começa. Cada etapa é medida num span
+    "etapa:<nome>", filho do span aberto por quem chamou.
+    """
+    resultados, pendentes, em_execucao = {}, dict(etapas), {}
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        while pendentes or em_execucao:
+            for nome, (funcao, deps) in list(pendentes.items()):
+                if all(d in resultados for d in deps) and not (cancelar and cancelar.is_set()):
+                    del pendentes[nome]
+                    if ao_iniciar:
+                        ao_iniciar(nome)
+                    em_execucao[pool.submit(_etapa_medida(nome, funcao), dict(resultados))] = nome
+            if not em_execucao:
+                break
+            prontos, _ = wait(em_execucao, return_when=FIRST_COMPLETED)
+            for fut in prontos:
+                nome = em_execucao.pop(fut)
+                erro = fut.exception()
+                if erro is None:
+                    resultados[nome] = fut.result()
+                if ao_concluir:
+                    ao_concluir(nome, resultados.get(nome), erro)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return resultados
+
+
+class ExecucaoEmSegundoPlano:
+    """executar_pipeline numa thread própria, com o andamento consultável de qualquer thread.
+
+    Feita para o painel: o objeto fica no session_state e sobrevive aos reruns,
+    cada rerun lê o que já terminou em `resultados`/`erros`, e `acompanhar`
+    repassa os eventos de início e fim até um subconjunto das etapas terminar.
+    A execução é medida num span raiz "relatorio" (id em `raiz`); ao fim,
+    `ao_terminar(resultados)` roda na mesma thread e o retorno fica em `retorno`.
+    """
+
+    def __init__(self, etapas: dict, ao_terminar=None, max_workers=6, **atributos):
+        self.etapas     = list(etapas)
+        self.deps       = {nome: deps for nome, (_, deps) in etapas.items()}
+        self.resultados = {}
+        self.erros      = {}
+        self.raiz       = None
+        self.retorno    = None
+        self.inicio     = time.time()
+        self.terminou   = threading.Event()
+        self.cancelada  = threading.Event()
+        self._eventos   = queue.Queue()
+        threading.Thread(target=self._rodar, args=(etapas, ao_terminar, max_workers, atributos),
+                         name="carteira-pipeline", daemon=True).start()
+
+    def _rodar(self, etapas, ao_terminar, max_workers, atributos):
+        def ao_concluir(nome, valor, erro):
+            if erro is None:
+                self.resultados[nome] = valor
+                self._eventos.put(("fim", nome, valor, None))
+                return
+            self.erros[nome] = f"{type(erro).__name__}: {erro}"
+            self._eventos.put(("fim", nome, None, erro))
+            # As dependentes de uma etapa que falhou não vão rodar: terminam aqui mesmo
+            for dependente in self._dependentes(nome):
+                self.erros[dependente] = f"não executada: {nome} falhou"
+                self._eventos.put(("fim", dependente, None, RuntimeError(self.erros[dependente])))
+
+        try:
+            with medir("relatorio", **atributos) as raiz:
+                self.raiz = raiz.id
+                res = executar_pipeline(etapas, ao_iniciar=lambda nome: self._eventos.put(("inicio", nome, None, None)),
+                                        ao_concluir=ao_concluir, max_workers=max_workers, cancelar=self.cancelada)
+            if ao_terminar and not self.cancelada.is_set():
+                self.retorno = ao_terminar(res)
+        except Exception as e:
+            self.erros["pipeline"] = f"{type(e).__name__}: {e}"
+        finally:
+            self.terminou.set()
+            self._eventos.put(None)
+
+    def _dependentes(self, nome) -> list:
+        afetadas, novas = set(), {nome}
+        while novas:
+            novas = {n for n, deps in self.deps.items() if novas & set(deps)} - afetadas
+            afetadas |= novas
+        return [n for n in self.etapas if n in afetadas]
+
+    def cancelar(self):
+        """Não inicia mais etapas (as que estão rodando terminam) e não chama `ao_terminar`."""
+        self.cancelada.set()
+
+    def pendentes(self) -> list:
+        """Etapas ainda sem resultado nem erro (vazio quando a execução terminou)."""
+        if self.terminou.is_set():
+            return []
+        return [n for n in self.etapas if n not in self.resultados and n not in self.erros]
+
+    def acompanhar(self, etapas):
+        """Gera (evento, nome, valor, erro) — evento "inicio" ou "fim" — até todas as `etapas` terminarem.
+
+        Só um consumidor por execução; eventos de etapas fora de `etapas` são descartados.
+        """
+        faltam = set(etapas)
+        while faltam and not (self.terminou.is_set() and self._eventos.empty()):
+            evento = self._eventos.get()
+            if evento is None:
+                break
+            if evento[1] in faltam:
+                if evento[0] == "fim":
+                    faltam.discard(evento[1])
+                yield evento
+
+
+def etapas_relatorio(api_key, usar_cache=None, ativos=None) -> dict:
+    """Etapas do relatório completo: as coletas são independentes e rodam juntas; IA e PDF esperam só o que usam."""
+    ativos = ativos or ATIVOS
+    return {
+        "cotacoes":             (lambda r: buscar_cotacoes(ativos), []),
+        "correlacoes":          (lambda r: buscar_correlacoes(), []),
+        "correlacoes_carteira": (lambda r: buscar_correlacoes_carteira(ativos), ["cotacoes", "correlacoes"]),
+        "dividendos":           (lambda r: buscar_dividendos(ativos), []),
+        "proventos":            (lambda r: buscar_proventos(r["cotacoes"], ativos), ["cotacoes", "dividendos"]),
+        "resultados_trim":      (lambda r: buscar_resultados(ativos), []),
+        "fundamentos":          (lambda r: prefetch_fundamentals(ativos.keys()), []),
+        "sentimentos":          (lambda r: analisar_sentimentos_carteira(ativos, api_key), []),
+        "relatorio":            (lambda r: gerar_relatorio_ia(r["cotacoes"], r["correlacoes"], api_key, usar_cache=usar_cache), ["cotacoes", "correlacoes"]),
+        "pdf_bytes":            (lambda r: gerar_pdf(r["cotacoes"], r["relatorio"], r["correlacoes"]), ["cotacoes", "relatorio", "correlacoes"]),
+        "avaliacao_resultados": (lambda r: avaliar_resultados_ia(r["resultados_trim"], api_key, usar_cache=usar_cache), ["resultados_trim"]),
+    }
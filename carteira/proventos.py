@@ -0,0 +1,38 @@
+"""Métricas vetorizadas sobre o livro de proventos: DY de 12 meses, yield on cost e renda projetada.
+
+Todas recebem o livro no formato de ler_dividendos (ticker, data, valor por cota)
+e calculam para todos os ativos de uma vez.
+"""
+import pandas as pd
+
+UM_ANO = pd.DateOffset(years=1)
+
+
+def _ultimos_12m(eventos: pd.DataFrame, hoje) -> pd.DataFrame:
+    return eventos[(eventos["data"] > hoje - UM_ANO) & (eventos["data"] <= hoje)]
+
+
+def metricas_proventos(eventos: pd.DataFrame, precos: pd.Series, posicoes: pd.DataFrame, hoje) -> pd.DataFrame:
+    """Uma linha por ticker de `precos`: proventos por cota nos últimos 12 meses, DY sobre o preço atual,
+    yield on cost sobre o preço médio e renda da posição (NaN quando a posição não foi informada).
+
+    `posicoes` é indexado por ticker com as colunas quantidade e preco_medio.
+    """
+    janela = _ultimos_12m(eventos, hoje).groupby("ticker")["valor"]
+    df = pd.DataFrame({"dividendos_12m": janela.sum(), "pagamentos_12m": janela.size()}).reindex(precos.index)
+    df = df.fillna({"dividendos_12m": 0.0, "pagamentos_12m": 0}).astype({"pagamentos_12m": int})
+    posicoes = posicoes.reindex(precos.index)
+    df["dy_12m"]    = df["dividendos_12m"] / precos.where(precos > 0) * 100
+    df["yoc"]       = df["dividendos_12m"] / posicoes["preco_medio"].where(posicoes["preco_medio"] > 0) * 100
+    df["renda_12m"] = df["dividendos_12m"] * posicoes["quantidade"]
+    return df
+
+
+def projetar_proventos(eventos: pd.DataFrame, posicoes: pd.DataFrame, hoje, meses=12) -> pd.DataFrame:
+    """Calendário projetado dos próximos `meses` (até 12): cada provento dos últimos 12 meses se repete
+    um ano depois com o mesmo valor por cota; `renda` é o valor vezes a quantidade da posição.
+    """
+    proj = _ultimos_12m(eventos, hoje).assign(data=lambda e: e["data"] + UM_ANO)
+    proj = proj[(proj["data"] > hoje) & (proj["data"] <= hoje + pd.DateOffset(months=meses))]
+    proj = proj.assign(renda=proj["valor"] * proj["ticker"].map(posicoes["quantidade"]))
+    return proj.sort_values(["data", "ticker"], ignore_index=True)
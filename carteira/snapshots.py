@@ -0,0 +1,55 @@
+"""Snapshots versionados do relatório completo, para abrir o painel sem gerar tudo de novo."""
+import json
+from contextlib import closing
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from carteira.armazenamento import conectar_snapshots
+from carteira.compartilhado import compartilhado
+from carteira.config import FUSO_B3, SNAPSHOTS_DIAS
+
+CHAVES_SNAPSHOT = ["cotacoes", "correlacoes", "correlacoes_carteira", "dividendos", "proventos", "resultados_trim", "fundamentos",
+                   "sentimentos", "relatorio", "avaliacao_resultados"]
+
+
+def salvar_snapshot(res: dict, motivo="manual") -> int:
+    """Grava o resultado do pipeline como uma nova versão e devolve o id.
+
+    Snapshots diários e manuais mais antigos que SNAPSHOTS_DIAS são descartados;
+    os do corte semanal ficam para o histórico de semanas.
+    """
+    agora = datetime.now(ZoneInfo(FUSO_B3))
+    dados = json.dumps({k: res[k] for k in CHAVES_SNAPSHOT if k in res}, ensure_ascii=False, default=str)
+    limite = (agora - timedelta(days=SNAPSHOTS_DIAS)).strftime("%Y-%m-%d %H:%M:%S")
+    with closing(conectar_snapshots()) as con, con:
+        cur = con.execute("INSERT INTO snapshots (gerado_em, semana, motivo, dados, pdf) VALUES (?,?,?,?,?)",
+                          (agora.strftime("%Y-%m-%d %H:%M:%S"), agora.strftime("%G-W%V"), motivo, dados, res.get("pdf_bytes")))
+        con.execute("DELETE FROM snapshots WHERE motivo != 'semanal' AND gerado_em < ?", (limite,))
+        return cur.lastrowid
+
+
+def listar_snapshots(limite=100) -> list:
+    """Versões salvas, da mais nova para a mais antiga (sem os dados, só o índice)."""
+    with closing(conectar_snapshots()) as con:
+        linhas = con.execute("SELECT id, gerado_em, semana, motivo FROM snapshots ORDER BY id DESC LIMIT ?", (limite,)).fetchall()
+    return [{"id": i, "gerado_em": g, "semana": s, "motivo": m} for i, g, s, m in linhas]
+
+
+def carregar_snapshot(id_snapshot=None):
+    """Dados de uma versão (a mais nova quando `id_snapshot` é None), com `pdf_bytes`; None se não houver."""
+    if id_snapshot is None:
+        with closing(conectar_snapshots()) as con:
+            id_snapshot = con.execute("SELECT MAX(id) FROM snapshots").fetchone()[0]
+    return None if id_snapshot is None else _ler_snapshot(id_snapshot)
+
+
+@compartilhado()
+def _ler_snapshot(id_snapshot):
+    # Uma versão não muda depois de salva: todas as sessões que abrem o painel dividem a mesma leitura
+    with closing(conectar_snapshots()) as con:
+        linha = con.execute("SELECT dados, pdf FROM snapshots WHERE id = ?", (id_snapshot,)).fetchone()
+    if linha is None:
+        return None
+    dados = json.loads(linha[0])
+    dados["pdf_bytes"] = linha[1]
+    return dados
@@ -0,0 +1,79 @@
+"""Universo de ativos monitorados, lido de um arquivo CSV ou TOML com um ativo por registro."""
+import csv
+import os
+
+CAMPOS_UNIVERSO = ("ticker", "nome", "setor", "moeda", "classe", "quantidade", "preco_medio")
+SIMBOLOS_MOEDA  = {"BRL": "R$", "USD": "US$", "EUR": "€"}
+
+
+def _numero(valor):
+    """Campo numérico opcional da posição (aceita vírgula decimal); None quando vazio."""
+    if valor is None or str(valor).strip() == "":
+        return None
+    return float(str(valor).strip().replace(",", "."))
+
+
+def _padronizar(registro: dict) -> dict:
+    ticker = (registro.get("ticker") or "").strip().upper()
+    if not ticker:
+        raise ValueError(f"Ativo sem ticker: {registro}")
+    return {
+        "ticker": ticker,
+        "nome":   (registro.get("nome") or "").strip() or ticker_curto(ticker),
+        "setor":  (registro.get("setor") or "").strip() or "Outros",
+        "moeda":  (registro.get("moeda") or "").strip().upper() or "BRL",
+        "classe": (registro.get("classe") or "").strip().lower() or "acao",
+        "quantidade":  _numero(registro.get("quantidade")),
+        "preco_medio": _numero(registro.get("preco_medio")),
+    }
+
+
+def carregar_universo(caminho: str) -> dict:
+    """Lê o universo como {ticker do Yahoo: ativo}, na ordem do arquivo.
+
+    CSV: cabeçalho com as colunas de CAMPOS_UNIVERSO. TOML: uma tabela
+    [[ativos]] por ativo, com as mesmas chaves. Só `ticker` é obrigatório;
+    `quantidade` e `preco_medio` descrevem a posição e alimentam a renda e o
+    yield on cost dos proventos.
+    """
+    if os.path.splitext(caminho)[1].lower() == ".toml":
+        try:
+            import tomllib
+        except ImportError:  # Python < 3.11
+            import tomli as tomllib
+        with open(caminho, "rb") as f:
+            registros = tomllib.load(f).get("ativos", [])
+    else:
+        with open(caminho, newline="", encoding="utf-8") as f:
+            registros = [r for r in csv.DictReader(f) if any((v or "").strip() for v in r.values())]
+    universo = {}
+    for registro in registros:
+        ativo = _padronizar(registro)
+        universo.setdefault(ativo["ticker"], ativo)
+    if not universo:
+        raise ValueError(f"Nenhum ativo encontrado em {caminho}")
+    return universo
+
+
+def gravar_universo(ativos: dict, caminho: str):
+    """Grava o universo em CSV com as colunas de CAMPOS_UNIVERSO (o inverso de carregar_universo)."""
+    with open(caminho, "w", newline="", encoding="utf-8") as f:
+        escritor = csv.DictWriter(f, fieldnames=CAMPOS_UNIVERSO)
+        escritor.writeheader()
+        for ativo in ativos.values():
+            escritor.writerow({k: "" if ativo.get(k) is None else ativo[k] for k in CAMPOS_UNIVERSO})
+
+
+def ticker_curto(ticker_str: str) -> str:
+    return ticker_str.replace(".SA", "").replace("-USD", "")
+
+
+def simbolo_moeda(moeda: str) -> str:
+    return SIMBOLOS_MOEDA.get(moeda, moeda)
+
+
+def em_lotes(itens, tamanho):
+    """Divide os itens em listas de até `tamanho` elementos, mantendo a ordem."""
+    itens, tamanho = list(itens), max(1, int(tamanho))
+    for i in range(0, len(itens), tamanho):
+        yield itens[i:i + tamanho]
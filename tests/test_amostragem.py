@@ -0,0 +1,93 @@
+"""LTTB e reduzir_serie contra uma implementação de referência em Python puro."""
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from carteira.amostragem import lttb, reduzir_serie
+
+
+def _lttb_referencia(x, y, pontos):
+    """Largest-Triangle-Three-Buckets como na tese de Steinarsson (2013), laço por laço.
+
+    As bordas floor(i·(n-2)/(pontos-2)) + 1 são calculadas com inteiros; em ponto
+    flutuante a divisão pode ficar um ulp abaixo de um inteiro e mover a borda.
+    """
+    n = len(x)
+    if pontos >= n or pontos < 3:
+        return list(range(n))
+    borda = lambda i: i * (n - 2) // (pontos - 2) + 1
+    a, escolhidos = 0, [0]
+    for i in range(pontos - 2):
+        prox_ini = borda(i + 1)
+        prox_fim = min(borda(i + 2), n)
+        media_x  = sum(x[prox_ini:prox_fim]) / (prox_fim - prox_ini)
+        media_y  = sum(y[prox_ini:prox_fim]) / (prox_fim - prox_ini)
+        ini, fim = borda(i), borda(i + 1)
+        maior, escolhido = -1.0, ini
+        for j in range(ini, fim):
+            area = abs((x[a] - media_x) * (y[j] - y[a]) - (x[a] - x[j]) * (media_y - y[a])) * 0.5
+            if area > maior:
+                maior, escolhido = area, j
+        escolhidos.append(escolhido)
+        a = escolhido
+    return escolhidos + [n - 1]
+
+
+def _passeio(n, semente=3):
+    gerador = np.random.default_rng(semente)
+    return pd.Series(100 + gerador.normal(0, 1, n).cumsum(), index=pd.bdate_range("2010-01-04", periods=n))
+
+
+class TesteLttb(unittest.TestCase):
+    def test_igual_a_referencia_indice_por_indice(self):
+        for n, pontos in [(1000, 100), (2817, 500), (800, 80), (158, 138), (74, 68), (101, 7), (50, 49), (10, 3)]:
+            serie = _passeio(n, semente=n)
+            x, y  = serie.index.asi8.astype(float), serie.to_numpy()
+            with self.subTest(n=n, pontos=pontos):
+                self.assertEqual(lttb(x, y, pontos).tolist(), _lttb_referencia(list(x), list(y), pontos))
+
+    def test_tamanho_exato_com_as_pontas(self):
+        x = np.arange(5000, dtype=float)
+        y = np.sin(x / 50)
+        for pontos in (3, 10, 999, 4999):
+            escolhidos = lttb(x, y, pontos)
+            self.assertEqual(len(escolhidos), pontos)
+            self.assertEqual((escolhidos[0], escolhidos[-1]), (0, 4999))
+            self.assertTrue((np.diff(escolhidos) > 0).all())
+
+    def test_mantem_o_pico_isolado(self):
+        y = np.zeros(1000)
+        y[437] = 50.0
+        self.assertIn(437, lttb(np.arange(1000, dtype=float), y, 20))
+
+
+class TesteReduzirSerie(unittest.TestCase):
+    def test_serie_curta_volta_inteira(self):
+        serie = _passeio(40)
+        pd.testing.assert_series_equal(reduzir_serie(serie, 100), serie)
+        pd.testing.assert_series_equal(reduzir_serie(serie, 40), serie)
+
+    def test_nan_saem_antes_da_reducao(self):
+        serie = _passeio(3000)
+        serie.iloc[::7] = np.nan
+        reduzida = reduzir_serie(serie, 300)
+        self.assertEqual(len(reduzida), 300)
+        self.assertFalse(reduzida.isna().any())
+        limpa = serie.dropna()
+        self.assertEqual((reduzida.index[0], reduzida.index[-1]), (limpa.index[0], limpa.index[-1]))
+        esperado = _lttb_referencia(list(limpa.index.asi8.astype(float)), list(limpa.to_numpy()), 300)
+        pd.testing.assert_series_equal(reduzida, limpa.iloc[esperado])
+
+    def test_so_nan_vira_serie_vazia(self):
+        serie = pd.Series([np.nan] * 10, index=pd.bdate_range("2024-01-01", periods=10))
+        self.assertTrue(reduzir_serie(serie, 5).empty)
+
+    def test_indice_sem_datas_usa_a_posicao(self):
+        serie = pd.Series(_passeio(800).to_numpy())
+        reduzida = reduzir_serie(serie, 80)
+        self.assertEqual(reduzida.index.tolist(), _lttb_referencia(list(range(800)), list(serie), 80))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+"""correlacoes contra o pandas: rolling corr/cov, DataFrame.corr e a janela incremental do MotorCorrelacao.
+
+Os retornos têm buracos (NaN) diferentes em cada série, então cada par só conta
+os dias em que os dois lados têm valor — o mesmo que o pandas faz por par.
+"""
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from carteira.correlacoes import MotorCorrelacao, correlacao_beta_movel, matriz_correlacao
+
+JANELA = 20
+MINIMO = 10
+
+
+def _retornos(pregoes=120, colunas=("A", "B", "C", "D"), buracos=0.15, semente=7):
+    gerador = np.random.default_rng(semente)
+    datas   = pd.bdate_range("2024-01-02", periods=pregoes)
+    comum   = gerador.normal(0, 0.01, (pregoes, 1))
+    valores = comum + gerador.normal(0, 0.01, (pregoes, len(colunas)))
+    valores[gerador.random(valores.shape) < buracos] = np.nan
+    return pd.DataFrame(valores, index=datas, columns=list(colunas))
+
+
+def _referencia(x: pd.Series, y: pd.Series):
+    """Correlação e beta móveis pelo pandas, só nos dias em que os dois lados têm retorno."""
+    x, y   = x.where(y.notna()), y.where(x.notna())
+    janela = dict(window=JANELA, min_periods=MINIMO)
+    return x.rolling(**janela).corr(y), x.rolling(**janela).cov(y) / y.rolling(**janela).var()
+
+
+class TesteCorrelacaoBetaMovel(unittest.TestCase):
+    def test_igual_ao_rolling_do_pandas_com_buracos(self):
+        ativos, fatores = _retornos(), _retornos(colunas=("IBOV", "USD"), semente=11)
+        corr, beta = correlacao_beta_movel(ativos, fatores, janela=JANELA, minimo=MINIMO)
+        for ativo in ativos:
+            for fator in fatores:
+                corr_ref, beta_ref = _referencia(ativos[ativo], fatores[fator])
+                np.testing.assert_allclose(corr[(ativo, fator)], corr_ref, rtol=1e-9, atol=1e-12)
+                np.testing.assert_allclose(beta[(ativo, fator)], beta_ref, rtol=1e-9, atol=1e-12)
+
+    def test_nan_abaixo_do_minimo_de_pares(self):
+        ativos, fatores = _retornos(buracos=0.0), _retornos(colunas=("IBOV",), buracos=0.0, semente=3)
+        ativos.iloc[30:60, 0] = np.nan  # A fica 30 pregões sem negociar
+        corr, beta = correlacao_beta_movel(ativos, fatores, janela=JANELA, minimo=MINIMO)
+        self.assertTrue(corr[("A", "IBOV")].iloc[:MINIMO - 1].isna().all())
+        self.assertTrue(corr[("A", "IBOV")].iloc[50:60].isna().all())
+        self.assertTrue(beta[("A", "IBOV")].iloc[50:60].isna().all())
+        self.assertTrue(corr[("B", "IBOV")].iloc[MINIMO - 1:].notna().all())
+
+
+class TesteMatrizCorrelacao(unittest.TestCase):
+    def test_igual_ao_corr_par_a_par_do_pandas(self):
+        retornos = _retornos()
+        esperado = retornos.iloc[-JANELA:].corr(min_periods=MINIMO)
+        np.testing.assert_allclose(matriz_correlacao(retornos, janela=JANELA, minimo=MINIMO), esperado, rtol=1e-9, atol=1e-12)
+
+
+class TesteMotorCorrelacao(unittest.TestCase):
+    def setUp(self):
+        self.ativos  = _retornos()
+        self.fatores = _retornos(colunas=("IBOV", "USD", "BTC"), semente=11)
+
+    def _conferir(self, motor, ativos, fatores):
+        corr_movel, beta_movel = correlacao_beta_movel(ativos, fatores, janela=JANELA, minimo=MINIMO)
+        corr, beta = motor.correlacao_beta()
+        np.testing.assert_allclose(corr.stack(), corr_movel.iloc[-1], rtol=1e-9, atol=1e-12)
+        np.testing.assert_allclose(beta.stack(), beta_movel.iloc[-1], rtol=1e-9, atol=1e-12)
+        np.testing.assert_allclose(motor.matriz(), matriz_correlacao(ativos, janela=JANELA, minimo=MINIMO),
+                                   rtol=1e-9, atol=1e-12)
+
+    def test_pregoes_novos_em_partes_igualam_o_calculo_completo(self):
+        motor = MotorCorrelacao(self.ativos.columns, self.fatores.columns, janela=JANELA, minimo=MINIMO)
+        motor.carregar(self.ativos.iloc[:70], self.fatores)
+        for inicio in range(70, len(self.ativos), 13):
+            motor.atualizar(self.ativos.iloc[inicio:inicio + 13], self.fatores)
+        self.assertEqual(motor.ultima_data, self.ativos.index[-1])
+        self.assertEqual(len(motor.pregoes), JANELA)
+        self._conferir(motor, self.ativos, self.fatores)
+
+    def test_ultimo_pregao_revisado_substitui_o_anterior(self):
+        motor = MotorCorrelacao(self.ativos.columns, self.fatores.columns, janela=JANELA, minimo=MINIMO)
+        motor.carregar(self.ativos, self.fatores)
+        revisado = self.ativos.copy()
+        revisado.iloc[-1] = [0.05, np.nan, -0.02, 0.01]
+        motor.atualizar(revisado.iloc[-2:], self.fatores)  # o penúltimo vem de novo e é ignorado
+        self.assertEqual(len(motor.pregoes), JANELA)
+        self._conferir(motor, revisado, self.fatores)
+
+    def test_longo_historico_sem_deriva_nas_somas(self):
+        ativos, fatores = _retornos(pregoes=2000, semente=5), _retornos(pregoes=2000, colunas=("IBOV",), semente=6)
+        motor = MotorCorrelacao(ativos.columns, fatores.columns, janela=JANELA, minimo=MINIMO).carregar(ativos.iloc[:JANELA], fatores)
+        motor.atualizar(ativos.iloc[JANELA:], fatores)
+        self._conferir(motor, ativos, fatores)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+"""atualizar_precos contra uma fonte que reajusta o histórico a cada desdobramento, como o Yahoo."""
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from carteira import armazenamento, dados
+from carteira.fontes import CAMPOS_ACOES, CAMPOS_PRECOS, definir_fonte, recortar_periodo
+
+
+class _FonteAjustada:
+    """Preço bruto constante por ticker até um eventual desdobramento {ticker: (data, fator)}.
+
+    Como no auto_adjust do Yahoo, depois de um desdobramento ocorrido até `hoje`
+    os pregões anteriores saem divididos pelo fator. `pedidos` guarda (tickers, inicio) de cada download.
+    """
+
+    nome = "ajustada"
+
+    def __init__(self, brutos, desdobramentos, hoje):
+        self.brutos, self.desdobramentos, self.hoje = brutos, desdobramentos, pd.Timestamp(hoje)
+        self.pedidos = []
+
+    def precos(self, tickers, periodo="1mo", inicio=None, intervalo="1d", acoes=False):
+        self.pedidos.append((list(tickers), inicio))
+        datas  = pd.bdate_range("2026-09-01", self.hoje)
+        frames = {}
+        for t in tickers:
+            fech, splits = np.full(len(datas), float(self.brutos[t])), np.zeros(len(datas))
+            if t in self.desdobramentos:
+                dia, fator = self.desdobramentos[t]
+                # O bruto cai para 1/fator no dia; os pregões anteriores saem ajustados para a mesma base
+                if pd.Timestamp(dia) <= self.hoje:
+                    fech /= fator
+                    splits[datas == pd.Timestamp(dia)] = fator
+            df = pd.DataFrame({"Open": fech, "High": fech, "Low": fech, "Close": fech, "Volume": 1000.0,
+                               "Dividends": 0.0, "Stock Splits": splits}, index=datas)
+            frames[t] = recortar_periodo(df, periodo, inicio)[CAMPOS_PRECOS + (CAMPOS_ACOES if acoes else [])]
+        return pd.concat(frames, axis=1)
+
+
+class TestAtualizarPrecos(unittest.TestCase):
+    def setUp(self):
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        for nome, valor in (("DADOS_DIR", pasta.name), ("PRECOS_DB", os.path.join(pasta.name, "precos.sqlite"))):
+            patcher = mock.patch.object(armazenamento, nome, valor)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        # Desdobramento 2:1 de SPLT3 na segunda, 2026-10-12: o bruto cai de 100 para 50 nesse pregão
+        self.fonte = _FonteAjustada({"SPLT3.SA": 100, "FIXO3.SA": 20}, {"SPLT3.SA": ("2026-10-12", 2)}, "2026-10-09")
+        anterior   = definir_fonte(self.fonte)
+        self.addCleanup(definir_fonte, anterior)
+
+    def _fechamentos(self, ticker):
+        return armazenamento.ler_precos([ticker])[ticker]["Close"].dropna()
+
+    def test_desdobramento_entre_duas_atualizacoes(self):
+        dados.atualizar_precos(["SPLT3.SA", "FIXO3.SA"])
+        self.assertTrue((self._fechamentos("SPLT3.SA") == 100).all())
+
+        self.fonte.hoje = pd.Timestamp("2026-10-16")
+        self.fonte.pedidos.clear()
+        dados.atualizar_precos(["SPLT3.SA", "FIXO3.SA"])
+        fech = self._fechamentos("SPLT3.SA")
+        # Todo o histórico salvo está na base nova: nenhum salto falso de -50% no dia do desdobramento
+        self.assertEqual(fech.index[0], pd.Timestamp("2026-09-01"))
+        self.assertEqual(fech.index[-1], pd.Timestamp("2026-10-16"))
+        np.testing.assert_allclose(fech.to_numpy(), 50.0)
+        self.assertEqual(fech.pct_change().abs().max(), 0.0)
+        # O download completo desde o primeiro pregão salvo só vale para o ticker com o evento
+        self.assertEqual(self.fonte.pedidos, [(["SPLT3.SA", "FIXO3.SA"], "2026-10-09"), (["SPLT3.SA"], "2026-09-01")])
+        fixo = self._fechamentos("FIXO3.SA")
+        self.assertEqual(fixo.index[-1], pd.Timestamp("2026-10-16"))
+        self.assertTrue((fixo == 20).all())
+
+    def test_sem_eventos_so_baixa_os_pregoes_novos(self):
+        dados.atualizar_precos(["FIXO3.SA"])
+        self.fonte.hoje = pd.Timestamp("2026-10-16")
+        self.fonte.pedidos.clear()
+        self.assertEqual(dados.atualizar_precos(["FIXO3.SA"]), 6)
+        self.assertEqual(self.fonte.pedidos, [(["FIXO3.SA"], "2026-10-09")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,271 @@
+"""FilaEnvios contra servidores locais: um SMTP mínimo e um substituto HTTP da Bot API do Telegram.
+
+Os servidores ficam no próprio teste, como o _ServidorGroq do benchmark: cada um
+registra o que recebeu e aceita um roteiro de falhas (429, 5xx, 4xx/5xx do SMTP,
+conexão derrubada) para exercitar as retentativas da fila.
+"""
+import base64
+import email
+import json
+import socketserver
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs
+
+from carteira import envios
+
+COTACOES  = [{"ticker": "PETR4", "variacao": 1.5}, {"ticker": "VALE3", "variacao": -0.8}]
+RELATORIO = {"gerado_em": "18/10/2026", "analise": "Semana positiva para a carteira."}
+PDF       = b"%PDF-1.4 relatorio de teste"
+
+
+# ══════════════════════════════════════════════════════════════
+# SERVIDORES LOCAIS
+# ══════════════════════════════════════════════════════════════
+
+class _ServidorSMTP:
+    """SMTP sem TLS com AUTH PLAIN; guarda (destinatário, mensagem) de cada DATA aceito.
+
+    `recusar` responde 550 ao RCPT desses endereços, `adiar` responde 451 as
+    primeiras N vezes por endereço e `derrubar_apos` fecha a conexão no MAIL FROM
+    seguinte à N-ésima mensagem aceita.
+    """
+
+    def __init__(self, senha="segredo", recusar=(), adiar=None, derrubar_apos=None):
+        servidor = self
+        self.mensagens = []
+        self.conexoes  = 0
+        self.quits     = 0
+        self.adiar     = dict(adiar or {})
+        self._lock     = threading.Lock()
+
+        class Tratador(socketserver.StreamRequestHandler):
+            def responder(self, linha):
+                self.wfile.write(linha.encode() + b"\r\n")
+
+            def handle(self):
+                with servidor._lock:
+                    servidor.conexoes += 1
+                self.responder("220 teste ESMTP")
+                destinatarios = []
+                while True:
+                    linha = self.rfile.readline().decode(errors="replace").rstrip("\r\n")
+                    if not linha:
+                        return
+                    comando = linha.split(" ", 1)[0].upper()
+                    if comando == "EHLO":
+                        self.responder("250-teste")
+                        self.responder("250 AUTH PLAIN")
+                    elif comando == "AUTH":
+                        credencial = base64.b64decode(linha.split()[-1]).split(b"\0")
+                        self.responder("235 ok" if credencial[-1].decode() == senha else "535 credencial invalida")
+                    elif comando == "MAIL":
+                        if derrubar_apos is not None and len(servidor.mensagens) == derrubar_apos and servidor.conexoes == 1:
+                            return
+                        destinatarios = []
+                        self.responder("250 ok")
+                    elif comando == "RCPT":
+                        endereco = linha.split(":", 1)[1].strip().strip("<>")
+                        with servidor._lock:
+                            pendentes = servidor.adiar.get(endereco, 0)
+                            servidor.adiar[endereco] = max(0, pendentes - 1)
+                        if endereco in recusar:
+                            self.responder("550 usuario desconhecido")
+                        elif pendentes:
+                            self.responder("451 tente mais tarde")
+                        else:
+                            destinatarios.append(endereco)
+                            self.responder("250 ok")
+                    elif comando == "DATA":
+                        self.responder("354 continue")
+                        corpo = []
+                        while True:
+                            parte = self.rfile.readline()
+                            if parte in (b".\r\n", b""):
+                                break
+                            corpo.append(parte[1:] if parte.startswith(b"..") else parte)
+                        with servidor._lock:
+                            servidor.mensagens += [(d, b"".join(corpo)) for d in destinatarios]
+                        self.responder("250 aceito")
+                    elif comando == "QUIT":
+                        with servidor._lock:
+                            servidor.quits += 1
+                        self.responder("221 tchau")
+                        return
+                    else:  # RSET, NOOP
+                        self.responder("250 ok")
+
+        self.servidor = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Tratador)
+        self.servidor.daemon_threads = True
+        self.porta = self.servidor.server_address[1]
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+
+    def fechar(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+
+class _ServidorTelegram:
+    """Substituto da Bot API: registra cada chamada e responde pelo roteiro `falhas` (método -> [(status, corpo)])."""
+
+    def __init__(self, falhas=None, token_valido="123:abc"):
+        servidor = self
+        self.chamadas = []  # (método, chat_id, "json" | "upload" | "file_id")
+        self.falhas   = {metodo: list(respostas) for metodo, respostas in (falhas or {}).items()}
+        self._lock    = threading.Lock()
+
+        class Tratador(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def responder(self, status, corpo):
+                dados = json.dumps(corpo).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(dados)))
+                self.end_headers()
+                self.wfile.write(dados)
+
+            def do_POST(self):
+                _, bot, metodo = self.path.split("/", 2)
+                bruto = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                tipo  = self.headers.get("Content-Type", "")
+                if tipo.startswith("multipart/"):
+                    chat, forma = bruto.split(b'name="chat_id"\r\n\r\n', 1)[1].split(b"\r\n", 1)[0].decode(), "upload"
+                elif tipo.startswith("application/json"):
+                    chat, forma = str(json.loads(bruto)["chat_id"]), "json"
+                else:
+                    campos = parse_qs(bruto.decode())
+                    chat, forma = campos["chat_id"][0], "file_id"
+                with servidor._lock:
+                    servidor.chamadas.append((metodo, chat, forma))
+                    roteiro = servidor.falhas.get(metodo)
+                    falha   = roteiro.pop(0) if roteiro else None
+                if bot != f"bot{token_valido}":
+                    return self.responder(401, {"ok": False, "description": "Unauthorized"})
+                if falha:
+                    return self.responder(*falha)
+                resultado = {"message_id": len(servidor.chamadas)}
+                if metodo == "sendDocument":
+                    resultado["document"] = {"file_id": "arquivo-1"}
+                self.responder(200, {"ok": True, "result": resultado})
+
+        self.servidor = ThreadingHTTPServer(("127.0.0.1", 0), Tratador)
+        self.servidor.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.servidor.server_port}"
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+
+    def fechar(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+
+# ══════════════════════════════════════════════════════════════
+# TESTES
+# ══════════════════════════════════════════════════════════════
+
+class TesteEmail(unittest.TestCase):
+    def usar(self, smtp):
+        self.addCleanup(smtp.fechar)
+        for nome, valor in (("SMTP_HOST", "127.0.0.1"), ("SMTP_PORT", smtp.porta)):
+            alvo = mock.patch.object(envios, nome, valor)
+            alvo.start()
+            self.addCleanup(alvo.stop)
+        return envios.FilaEnvios(tentativas=3, espera_base=0.05)
+
+    def test_lote_numa_conexao_com_o_destinatario_certo_em_cada_mensagem(self):
+        smtp = _ServidorSMTP()
+        fila = self.usar(smtp)
+        destinos = [f"cliente{i}@exemplo.com" for i in range(5)]
+        status = fila.aguardar(fila.enviar_email("eu@exemplo.com", "segredo", destinos, COTACOES, RELATORIO, PDF), timeout=10)
+        self.assertEqual([s["estado"] for s in status], ["enviado"] * 5)
+        self.assertEqual(smtp.conexoes, 1)
+        self.assertEqual([d for d, _ in smtp.mensagens], destinos)
+        for destino, bruto in smtp.mensagens:
+            msg = email.message_from_bytes(bruto)
+            self.assertEqual(msg.get_all("To"), [destino])
+            anexo = [p for p in msg.walk() if p.get_filename()]
+            self.assertEqual(anexo[0].get_payload(decode=True), PDF)
+
+    def test_4xx_repete_e_5xx_para_na_primeira(self):
+        smtp = _ServidorSMTP(recusar={"nao.existe@exemplo.com"}, adiar={"lotado@exemplo.com": 1})
+        fila = self.usar(smtp)
+        ids  = fila.enviar_email("eu@exemplo.com", "segredo", ["lotado@exemplo.com", "nao.existe@exemplo.com"],
+                                 COTACOES, RELATORIO, PDF)
+        lotado, inexistente = fila.aguardar(ids, timeout=10)
+        self.assertEqual((lotado["estado"], lotado["tentativas"]), ("enviado", 2))
+        self.assertEqual((inexistente["estado"], inexistente["tentativas"]), ("erro", 1))
+        self.assertIn("550", inexistente["erro"])
+
+    def test_conexao_derrubada_reabre_sem_duplicar(self):
+        smtp = _ServidorSMTP(derrubar_apos=1)
+        fila = self.usar(smtp)
+        destinos = ["a@exemplo.com", "b@exemplo.com"]
+        status = fila.aguardar(fila.enviar_email("eu@exemplo.com", "segredo", destinos, COTACOES, RELATORIO, PDF), timeout=10)
+        self.assertEqual([s["estado"] for s in status], ["enviado", "enviado"])
+        self.assertEqual(status[1]["tentativas"], 2)
+        self.assertEqual(smtp.conexoes, 2)
+        self.assertEqual([d for d, _ in smtp.mensagens], destinos)
+
+    def test_senha_errada_nao_repete(self):
+        smtp = _ServidorSMTP()
+        fila = self.usar(smtp)
+        (status,) = fila.aguardar(fila.enviar_email("eu@exemplo.com", "errada", ["a@exemplo.com"], COTACOES, RELATORIO, PDF),
+                                  timeout=10)
+        self.assertEqual((status["estado"], status["tentativas"]), ("erro", 1))
+        self.assertIn("login recusado", status["erro"])
+        self.assertEqual(smtp.mensagens, [])
+
+    def test_conexao_ociosa_e_encerrada(self):
+        smtp = _ServidorSMTP()
+        with mock.patch.object(envios, "ENVIO_OCIOSO_S", 0.1):
+            fila = self.usar(smtp)
+            fila.aguardar(fila.enviar_email("eu@exemplo.com", "segredo", ["a@exemplo.com"], COTACOES, RELATORIO, PDF), timeout=10)
+            for _ in range(50):
+                if smtp.quits:
+                    break
+                threading.Event().wait(0.05)
+        self.assertEqual(smtp.quits, 1)
+
+
+class TesteTelegram(unittest.TestCase):
+    def usar(self, telegram):
+        self.addCleanup(telegram.fechar)
+        alvo = mock.patch.object(envios, "TELEGRAM_API", telegram.url)
+        alvo.start()
+        self.addCleanup(alvo.stop)
+        return envios.FilaEnvios(tentativas=3, espera_base=0.05)
+
+    def test_pdf_sobe_uma_vez_e_os_outros_chats_usam_o_file_id(self):
+        telegram = _ServidorTelegram()
+        fila     = self.usar(telegram)
+        status   = fila.aguardar(fila.enviar_telegram("123:abc", ["-1", "-2", "-3"], COTACOES, RELATORIO, PDF), timeout=10)
+        self.assertEqual([s["estado"] for s in status], ["enviado"] * 3)
+        documentos = [(chat, forma) for metodo, chat, forma in telegram.chamadas if metodo == "sendDocument"]
+        self.assertEqual(documentos, [("-1", "upload"), ("-2", "file_id"), ("-3", "file_id")])
+
+    def test_retentativa_nao_repete_a_mensagem_ja_entregue(self):
+        telegram = _ServidorTelegram(falhas={
+            "sendMessage":  [(429, {"ok": False, "description": "Too Many Requests", "parameters": {"retry_after": 0.05}})],
+            "sendDocument": [(502, {"ok": False, "description": "Bad Gateway"})],
+        })
+        fila = self.usar(telegram)
+        (status,) = fila.aguardar(fila.enviar_telegram("123:abc", ["-1"], COTACOES, RELATORIO, PDF), timeout=10)
+        self.assertEqual((status["estado"], status["tentativas"]), ("enviado", 3))
+        self.assertEqual([m for m, _, _ in telegram.chamadas], ["sendMessage", "sendMessage", "sendDocument", "sendDocument"])
+
+    def test_token_invalido_nao_repete(self):
+        telegram = _ServidorTelegram()
+        fila     = self.usar(telegram)
+        (status,) = fila.aguardar(fila.enviar_telegram("999:errado", ["-1"], COTACOES, RELATORIO, PDF), timeout=10)
+        self.assertEqual((status["estado"], status["tentativas"]), ("erro", 1))
+        self.assertEqual(status["erro"], "Unauthorized")
+        self.assertEqual(len(telegram.chamadas), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+"""Indicadores contra valores de referência calculados à mão ou publicados."""
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from carteira.indicadores import calcular_indicadores, maior_queda, rsi_wilder
+
+# Série do exemplo clássico de RSI(14) de Wilder (planilha da StockCharts) e os RSIs publicados a
+# partir do 15º fechamento. A planilha arredonda as médias intermediárias, daí a folga de 0,1
+WILDER_FECHAMENTOS = [
+    44.34, 44.09, 44.15, 43.61, 44.33, 44.83, 45.10, 45.42, 45.84, 46.08, 45.89, 46.03, 45.61, 46.28,
+    46.28, 46.00, 46.03, 46.41, 46.22, 45.64, 46.21, 46.25, 45.71, 46.45, 45.78, 45.35, 44.03, 44.18,
+    44.22, 44.57, 43.42, 42.66, 43.13,
+]
+WILDER_RSI = [
+    70.53, 66.32, 66.55, 69.41, 66.36, 57.97, 62.93, 63.26, 56.06, 62.38, 54.71, 50.42, 39.99, 41.46,
+    41.87, 45.46, 37.30, 33.08, 37.77,
+]
+
+
+def _rsi_referencia(fech, periodo=14):
+    """RSI de Wilder laço por laço: média simples das primeiras variações, depois (m·(n-1) + x)/n."""
+    delta = [b - a for a, b in zip(fech, fech[1:])]
+    ganho = sum(max(x, 0) for x in delta[:periodo]) / periodo
+    perda = sum(max(-x, 0) for x in delta[:periodo]) / periodo
+    rsis  = [100 - 100 / (1 + ganho / perda)]
+    for x in delta[periodo:]:
+        ganho = (ganho * (periodo - 1) + max(x, 0)) / periodo
+        perda = (perda * (periodo - 1) + max(-x, 0)) / periodo
+        rsis.append(100 - 100 / (1 + ganho / perda))
+    return rsis
+
+
+def _precos(series: dict) -> pd.DataFrame:
+    """Frame largo (ticker, campo) a partir de {ticker: série de fechamentos}; máxima/mínima a ±1."""
+    blocos = {}
+    for ticker, fech in series.items():
+        blocos[ticker] = pd.DataFrame({"Open": fech, "High": fech + 1, "Low": fech - 1, "Close": fech, "Volume": 100.0})
+    return pd.concat(blocos, axis=1)
+
+
+class TestRsiWilder(unittest.TestCase):
+    def test_exemplo_classico(self):
+        fech = pd.DataFrame({"X": WILDER_FECHAMENTOS})
+        rsi  = rsi_wilder(fech)["X"]
+        self.assertTrue(rsi.iloc[:14].isna().all())
+        np.testing.assert_allclose(rsi.iloc[14:].to_numpy(), _rsi_referencia(WILDER_FECHAMENTOS), rtol=1e-9)
+        np.testing.assert_allclose(rsi.iloc[14:].to_numpy(), WILDER_RSI, atol=0.1)
+
+    def test_dias_sem_pregao_nao_entram_no_rsi(self):
+        # Ação com fins de semana vazios ao lado de um ativo que negocia todo dia
+        dias   = pd.date_range("2026-09-01", periods=45, freq="D")
+        uteis  = dias[dias.dayofweek < 5][:len(WILDER_FECHAMENTOS)]
+        acao   = pd.Series(WILDER_FECHAMENTOS, index=uteis).reindex(dias)
+        precos = _precos({"X": acao, "BTC-USD": pd.Series(np.linspace(100, 140, len(dias)), index=dias)})
+        ind    = calcular_indicadores(precos)
+        self.assertAlmostEqual(ind.at["X", "rsi"], _rsi_referencia(WILDER_FECHAMENTOS)[-1], places=9)
+
+    def test_so_altas_e_serie_parada(self):
+        fech = pd.DataFrame({"sobe": np.arange(1.0, 21.0), "parado": np.full(20, 7.0)})
+        rsi  = rsi_wilder(fech).iloc[-1]
+        self.assertEqual(rsi["sobe"], 100.0)
+        self.assertEqual(rsi["parado"], 50.0)
+
+
+class TestMaiorQueda(unittest.TestCase):
+    def test_calculada_a_mao(self):
+        maximas = pd.DataFrame({"X": [10.0, 12.0, 11.0, 9.0, 13.0]})
+        minimas = pd.DataFrame({"X": [9.0, 11.0, 8.0, 8.5, 12.0]})
+        # Topo de 12 no 2º pregão e mínima de 8 no 3º: 8/12 - 1 = -33,33%
+        self.assertAlmostEqual(maior_queda(maximas, minimas)["X"], (8 / 12 - 1) * 100)
+
+    def test_minima_antes_do_topo_nao_conta(self):
+        maximas = pd.DataFrame({"X": [10.0, 20.0, 21.0]})
+        minimas = pd.DataFrame({"X": [5.0, 19.0, 20.0]})
+        self.assertAlmostEqual(maior_queda(maximas, minimas)["X"], -50.0)
+
+
+class TestCalendarios(unittest.TestCase):
+    def setUp(self):
+        # Termina num domingo: o BTC negocia todo dia, a B3 só em dias úteis
+        self.dias  = pd.date_range("2026-09-14", "2026-10-18", freq="D")
+        uteis      = self.dias[self.dias.dayofweek < 5]
+        self.btc   = pd.Series(np.arange(100.0, 100.0 + len(self.dias)), index=self.dias)
+        self.acao  = pd.Series(np.arange(10.0, 10.0 + len(uteis)), index=uteis)
+        # Suspensa desde 2026-10-07 (quarta)
+        self.parada = self.acao[:"2026-10-07"]
+
+    def test_cada_calendario_usa_os_proprios_pregoes(self):
+        ind = calcular_indicadores(_precos({"BTC-USD": self.btc, "PETR4.SA": self.acao}))
+        btc, acao = ind.loc["BTC-USD"], ind.loc["PETR4.SA"]
+        # BTC: últimos 5 dias corridos (qua a dom); ação: últimos 5 dias úteis (seg a sex)
+        self.assertEqual(btc["atual"], self.btc.iloc[-1])
+        self.assertEqual(btc["abertura"], self.btc.iloc[-5])
+        self.assertEqual(acao["atual"], self.acao.iloc[-1])
+        self.assertEqual(acao["abertura"], self.acao.iloc[-5])
+        self.assertAlmostEqual(acao["variacao"], (self.acao.iloc[-1] / self.acao.iloc[-5] - 1) * 100)
+        self.assertAlmostEqual(acao["var_anterior"], (self.acao.iloc[-5] / self.acao.iloc[-10] - 1) * 100)
+        self.assertEqual(acao["maxima"], self.acao.iloc[-1] + 1)
+        self.assertEqual(acao["minima"], self.acao.iloc[-5] - 1)
+        self.assertEqual(acao["pregoes"], 5)
+        esperada = self.acao.iloc[-5:].pct_change().dropna().std(ddof=1) * 100
+        self.assertAlmostEqual(acao["volatilidade"], esperada)
+        self.assertEqual(acao["ultimo_pregao"], pd.Timestamp("2026-10-16"))
+        self.assertEqual(btc["ultimo_pregao"], pd.Timestamp("2026-10-18"))
+        self.assertFalse(ind["defasado"].any())
+
+    def test_ativo_suspenso_fica_defasado(self):
+        ind = calcular_indicadores(_precos({"BTC-USD": self.btc, "PETR4.SA": self.acao, "OIBR3.SA": self.parada}))
+        self.assertEqual(ind.at["OIBR3.SA", "ultimo_pregao"], pd.Timestamp("2026-10-07"))
+        self.assertTrue(ind.at["OIBR3.SA", "defasado"])
+        self.assertFalse(ind.at["PETR4.SA", "defasado"])
+        self.assertFalse(ind.at["BTC-USD", "defasado"])
+
+    def test_um_dia_util_de_atraso_e_tolerado(self):
+        # Feriado só num mercado: o ativo para na quinta enquanto o resto negocia na sexta
+        feriado = self.acao[:"2026-10-15"]
+        ind = calcular_indicadores(_precos({"PETR4.SA": self.acao, "AAPL": feriado}))
+        self.assertFalse(ind.at["AAPL", "defasado"])
+        dois_dias = self.acao[:"2026-10-14"]
+        ind = calcular_indicadores(_precos({"PETR4.SA": self.acao, "AAPL": dois_dias}))
+        self.assertTrue(ind.at["AAPL", "defasado"])
+
+
+if __name__ == "__main__":
+    unittest.main()